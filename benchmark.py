@@ -0,0 +1,1136 @@
+"""Offline benchmarks and accuracy harnesses for Cypher.
+
+Usage:
+    python benchmark.py wakeword --fixtures path/to/fixtures [--templates wakeword] [--sensitivity 0.5]
+    python benchmark.py routing [--corpus intent_corpus.json] [--phrases 5000]
+    python benchmark.py contacts [--sizes 10000 100000] [--lookups 20000]
+    python benchmark.py import [--rows 100000]
+    python benchmark.py mail [--messages 200] [--rtt 0.03]
+    python benchmark.py smtp [--emails 20] [--rtt 0.03] [--fail-first 2]
+    python benchmark.py wiki [--pages 200000] [--lookups 20000] [--rtt 0.3]
+    python benchmark.py e2e [--corpus path/to/corpus] [--rounds 2] [--fail-rate 0.1] [--baseline e2e_baseline.json]
+    python benchmark.py stt --corpus path/to/corpus [--model vosk-model] [--cloud]
+"""
+import argparse
+import asyncio
+import contextlib
+import email
+import functools
+import glob
+import gzip
+import http.server
+import imaplib
+import io
+import json
+import os
+import random
+import re
+import select
+import smtplib
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+import urllib.parse
+import wave
+from email.message import EmailMessage
+
+import numpy as np
+import psutil
+import requests
+import speech_recognition as sr
+
+import main as cypher
+from main import (ERROR_THRESHOLD, INTENTS, MAIL_PUSH_NOTIFICATIONS, MAIL_READ_LIMIT, VOSK_MODEL_DIR, WAKE_WORD_SENSITIVITY,
+                  WAKE_WORD_TEMPLATE_DIR, ContactRepository, CypherCore, GoogleSTT, IntentRouter, MailOutbox, MailReader,
+                  SpanTracer, VoskSTT, WakeWordSpotter, WikiAbstractIndex, WikiSummaryCache, clean_reply, decode_mime_header,
+                  percentile, read_contact_file, read_wiki_abstracts)
+
+
+# --- WAKE WORD ---
+def bench_wakeword(args):
+    """Streams every WAV fixture through the wake-word spotter and reports accuracy and latency. Fixtures live in <fixtures>/positive (contain the wake word) and <fixtures>/negative (do not)."""
+    spotter = WakeWordSpotter(args.templates, sensitivity=args.sensitivity)
+    if not spotter.ready:
+        print(f"Need at least 2 wake-word recordings in '{args.templates}'.")
+        return 1
+
+    results = {"positive": [0, 0], "negative": [0, 0]}  # [detected, total]
+    audio_seconds, processing_seconds = 0.0, 0.0
+    for label in ("positive", "negative"):
+        for path in sorted(glob.glob(os.path.join(args.fixtures, label, "*.wav"))):
+            with sr.AudioFile(path) as source:
+                duration = source.DURATION
+                started = time.perf_counter()
+                detected = spotter.spot(source, lambda: True, args.energy_threshold)
+                elapsed = time.perf_counter() - started
+            audio_seconds += duration
+            processing_seconds += elapsed
+            results[label][0] += int(detected)
+            results[label][1] += 1
+            print(f"{label:<9} {os.path.basename(path):<30} {'DETECTED' if detected else '-':<9} {elapsed * 1000:7.1f} ms")
+
+    (true_pos, positives), (false_pos, negatives) = results["positive"], results["negative"]
+    total = positives + negatives
+    if not total:
+        print(f"No fixtures found under '{args.fixtures}'.")
+        return 1
+    latencies = list(spotter.eval_latencies)
+    print()
+    print(f"Threshold        : {spotter.threshold:.2f} (sensitivity {args.sensitivity})")
+    print(f"Accuracy         : {(true_pos + negatives - false_pos) / total:.1%} over {total} files")
+    print(f"False rejects    : {positives - true_pos}/{positives}")
+    print(f"False accepts    : {false_pos}/{negatives}")
+    print(f"Window scoring   : p50 {percentile(latencies, 50):.1f} ms, p95 {percentile(latencies, 95):.1f} ms")
+    print(f"Real-time factor : {processing_seconds / audio_seconds if audio_seconds else 0:.3f}")
+    return 0
+
+
+# --- INTENT ROUTING ---
+def bench_routing(args):
+    """Checks the router against the golden utterance corpus, then times routing with thousands of extra registered phrases next to a naive substring scan."""
+    with open(args.corpus, "r") as f:
+        corpus = json.load(f)
+
+    router = IntentRouter(INTENTS)
+    failures = 0
+    for case in corpus:
+        match = router.route(case["utterance"])
+        got_intent, got_slots = (match.intent, match.slots) if match else (None, {})
+        if got_intent != case["intent"] or got_slots != case.get("slots", {}):
+            failures += 1
+            print(f"MISROUTE '{case['utterance']}': expected {case['intent']} {case.get('slots', {})}, got {got_intent} {got_slots}")
+    print(f"Golden corpus    : {len(corpus) - failures}/{len(corpus)} routed correctly")
+
+    rng = random.Random(7)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    extra = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))) for _ in range(args.phrases)]
+    big_router = IntentRouter(INTENTS)
+    big_router.register("synthetic", 10, extra)
+    all_phrases = [phrase for _, _, phrases, *_ in INTENTS for phrase in phrases] + extra
+
+    utterances = [case["utterance"] for case in corpus] * args.rounds
+    for label, route in (
+        (f"Trie ({router.phrase_count} phrases)", router.route),
+        (f"Trie ({big_router.phrase_count} phrases)", big_router.route),
+        (f"Substring scan ({len(all_phrases)} phrases)", lambda text: next((p for p in all_phrases if p in text), None)),
+    ):
+        started = time.perf_counter()
+        for utterance in utterances:
+            route(utterance)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<34}: {elapsed / len(utterances) * 1e6:8.1f} us/route")
+    return 1 if failures else 0
+
+
+# --- CONTACTS ---
+def synthetic_contacts(count, seed=11):
+    """Returns count unique (name, phone_number) pairs with first and last names built from Indian-sounding syllables."""
+    rng = random.Random(seed)
+    syllables = ["ra", "hul", "pri", "ya", "a", "mit", "sne", "ha", "vi", "kram", "an", "ja", "li", "ro", "han", "poo",
+                 "ar", "jun", "ka", "vya", "di", "tya", "ne", "sha", "ver", "ma", "pa", "tel", "sin", "gh", "gup", "ta"]
+    word = lambda: "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3)))
+    names = set()
+    while len(names) < count:
+        names.add(f"{word()} {word()}")
+    return [(name, f"9{rng.randrange(10 ** 9):09d}") for name in sorted(names)]
+
+def misspell(name, rng):
+    """Imitates a speech recognizer's spelling of a name: doubled vowels, Hinglish digraphs or a dropped letter."""
+    variants = [name.replace("a", "aa", 1), name.replace("i", "ee", 1), name.replace("s", "sh", 1), name.replace("v", "w", 1)]
+    position = rng.randrange(1, len(name))
+    variants.append(name[:position] + name[position + 1:])
+    return rng.choice([variant for variant in variants if variant != name] or [name])
+
+def time_lookups(lookup, names):
+    """Returns per-call latencies in microseconds."""
+    latencies = []
+    for name in names:
+        started = time.perf_counter()
+        lookup(name)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+def bench_contacts(args):
+    """Times contact lookups at each database size: the old connect-per-call LOWER(name) query, the repository's indexed query with a cold cache, and the repository's cache serving a set of 50 frequent names. Then builds the fuzzy name index and searches it with misspelled names."""
+    rng = random.Random(3)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "contact.db")
+            repository = ContactRepository(path)
+            conn = repository.connect()
+            contacts = synthetic_contacts(size)
+            with conn:
+                conn.executemany("INSERT INTO contacts (name, phone_number) VALUES (?, ?)", contacts)
+            names = [rng.choice(contacts)[0].upper() for _ in range(args.lookups)]
+
+            def legacy_lookup(name):
+                legacy = sqlite3.connect(path)
+                try:
+                    return legacy.execute("SELECT phone_number FROM contacts WHERE LOWER(name) = ?", (name.lower().strip(),)).fetchone()
+                finally:
+                    legacy.close()
+
+            def cold_lookup(name):
+                repository.cache.clear()
+                return repository.lookup("whatsapp", name)
+
+            print(f"{size} contacts")
+            for label, lookup, sample in (
+                ("connect + LOWER(name) scan", legacy_lookup, names[:max(1, args.lookups // 100)]),
+                ("repository, indexed query", cold_lookup, names),
+                ("repository, cached", lambda name: repository.lookup("whatsapp", name), [names[i % 50] for i in range(len(names))]),
+            ):
+                latencies = time_lookups(lookup, sample)
+                print(f"  {label:<28}: p50 {percentile(latencies, 50):9.1f} us, p95 {percentile(latencies, 95):9.1f} us ({len(sample)} lookups)")
+
+            started = time.perf_counter()
+            index = repository.name_index()
+            print(f"  fuzzy index build           : {(time.perf_counter() - started) * 1000:9.1f} ms")
+            queries = [(name, misspell(name, rng)) for name, _ in rng.sample(contacts, min(len(contacts), args.lookups // 10))]
+            latencies, found = [], 0
+            for name, spoken in queries:
+                started = time.perf_counter()
+                candidates = index.search(spoken, "whatsapp")
+                latencies.append((time.perf_counter() - started) * 1e6)
+                found += any(candidate == name for _, candidate, _ in candidates)
+            print(f"  fuzzy search (misspelled)   : p50 {percentile(latencies, 50):9.1f} us, p95 {percentile(latencies, 95):9.1f} us, "
+                  f"right name in top 5 for {found / len(queries):.1%}")
+            repository.close()
+    return 0
+
+def bench_import(args):
+    """Writes a synthetic phone book as CSV and as vCard (with a few duplicates), imports each into an empty database and exports it again."""
+    rng = random.Random(5)
+    contacts = synthetic_contacts(args.rows)
+    duplicates = rng.sample(contacts, len(contacts) // 100)
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path, vcf_path = os.path.join(folder, "contacts.csv"), os.path.join(folder, "contacts.vcf")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("Name,Phone 1 - Type,Phone 1 - Value,E-mail 1 - Value\n")
+            for name, number in contacts + duplicates:
+                f.write(f"{name.title()},Mobile,+91 {number[:5]} {number[5:]},{name.replace(' ', '.')}@example.com\n")
+        with open(vcf_path, "w", encoding="utf-8") as f:
+            for name, number in contacts + duplicates:
+                first, last = name.split(" ", 1)
+                f.write(f"BEGIN:VCARD\r\nVERSION:3.0\r\nN:{last.title()};{first.title()};;;\r\nFN:{name.title()}\r\n"
+                        f"TEL;TYPE=CELL:0{number}\r\nEMAIL;TYPE=INTERNET:{name.replace(' ', '.')}@example.com\r\nEND:VCARD\r\n")
+
+        for label, path in (("CSV", csv_path), ("vCard", vcf_path)):
+            repository = ContactRepository(os.path.join(folder, f"{label}.db"))
+            report = repository.import_contacts(read_contact_file(path))
+            print(f"{label:<6} import: {report['records']} records in {report['seconds']:.2f} s "
+                  f"({report['records'] / report['seconds']:,.0f} records/s), {report['whatsapp']} numbers, {report['email']} emails, "
+                  f"{report['duplicates']} duplicates, {report['invalid']} invalid")
+            export_path = os.path.join(folder, f"export{os.path.splitext(path)[1]}")
+            started = time.perf_counter()
+            written = repository.export_contacts(export_path)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<6} export: {written} contacts in {elapsed:.2f} s ({written / elapsed:,.0f} contacts/s)")
+            repository.close()
+    return 0
+
+# --- MAIL ---
+class StandInIMAPServer(socketserver.ThreadingTCPServer):
+    """Local IMAP stand-in holding one unread mailbox. Every command waits rtt seconds to imitate a round trip to a real server."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rtt=0.0, uidvalidity=1):
+        super().__init__(("127.0.0.1", 0), StandInIMAPHandler)
+        self.rtt = rtt
+        self.uidvalidity = uidvalidity
+        self.messages = []  # (uid, raw bytes)
+        self.commands = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def deliver(self, sender, subject, body=""):
+        message = EmailMessage()
+        message["From"], message["Subject"], message["Date"] = sender, subject, time.strftime("%a, %d %b %Y %H:%M:%S +0530")
+        message.set_content(body)
+        with self.lock:
+            self.messages.append((len(self.messages) + 1, message.as_bytes()))
+
+class StandInIMAPHandler(socketserver.StreamRequestHandler):
+    """Just enough IMAP4rev1 for imaplib and MailReader: LOGIN, SELECT/EXAMINE, NOOP, SEARCH and FETCH (plain and UID), IDLE and LOGOUT. Messages are never marked seen, so every run reads the same mailbox."""
+    def send(self, *lines):
+        self.wfile.write(b"".join(line if isinstance(line, bytes) else line.encode() + b"\r\n" for line in lines))
+
+    def handle(self):
+        server = self.server
+        self.send("* OK IMAP4rev1 stand-in ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            time.sleep(server.rtt)
+            server.commands += 1
+            tag, _, rest = line.decode().strip().partition(" ")
+            command, _, args = rest.partition(" ")
+            command, by_uid = command.upper(), False
+            if command == "UID":
+                command, _, args = args.partition(" ")
+                command, by_uid = command.upper(), True
+            with server.lock:
+                messages = list(server.messages)
+
+            if command == "CAPABILITY":
+                self.send("* CAPABILITY IMAP4rev1 IDLE", f"{tag} OK CAPABILITY completed")
+            elif command == "LOGIN":
+                self.send(f"{tag} OK LOGIN completed")
+            elif command in ("SELECT", "EXAMINE"):
+                self.send(f"* {len(messages)} EXISTS", f"* OK [UIDVALIDITY {server.uidvalidity}] UIDs valid", f"{tag} OK SELECT completed")
+            elif command == "NOOP":
+                self.send(f"* {len(messages)} EXISTS", f"{tag} OK NOOP completed")
+            elif command == "SEARCH":
+                numbers = [str(uid) if by_uid else str(seq) for seq, (uid, _) in enumerate(messages, 1)]
+                self.send(f"* SEARCH {' '.join(numbers)}", f"{tag} OK SEARCH completed")
+            elif command == "FETCH":
+                wanted, _, items = args.partition(" ")
+                wanted = {int(number) for number in wanted.split(",")}
+                for seq, (uid, raw) in enumerate(messages, 1):
+                    if (uid if by_uid else seq) not in wanted:
+                        continue
+                    if "HEADER.FIELDS" in items.upper():
+                        headers = b"".join(field + b"\r\n" for field in raw.split(b"\n\n")[0].split(b"\n")
+                                           if field.lower().startswith((b"from:", b"subject:", b"date:")))
+                        label, data = "BODY[HEADER.FIELDS (SUBJECT FROM DATE)]", headers + b"\r\n"
+                    else:
+                        label, data = "RFC822", raw
+                    self.send(f"* {seq} FETCH (UID {uid} {label} {{{len(data)}}}".encode() + b"\r\n" + data + b")\r\n")
+                self.send(f"{tag} OK FETCH completed")
+            elif command == "IDLE":
+                self.send("+ idling")
+                known = len(messages)
+                while True:
+                    if select.select([self.connection], [], [], 0.02)[0]:
+                        self.rfile.readline()  # DONE
+                        self.send(f"{tag} OK IDLE terminated")
+                        break
+                    with server.lock:
+                        count = len(server.messages)
+                    if count > known:
+                        known = count
+                        self.send(f"* {count} EXISTS")
+            elif command in ("CLOSE", "LOGOUT"):
+                if command == "LOGOUT":
+                    self.send("* BYE logging out", f"{tag} OK LOGOUT completed")
+                    return
+                self.send(f"{tag} OK CLOSE completed")
+            else:
+                self.send(f"{tag} BAD unsupported command")
+
+def legacy_check_emails(port, limit):
+    """The check_emails flow before MailReader: a new session per call and the full RFC822 message fetched one at a time."""
+    mail = imaplib.IMAP4("127.0.0.1", port)
+    mail.login("sir", "secret")
+    mail.select("inbox")
+    _, messages = mail.search(None, "UNSEEN")
+    email_ids = messages[0].split()
+    found = []
+    for i in range(min(limit, len(email_ids))):
+        _, msg_data = mail.fetch(email_ids[-(i + 1)], "(RFC822)")
+        for part in msg_data:
+            if isinstance(part, tuple):
+                message = email.message_from_bytes(part[1])
+                found.append((decode_mime_header(message.get("From")), decode_mime_header(message["Subject"])))
+    mail.close()
+    mail.logout()
+    return found
+
+def bench_mail(args):
+    """Compares the old per-call IMAP flow with MailReader (cold and warm) against the local stand-in, then measures how long IDLE takes to report new mail."""
+    server = StandInIMAPServer(rtt=args.rtt)
+    body = "x" * (args.body_kb * 1024)
+    for i in range(args.messages):
+        server.deliver(f"Sender {i} <sender{i}@example.com>", f"Report number {i}", body)
+    connect = lambda: imaplib.IMAP4("127.0.0.1", server.port)
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache_path = os.path.join(folder, "mail_headers.json")
+        results = {}
+        for label, check in (
+            ("per-call session + RFC822", lambda: legacy_check_emails(server.port, args.read)),
+            ("MailReader, cold", lambda: MailReader("sir", "secret", cache_path=cache_path, connect=connect).unseen(args.read)),
+        ):
+            latencies = []
+            for _ in range(args.rounds):
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+                started = time.perf_counter()
+                check()
+                latencies.append((time.perf_counter() - started) * 1000)
+            results[label] = latencies
+
+        reader = MailReader("sir", "secret", cache_path=cache_path, connect=connect)
+        reader.unseen(args.read)
+        commands = server.commands
+        latencies = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            count, latest = reader.unseen(args.read)
+            latencies.append((time.perf_counter() - started) * 1000)
+        results["MailReader, warm"] = latencies
+        print(f"{args.messages} unseen messages of {args.body_kb} KB, {args.rtt * 1000:.0f} ms per command, reading the latest {args.read}")
+        for label, latencies in results.items():
+            print(f"  {label:<26}: p50 {percentile(latencies, 50):8.1f} ms, p95 {percentile(latencies, 95):8.1f} ms")
+        print(f"  warm check sends {(server.commands - commands) / args.rounds:.0f} commands, newest: {latest[0]['sender']} / {latest[0]['subject']}")
+
+        arrived = threading.Event()
+        reader.watch(lambda headers: arrived.set())
+        time.sleep(0.5 + 4 * args.rtt)  # Let the watcher log in and enter IDLE
+        started = time.perf_counter()
+        server.deliver("Boss <boss@example.com>", "Urgent")
+        notified = arrived.wait(10)
+        print(f"  IDLE push notification    : {(time.perf_counter() - started) * 1000:8.1f} ms" if notified else "  IDLE push notification    : not received")
+        reader.close()
+    server.shutdown()
+    return 0 if notified else 1
+
+class StandInSMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that accepts and counts messages without delivering them. Every command waits rtt seconds, and the first fail_first transactions are answered with a temporary 421 and a dropped connection."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rtt=0.0, fail_first=0):
+        super().__init__(("127.0.0.1", 0), StandInSMTPHandler)
+        self.rtt = rtt
+        self.fail_first = fail_first
+        self.received = []
+        self.sessions = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    def send(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+        self.send("220 stand-in ESMTP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            time.sleep(server.rtt)
+            command = line.decode().strip().split(" ")[0].upper()
+            if command == "EHLO":
+                self.wfile.write(b"250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 OK\r\n")
+            elif command == "AUTH":
+                self.send("235 Authentication successful")
+            elif command == "MAIL":
+                with server.lock:
+                    failing = server.fail_first > 0
+                    server.fail_first -= failing
+                if failing:
+                    self.send("421 Service not available, try again later")
+                    return
+                self.send("250 OK")
+            elif command in ("RCPT", "RSET", "NOOP", "HELO"):
+                self.send("250 OK")
+            elif command == "DATA":
+                self.send("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b"\r\n") == b".":
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.received.append(b"".join(data))
+                self.send("250 OK queued")
+            elif command == "QUIT":
+                self.send("221 Bye")
+                return
+            else:
+                self.send("502 Command not implemented")
+
+def legacy_send(port, to_address, subject, body):
+    """The send_email_smtp flow before the outbox: connect, log in, send one message and quit, all while the caller waits."""
+    server = smtplib.SMTP("127.0.0.1", port)
+    try:
+        server.login("sir@example.com", "secret")
+        server.sendmail("sir@example.com", to_address, f"Subject: {subject}\n\n{body}")
+    finally:
+        server.quit()
+
+def bench_smtp(args):
+    """Sends a burst of emails to the local SMTP sink the old way and through MailOutbox, reporting how long the voice thread is blocked and how long delivery takes. The outbox run starts with injected temporary failures to exercise retry and backoff."""
+    sink = StandInSMTPSink(rtt=args.rtt)
+    blocked = []
+    for i in range(args.emails):
+        started = time.perf_counter()
+        legacy_send(sink.port, "friend@example.com", f"Note {i}", "Hello from Cypher.")
+        blocked.append((time.perf_counter() - started) * 1000)
+    print(f"{args.emails} emails, {args.rtt * 1000:.0f} ms per SMTP command")
+    print(f"  per-email session : voice thread blocked p50 {percentile(blocked, 50):7.1f} ms, total {sum(blocked):7.0f} ms, "
+          f"{sink.sessions} sessions")
+
+    sink = StandInSMTPSink(rtt=args.rtt, fail_first=args.fail_first)
+    with tempfile.TemporaryDirectory() as folder:
+        done = threading.Event()
+        results = []
+
+        def on_result(message, error):
+            results.append(error)
+            if len(results) == args.emails:
+                done.set()
+
+        outbox = MailOutbox("sir@example.com", "secret", path=os.path.join(folder, "outbox.db"), on_result=on_result,
+                            connect=lambda: smtplib.SMTP("127.0.0.1", sink.port), backoff=0.05)
+        started = time.perf_counter()
+        blocked = []
+        for i in range(args.emails):
+            call = time.perf_counter()
+            outbox.enqueue("friend@example.com", f"Note {i}", "Hello from Cypher.")
+            blocked.append((time.perf_counter() - call) * 1000)
+        done.wait(60)
+        elapsed = time.perf_counter() - started
+        outbox.close()
+    print(f"  outbox            : voice thread blocked p50 {percentile(blocked, 50):7.1f} ms, all delivered after {elapsed * 1000:7.0f} ms, "
+          f"{sink.sessions} sessions, {args.fail_first} injected failures, {sum(error is not None for error in results)} dropped, "
+          f"{len(sink.received)}/{args.emails} received")
+    return 0 if len(sink.received) == args.emails else 1
+
+
+# --- WIKIPEDIA ---
+def bench_wiki(args):
+    """Writes a synthetic gzipped abstracts dump, builds the offline index from it and times index lookups (hits and misses) and summary cache hits against a simulated network summary call of rtt seconds."""
+    rng = random.Random(7)
+    titles = [name.title() for name, _ in synthetic_contacts(args.pages)]
+    with tempfile.TemporaryDirectory() as folder:
+        dump = os.path.join(folder, "abstracts.xml.gz")
+        with gzip.open(dump, "wt", encoding="utf-8") as f:
+            f.write("<feed>\n")
+            for title in titles:
+                f.write(f"<doc><title>Wikipedia: {title}</title><url>https://en.wikipedia.org/wiki/{title.replace(' ', '_')}</url>"
+                        f"<abstract>{title} is a synthetic article used for benchmarking. It has a second sentence. And a third.</abstract>"
+                        f"<links><sublink linktype=\"nav\"><anchor>History</anchor><link>#History</link></sublink></links></doc>\n")
+            f.write("</feed>\n")
+
+        prefix = os.path.join(folder, "wiki_abstracts")
+        started = time.perf_counter()
+        count = WikiAbstractIndex.build(read_wiki_abstracts(dump), prefix)
+        elapsed = time.perf_counter() - started
+        sizes = {ext: os.path.getsize(prefix + ext) / 2 ** 20 for ext in (".idx", ".dat")}
+        print(f"index build    : {count} abstracts in {elapsed:.2f} s ({count / elapsed:,.0f}/s), "
+              f"dump {os.path.getsize(dump) / 2 ** 20:.1f} MiB -> idx {sizes['.idx']:.1f} MiB + dat {sizes['.dat']:.1f} MiB")
+
+        started = time.perf_counter()
+        index = WikiAbstractIndex.open(prefix)
+        print(f"index open     : {(time.perf_counter() - started) * 1e6:9.1f} us")
+        cache = WikiSummaryCache(os.path.join(folder, "wiki_cache.db"))
+        popular = rng.sample(titles, 200)
+        for title in popular:
+            cache.put(title, "summary", index.lookup(title))
+
+        queries = [rng.choice(titles).lower() for _ in range(args.lookups)]
+        misses = [f"{title} unknown" for title in queries[:len(queries) // 10]]
+        for label, lookup, sample in (
+            ("index hit", index.lookup, queries),
+            ("index miss", index.lookup, misses),
+            ("cache hit", cache.get, [popular[i % len(popular)] for i in range(len(queries))]),
+            ("network summary", lambda title: time.sleep(args.rtt), queries[:10]),
+        ):
+            latencies = time_lookups(lookup, sample)
+            print(f"{label:<15}: p50 {percentile(latencies, 50):9.1f} us, p95 {percentile(latencies, 95):9.1f} us ({len(sample)} lookups)")
+        index.close()
+        cache.close()
+    return 0
+
+# --- END TO END ---
+# Spoken turns of the synthesized corpus. Only intents that stay inside the stand-ins are used: nothing opens
+# windows, presses keys or reaches the internet. A list is one turn with follow-up answers.
+E2E_SCRIPT = [
+    "what is the weather in pune",
+    "tell me the news",
+    "check email",
+    "what time is it",
+    "set a timer for 10 minutes called pasta",
+    "list my alarms",
+    "cancel timer called pasta",
+    ["send an email to rahul", "rahul", "lunch plans", "see you at one"],
+    "explain quantum computing in simple words",
+    "who is the prime minister of india",
+    "are you there",
+    "weather in chennai",
+]
+E2E_ROUTE_COMMANDS = ["what time is it", "what is the date", "what day is it", "are you there", "list my alarms", "hmm", "stop"]
+E2E_REPLY = "Of course, Sir. This answer comes from the local benchmark server. It streams one word at a time, like a real provider."
+E2E_METRICS = {  # metric: (better direction, absolute change ignored as noise)
+    "first_audio_p50_ms": ("lower", 10.0),
+    "first_audio_p95_ms": ("lower", 20.0),
+    "turn_p50_ms": ("lower", 20.0),
+    "turn_p95_ms": ("lower", 50.0),
+    "turn_p99_ms": ("lower", 50.0),
+    "route_per_second": ("higher", 0.0),
+    "peak_rss_mib": ("lower", 10.0),
+    "peak_threads": ("lower", 4),
+    "leaked_threads": ("lower", 2),
+    "failed_turns": ("lower", 0),
+}
+
+def write_utterance(path, text, seed, rate=16000):
+    """Writes a stand-in recording of the utterance: a voiced burst about as long as the words take to say, between silences long enough to end the phrase."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * (0.2 + 0.25 * len(text.split())))) / rate
+    voice = 8000 * np.sin(2 * np.pi * 180 * t) + 4000 * np.sin(2 * np.pi * 720 * t) + rng.normal(0, 800, len(t))
+    voice *= np.minimum(1, 100 * np.minimum(t, t[-1] - t))  # 10 ms fades
+    samples = np.concatenate([np.zeros(int(0.3 * rate)), voice, np.zeros(int(0.9 * rate))]) + rng.normal(0, 30, len(t) + int(1.2 * rate))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.clip(samples, -32767, 32767).astype("<i2").tobytes())
+
+def synthesize_corpus(folder, script=E2E_SCRIPT):
+    """Writes one WAV per utterance of the script. Returns the turns as lists of (WAV path, transcript)."""
+    turns = []
+    for i, turn in enumerate(script):
+        utterances = [turn] if isinstance(turn, str) else turn
+        turns.append([])
+        for j, text in enumerate(utterances):
+            path = os.path.join(folder, f"turn{i:02d}_{j}.wav")
+            write_utterance(path, text, seed=i * 10 + j)
+            turns[-1].append((path, text))
+    return turns
+
+def load_corpus(folder):
+    """Reads <folder>/corpus.json: a list of turns, each {"audio": "file.wav", "transcript": "..."}, or lists of both for a turn with follow-up answers. Audio paths are relative to the folder."""
+    with open(os.path.join(folder, "corpus.json"), "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    turns = []
+    for entry in entries:
+        audio, transcript = entry["audio"], entry["transcript"]
+        if isinstance(audio, str):
+            audio, transcript = [audio], [transcript]
+        turns.append([(os.path.join(folder, path), text) for path, text in zip(audio, transcript)])
+    return turns
+
+class CorpusCapture:
+    """Stands in for AudioCapture. Each reader() plays the next recorded utterance of the current turn instead of the live microphone, and remembers its transcript for the STT stand-in."""
+    running = True
+    head = 0
+
+    def __init__(self):
+        self.pending = []
+        self.source = None
+        self.transcript = ""
+
+    def load(self, utterances):
+        self.pending = list(utterances)
+
+    def reader(self, position=None):
+        self.close()
+        if not self.pending:
+            raise sr.WaitTimeoutError("No recorded answer left in this turn.")
+        path, self.transcript = self.pending.pop(0)
+        self.source = sr.AudioFile(path).__enter__()
+        return self.source
+
+    def start(self, recognizer):
+        pass
+
+    def stop(self):
+        self.close()
+
+    def close(self):
+        if self.source is not None:
+            self.source.__exit__(None, None, None)
+            self.source = None
+
+class StandInServices(http.server.ThreadingHTTPServer):
+    """Local HTTP stand-in for the cloud services of a voice turn: speech recognition (/stt), AI replies streamed word by word (/llm), speech synthesis (/tts), OpenWeather (/weather) and NewsData (/news). Every endpoint waits its configured latency before answering, and fail_rate of all requests are answered with a 503."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency, token_delay=0.02, fail_rate=0.0, clip_seconds=0.3, seed=5):
+        super().__init__(("127.0.0.1", 0), StandInServiceHandler)
+        self.latency = latency  # endpoint -> seconds before the first byte
+        self.token_delay = token_delay
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.requests = {endpoint: 0 for endpoint in latency}
+        self.failures = 0
+        self.lock = threading.Lock()
+        clip = io.BytesIO()
+        with wave.open(clip, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            f.writeframes(b"\0\0" * int(24000 * clip_seconds))
+        self.clip = clip.getvalue()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def should_fail(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] += 1
+            failing = self.rng.random() < self.fail_rate
+            self.failures += failing
+        return failing
+
+class StandInServiceHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, body, content_type="application/json", status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.serve()
+
+    def do_POST(self):
+        self.serve()
+
+    def serve(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        endpoint, query = url.path.strip("/"), urllib.parse.parse_qs(url.query)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if endpoint not in server.latency:
+            return self.reply(b"{}", status=404)
+        time.sleep(server.latency[endpoint])
+        if server.should_fail(endpoint):
+            return self.reply(b'{"status": "error"}', status=503)
+
+        if endpoint == "llm":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in E2E_REPLY.split(" "):
+                data = (word + " ").encode()
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                time.sleep(server.token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+        elif endpoint == "tts":
+            self.reply(server.clip, "audio/wav")
+        elif endpoint == "stt":
+            self.reply(b'{"status": "ok"}')
+        elif endpoint == "weather":
+            city = query.get("q", ["Pune"])[0].title()
+            self.reply(json.dumps({"name": city, "main": {"temp": 29.4, "humidity": 62}, "weather": [{"description": "scattered clouds"}],
+                                   "wind": {"speed": 3.1}}).encode())
+        elif endpoint == "news":
+            first = 2 * server.requests["news"]  # Every refresh brings two new headlines and six repeats
+            self.reply(json.dumps({"status": "success", "results": [
+                {"article_id": f"standin{n}", "title": f"Stand-in headline number {n}"} for n in range(first, first + 8)
+            ]}).encode())
+
+class StandInCommunicate:
+    """Replaces edge_tts.Communicate: the clip is fetched from the /tts stand-in in the runtime's worker pool and handed out in edge-tts-sized audio chunks."""
+    def __init__(self, url, text, voice=None, rate=None):
+        self.url = url
+        self.text = text
+
+    async def stream(self):
+        fetch = functools.partial(requests.get, f"{self.url}/tts", params={"text": self.text}, timeout=10)
+        response = await asyncio.get_running_loop().run_in_executor(None, fetch)
+        response.raise_for_status()
+        for start in range(0, len(response.content), 4096):
+            yield {"type": "audio", "data": response.content[start:start + 4096]}
+
+class StandInNewsClient:
+    """Replaces NewsDataApiClient with requests to the /news stand-in."""
+    def __init__(self, url, apikey=None):
+        self.url = url
+
+    def latest_api(self, **params):
+        return requests.get(f"{self.url}/news", params=params, timeout=10).json()
+
+def stand_in_recognize(url, capture, audio_data, language=None, **kwargs):
+    """Replaces recognize_google: uploads the captured audio to the /stt stand-in and answers with the transcript of the utterance being played."""
+    response = requests.post(f"{url}/stt", data=audio_data.get_raw_data(), timeout=10)
+    if response.status_code != 200:
+        raise sr.RequestError(f"recognition request failed: {response.status_code}")
+    return capture.transcript
+
+def stand_in_llm_stream(url, history):
+    """An LLMProvider stream reading the /llm stand-in."""
+    response = requests.post(f"{url}/llm", json={"messages": history}, stream=True, timeout=10)
+    try:
+        response.raise_for_status()
+        for text in response.iter_content(chunk_size=None, decode_unicode=True):
+            if text:
+                yield clean_reply(text)
+    finally:
+        response.close()
+
+class ResourceSampler(threading.Thread):
+    """Samples the resident memory and OS thread count of this process until stopped, keeping the peaks."""
+    def __init__(self, interval=0.02):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        with self.process.oneshot():
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+            self.peak_threads = max(self.peak_threads, self.process.num_threads())
+
+def turn_latencies(trace_path, turns):
+    """Reads the tracer's JSONL log back. Returns the time from the start of each turn to its first reply sample, the duration of each turn and the span durations of every stage."""
+    spans = []
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            span = json.loads(line)
+            if span["turn"] in turns:
+                spans.append(span)
+    starts = {span["turn"]: span["ts"] for span in spans if span["stage"] == "turn"}
+    first_audio = {}
+    for span in spans:
+        if span["stage"] == "playback" and span["turn"] in starts:
+            heard = (span["ts"] + span["ms"] / 1000 - starts[span["turn"]]) * 1000
+            first_audio[span["turn"]] = min(heard, first_audio.get(span["turn"], heard))
+    stages = {}
+    for span in spans:
+        stages.setdefault(span["stage"], []).append(span["ms"])
+    return list(first_audio.values()), stages.pop("turn", []), stages
+
+def run_e2e(args, services, imap, smtp, turns, sampler):
+    """Wires a CypherCore to the stand-ins, plays every turn of the corpus through it and then measures process_command routing. Must run in a scratch folder, as the core keeps its databases and caches in the working directory."""
+    cypher.WEATHER_URL = f"{services.url}/weather"
+    cypher.NewsDataApiClient = functools.partial(StandInNewsClient, services.url)
+    cypher.edge_tts = types.SimpleNamespace(Communicate=functools.partial(StandInCommunicate, services.url))
+
+    threads_before = threading.active_count()
+    core = CypherCore()
+    core.tracer = SpanTracer("traces.jsonl", enabled=True)
+    core.capture = CorpusCapture()
+    core.recognizer.dynamic_energy_threshold = False  # Recordings played back to back leave no room noise to adapt to
+    core.stt.mode = "google"  # The STT stand-in answers in place of the cloud backend
+    core.recognizer.recognize_google = functools.partial(stand_in_recognize, services.url, core.capture)
+    core._gemini_stream = core._groq_stream = functools.partial(stand_in_llm_stream, services.url)
+    core.mail_reader = MailReader("sir@example.com", "secret", connect=lambda: imaplib.IMAP4("127.0.0.1", imap.port))
+    if MAIL_PUSH_NOTIFICATIONS:
+        core.mail_reader.watch(core._on_new_mail)
+    core.outbox = MailOutbox("sir@example.com", "secret", on_result=core._on_email_result, backoff=0.05,
+                             connect=lambda: smtplib.SMTP("127.0.0.1", smtp.port))
+    core.outbox.start()
+
+    core.check_env_variable()
+    core.load_memory()
+    core.is_running = True
+    core.contacts.save("email", "rahul", "rahul@example.com")
+
+    turn_ids, failed = [], 0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for utterances in turns:
+            core.capture.load(utterances)
+            turn_ids.append(core.tracer.begin_turn())
+            command = core.listen()
+            if command:
+                core.process_command(command)
+            else:
+                failed += 1
+            core.wait_until_silent()
+            core.tracer.end_turn()
+    turns_elapsed = time.perf_counter() - started
+
+    # Routing throughput: the same commands without speech, so only routing and the handlers are timed
+    core.speak = core.speak_stream = lambda *args: None
+    core.wait_until_silent = lambda: None
+    core.ui_print = lambda *args: None
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.route_commands):
+        call = time.perf_counter()
+        core.process_command(E2E_ROUTE_COMMANDS[i % len(E2E_ROUTE_COMMANDS)])
+        latencies.append((time.perf_counter() - call) * 1e6)
+    route_elapsed = time.perf_counter() - started
+
+    tts = core.get_tts_stats()
+    core.stop_execution()
+    time.sleep(1)  # Give finished workers time to exit
+    sampler.sample()
+    first_audio, turn_ms, stages = turn_latencies("traces.jsonl", set(turn_ids))
+    return {
+        "turns": len(turn_ids),
+        "turns_elapsed_s": turns_elapsed,
+        "first_audio": first_audio,
+        "turn_ms": turn_ms,
+        "stages": stages,
+        "route_us": latencies,
+        "route_per_second": args.route_commands / route_elapsed,
+        "failed_turns": failed,
+        "tts": tts,
+        "leaked_threads": threading.active_count() - threads_before,
+    }
+
+def compare_baseline(metrics, baseline, tolerance):
+    """Prints every metric next to its baseline value. Returns the names of the metrics that got worse by more than the tolerance (a fraction of the baseline, or the metric's noise allowance if that is larger)."""
+    regressions = []
+    print(f"Compared with the baseline (tolerance {tolerance:.0%}):")
+    for name, (better, noise) in E2E_METRICS.items():
+        if name not in baseline or name not in metrics:
+            continue
+        old, new = baseline[name], metrics[name]
+        worse = new - old if better == "lower" else old - new
+        regressed = worse > max(abs(old) * tolerance, noise)
+        change = f"{(new - old) / old:+.0%}" if old else f"{new - old:+g}"
+        print(f"  {name:<19}: {old:12.1f} -> {new:12.1f} ({change}){'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def bench_e2e(args):
+    """Drives a complete CypherCore through a corpus of recorded commands with every cloud service replaced by a local stand-in: STT, LLM, TTS, weather and news over HTTP, and the IMAP and SMTP stand-ins used above. Playback goes to SDL's silent dummy audio driver. Reports the time from the start of a turn to its first reply sample, whole-turn and per-stage latency percentiles, process_command routing throughput, peak RSS and thread count, and compares them with a stored baseline."""
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    for key in ("GEMINI_API_KEY", "GROQ_API_KEY", "OPENWEATHER_KEY", "NEWS_API_KEY", "EMAIL_USER", "EMAIL_PASS"):
+        os.environ[key] = "stand-in"
+    corpus = os.path.abspath(args.corpus) if args.corpus else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    sampler = ResourceSampler()
+    sampler.start()
+    imap = StandInIMAPServer(rtt=args.rtt)
+    for i in range(3):
+        imap.deliver(f"Colleague {i} <colleague{i}@example.com>", f"Project update {i}", "Short note.")
+    smtp = StandInSMTPSink(rtt=args.rtt, fail_first=1 if args.fail_rate else 0)
+    services = StandInServices({"stt": args.stt_latency, "llm": args.llm_latency, "tts": args.tts_latency,
+                                "weather": args.rtt, "news": args.rtt}, fail_rate=args.fail_rate)
+
+    home = os.getcwd()
+    log = io.StringIO()
+    with tempfile.TemporaryDirectory() as folder:
+        turns = load_corpus(corpus) if corpus else synthesize_corpus(folder)
+        os.chdir(folder)
+        try:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+                result = run_e2e(args, services, imap, smtp, turns, sampler)
+        finally:
+            os.chdir(home)
+    sampler.stopped.set()
+    services.shutdown()
+    imap.shutdown()
+    smtp.shutdown()
+
+    first_audio, turn_ms, route_us = result["first_audio"], result["turn_ms"], result["route_us"]
+    metrics = {
+        "first_audio_p50_ms": percentile(first_audio, 50),
+        "first_audio_p95_ms": percentile(first_audio, 95),
+        "turn_p50_ms": percentile(turn_ms, 50),
+        "turn_p95_ms": percentile(turn_ms, 95),
+        "turn_p99_ms": percentile(turn_ms, 99),
+        "route_per_second": result["route_per_second"],
+        "peak_rss_mib": sampler.peak_rss / 2 ** 20,
+        "peak_threads": sampler.peak_threads,
+        "leaked_threads": result["leaked_threads"],
+        "failed_turns": result["failed_turns"],
+    }
+    config = {"corpus": args.corpus or "synthetic", "rounds": args.rounds, "rtt": args.rtt, "stt_latency": args.stt_latency,
+              "llm_latency": args.llm_latency, "tts_latency": args.tts_latency, "fail_rate": args.fail_rate}
+
+    print(f"{result['turns']} turns ({len(turns)} x {args.rounds} rounds) in {result['turns_elapsed_s']:.1f} s: rtt {args.rtt * 1000:.0f} ms, "
+          f"STT {args.stt_latency * 1000:.0f} ms, LLM {args.llm_latency * 1000:.0f} ms, TTS {args.tts_latency * 1000:.0f} ms, "
+          f"{args.fail_rate:.0%} injected failures")
+    print(f"  first audio    : p50 {metrics['first_audio_p50_ms']:8.1f} ms, p95 {metrics['first_audio_p95_ms']:8.1f} ms, "
+          f"p99 {percentile(first_audio, 99):8.1f} ms ({len(first_audio)} turns answered)")
+    print(f"  whole turn     : p50 {metrics['turn_p50_ms']:8.1f} ms, p95 {metrics['turn_p95_ms']:8.1f} ms, p99 {metrics['turn_p99_ms']:8.1f} ms")
+    for stage, durations in sorted(result["stages"].items()):
+        print(f"  {stage:<15}: p50 {percentile(durations, 50):8.1f} ms, p95 {percentile(durations, 95):8.1f} ms ({len(durations)} spans)")
+    print(f"  routing        : {metrics['route_per_second']:,.0f} process_command calls/s, p50 {percentile(route_us, 50):7.1f} us, "
+          f"p99 {percentile(route_us, 99):7.1f} us ({len(route_us)} calls)")
+    print(f"  resources      : peak RSS {metrics['peak_rss_mib']:.1f} MiB, peak {metrics['peak_threads']} threads, "
+          f"{metrics['leaked_threads']} Python threads left after shutdown")
+    print(f"  failures       : {metrics['failed_turns']} turns without a command, {services.failures} of {sum(services.requests.values())} "
+          f"service requests failed, {len(smtp.received)} emails received, TTS cache {result['tts']['cache_hits']} hits / {result['tts']['cache_misses']} misses")
+
+    status = 0
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changed = {key: value for key, value in baseline.get("config", {}).items() if config.get(key) != value}
+        if changed:
+            print(f"Note: the baseline was recorded with different settings: {changed}")
+        regressions = compare_baseline(metrics, baseline["metrics"], args.tolerance)
+        if regressions:
+            print(f"REGRESSION in {', '.join(regressions)}")
+            status = 1
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "metrics": metrics}, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    return status
+
+# --- SPEECH RECOGNITION ---
+def transcript_words(text):
+    return re.sub(r"[^a-z0-9' ]", " ", text.lower()).split()
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance (substitutions, insertions and deletions) between two transcripts. Returns (errors, words in the reference)."""
+    reference, hypothesis = transcript_words(reference), transcript_words(hypothesis)
+    row = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        previous, row[0] = row[0], i
+        for j, heard in enumerate(hypothesis, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (word != heard))
+    return row[-1], len(reference)
+
+def bench_stt(args):
+    """Transcribes every utterance of a WAV corpus with each speech recognition backend and reports word error rate, real-time factor (processing time / audio duration) and the latency left once the speaker stops. The offline engine is fed the audio in microphone-sized chunks, as it would be while listening, so its remaining latency is only the final decode; a cloud backend only starts when the phrase is complete."""
+    recognizer = sr.Recognizer()
+    backends = [VoskSTT(args.model)]
+    if args.cloud:
+        backends.append(GoogleSTT(recognizer))
+    utterances = [utterance for turn in load_corpus(args.corpus) for utterance in turn]
+    clips = []
+    for path, reference in utterances:
+        with sr.AudioFile(path) as source:
+            clips.append((os.path.basename(path), reference, recognizer.record(source)))
+
+    status = 0
+    for backend in backends:
+        if not backend.available():
+            print(f"{backend.name:<7}: not available (pip install vosk, and unpack a model into '{args.model}')")
+            status = 1
+            continue
+        if hasattr(backend, "load"):
+            backend.load()
+        errors = words = 0
+        audio_seconds = processing_seconds = 0.0
+        remaining, partials = [], 0
+        for name, reference, audio in clips:
+            heard = []
+            started = time.perf_counter()
+            try:
+                if hasattr(backend, "stream"):
+                    stream = backend.stream(audio.sample_rate, audio.sample_width, on_partial=heard.append)
+                    chunk = 1024 * audio.sample_width
+                    for offset in range(0, len(audio.frame_data), chunk):
+                        stream.feed(audio.frame_data[offset:offset + chunk])
+                    ended = time.perf_counter()
+                    text = stream.finish()
+                else:
+                    ended = started
+                    text = backend.transcribe(audio)
+            except sr.UnknownValueError:
+                text = ""
+            except sr.RequestError as e:
+                print(f"{backend.name:<7}: request failed ({e})")
+                status = 1
+                break
+            finished = time.perf_counter()
+            processing_seconds += finished - started
+            audio_seconds += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            remaining.append((finished - ended) * 1000)
+            partials += len(heard)
+            wrong, count = word_errors(reference, text)
+            errors, words = errors + wrong, words + count
+            if args.show_errors and wrong:
+                print(f"  {name:<24} expected '{reference}', heard '{text}'")
+        if not remaining:
+            continue
+        print(f"{backend.name:<7}: WER {errors / max(1, words):6.1%} ({errors}/{words} words), RTF {processing_seconds / audio_seconds:.3f}, "
+              f"after speech p50 {percentile(remaining, 50):7.1f} ms, p95 {percentile(remaining, 95):7.1f} ms, "
+              f"{partials / len(remaining):.1f} partials per phrase ({len(remaining)} phrases, {audio_seconds:.0f} s of audio)")
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for Cypher.")
+    suites = parser.add_subparsers(dest="suite", required=True)
+
+    wakeword = suites.add_parser("wakeword", help="Wake-word spotter accuracy and latency on WAV fixtures.")
+    wakeword.add_argument("--fixtures", required=True, help="Folder with positive/ and negative/ WAV files.")
+    wakeword.add_argument("--templates", default=WAKE_WORD_TEMPLATE_DIR, help="Folder with wake-word recordings.")
+    wakeword.add_argument("--sensitivity", type=float, default=WAKE_WORD_SENSITIVITY)
+    wakeword.add_argument("--energy-threshold", type=float, default=ERROR_THRESHOLD)
+    wakeword.set_defaults(func=bench_wakeword)
+
+    routing = suites.add_parser("routing", help="Intent router golden corpus and micro-benchmark.")
+    routing.add_argument("--corpus", default="intent_corpus.json", help="JSON list of utterance/intent/slots cases.")
+    routing.add_argument("--phrases", type=int, default=5000, help="Synthetic phrases registered for the benchmark.")
+    routing.add_argument("--rounds", type=int, default=50, help="Passes over the corpus when timing.")
+    routing.set_defaults(func=bench_routing)
+
+    contacts = suites.add_parser("contacts", help="Contact lookup latency at several database sizes.")
+    contacts.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="Number of contacts per run.")
+    contacts.add_argument("--lookups", type=int, default=20000, help="Lookups timed per run (1%% of them for the legacy query).")
+    contacts.set_defaults(func=bench_contacts)
+
+    bulk = suites.add_parser("import", help="Bulk contact import and export throughput.")
+    bulk.add_argument("--rows", type=int, default=100000, help="Contacts in the synthetic phone book.")
+    bulk.set_defaults(func=bench_import)
+
+    mail = suites.add_parser("mail", help="Inbox checks against a local IMAP stand-in server.")
+    mail.add_argument("--messages", type=int, default=200, help="Unseen messages in the stand-in inbox.")
+    mail.add_argument("--body-kb", type=int, default=50, help="Body size of each message.")
+    mail.add_argument("--rtt", type=float, default=0.03, help="Seconds the stand-in waits before answering each command.")
+    mail.add_argument("--read", type=int, default=MAIL_READ_LIMIT, help="Newest messages read per check.")
+    mail.add_argument("--rounds", type=int, default=10)
+    mail.set_defaults(func=bench_mail)
+
+    smtp = suites.add_parser("smtp", help="Email sending against a local SMTP sink.")
+    smtp.add_argument("--emails", type=int, default=20)
+    smtp.add_argument("--rtt", type=float, default=0.03, help="Seconds the sink waits before answering each command.")
+    smtp.add_argument("--fail-first", type=int, default=2, help="Transactions the sink rejects with a temporary error.")
+    smtp.set_defaults(func=bench_smtp)
+
+    wiki = suites.add_parser("wiki", help="Offline Wikipedia index build and lookup latency.")
+    wiki.add_argument("--pages", type=int, default=200000, help="Abstracts in the synthetic dump.")
+    wiki.add_argument("--lookups", type=int, default=20000)
+    wiki.add_argument("--rtt", type=float, default=0.3, help="Seconds a network summary call is assumed to take.")
+    wiki.set_defaults(func=bench_wiki)
+
+    e2e = suites.add_parser("e2e", help="Whole voice turns on recorded audio against local stand-ins of every cloud service.")
+    e2e.add_argument("--corpus", help="Folder with corpus.json and its WAV files. Use commands that are safe to run on this machine. "
+                                      "Without it, a synthesized corpus of the built-in script is used.")
+    e2e.add_argument("--rounds", type=int, default=2, help="Passes over the corpus.")
+    e2e.add_argument("--rtt", type=float, default=0.05, help="Seconds the weather, news, IMAP and SMTP stand-ins wait per request.")
+    e2e.add_argument("--stt-latency", type=float, default=0.25, help="Seconds the speech recognition stand-in takes.")
+    e2e.add_argument("--llm-latency", type=float, default=0.3, help="Seconds before the AI stand-in sends its first word.")
+    e2e.add_argument("--tts-latency", type=float, default=0.15, help="Seconds before the speech synthesis stand-in answers.")
+    e2e.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of HTTP stand-in requests answered with a 503.")
+    e2e.add_argument("--route-commands", type=int, default=20000, help="process_command calls timed for routing throughput.")
+    e2e.add_argument("--baseline", help="JSON file from --save-baseline to compare with; regressions exit with status 1.")
+    e2e.add_argument("--save-baseline", help="Write this run's metrics to a JSON file.")
+    e2e.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction of the baseline.")
+    e2e.add_argument("--verbose", action="store_true", help="Show the assistant's own output.")
+    e2e.set_defaults(func=bench_e2e)
+
+    stt = suites.add_parser("stt", help="Speech recognition word error rate and real-time factor on a WAV corpus.")
+    stt.add_argument("--corpus", required=True, help="Folder with corpus.json and its WAV files, as for the e2e suite.")
+    stt.add_argument("--model", default=VOSK_MODEL_DIR, help="Vosk model folder for the offline engine.")
+    stt.add_argument("--cloud", action="store_true", help="Also send the corpus to Google's recognizer (needs the network).")
+    stt.add_argument("--show-errors", action="store_true", help="Print every phrase that was not recognized word for word.")
+    stt.set_defaults(func=bench_stt)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -251,6 +251,7 @@ class MainWindow(QtWidgets.QMainWindow):
     sig_log = pyqtSignal(str)
     sig_close = pyqtSignal()
     sig_state = pyqtSignal(str)
+    sig_stopped = pyqtSignal()
 
     def __init__(self):
         super().__init__()
@@ -356,6 +357,11 @@ class MainWindow(QtWidgets.QMainWindow):
         
         self.left_panel = HUDPanel("DIAGNOSTICS", self.tech_font, Qt.AlignLeft)
         self.left_panel.setFixedWidth(400)
+        self.trace_panel = HUDPanel("LATENCY P50/95", self.tech_font, Qt.AlignLeft)
+        self.trace_panel.setFixedWidth(400)
+        left_column = QtWidgets.QVBoxLayout()
+        left_column.addWidget(self.left_panel)
+        left_column.addWidget(self.trace_panel)
         
         img_path = os.path.join(os.path.dirname(__file__), "image.png")
         self.core = RotatingCore(img_path)
@@ -365,7 +371,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.right_panel = HUDPanel("SYSTEM STATUS", self.tech_font, Qt.AlignRight)
         self.right_panel.setFixedWidth(400)
         
-        middle_layout.addWidget(self.left_panel)
+        middle_layout.addLayout(left_column)
         middle_layout.addWidget(self.core, 1) 
         middle_layout.addWidget(self.right_panel)
         main_layout.addLayout(middle_layout)
@@ -405,6 +411,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.sig_log.connect(self.terminal.log)
         self.sig_close.connect(self.close_safely)
         self.sig_state.connect(self.core.set_state)
+        self.sig_stopped.connect(self.on_stopped)
         self.cypher = CypherCore()
 
         # esc
@@ -445,7 +452,12 @@ class MainWindow(QtWidgets.QMainWindow):
             net_str = f"NET_LINK  :: {'[ONLINE]' if connected else '[OFFLINE]'}"
             time_str = f"SYS_CLOCK :: {time.strftime('%H:%M:%S')}"
             
-            self.right_panel.update_data([f"CPU_LOAD  :: {cpu}%", f"MEM_ALLOC :: {ram}%", bat_str, net_str, time_str, "SEC_PROTO :: ACTIVE"])
+            llm_parts = []
+            for name, stats in self.cypher.get_provider_stats().items():
+                llm_parts.append(f"{name[0]} OFF" if stats["state"] == "open" else f"{name[0]} {stats['p50_ms']:.0f}")
+            llm_str = f"LLM_P50   :: {' / '.join(llm_parts)} ms" if llm_parts else "SEC_PROTO :: ACTIVE"
+            
+            self.right_panel.update_data([f"CPU_LOAD  :: {cpu}%", f"MEM_ALLOC :: {ram}%", bat_str, net_str, time_str, llm_str])
 
             curr_net = psutil.net_io_counters()
             recv_speed = (curr_net.bytes_recv - self.last_net.bytes_recv) / 1024 
@@ -453,6 +465,8 @@ class MainWindow(QtWidgets.QMainWindow):
             self.last_net = curr_net 
 
             disk_usage = psutil.disk_usage(os.getcwd()).percent
+            tts_stats = self.cypher.get_tts_stats()
+            tts_str = f"TTS_LAT   :: {tts_stats['p50_ms']:.0f} ms" if tts_stats["samples"] else "V_MODULE  :: READY"
             
             self.left_panel.update_data([
                 f"NET_DOWN  :: {recv_speed:.1f} KB/s",
@@ -460,7 +474,12 @@ class MainWindow(QtWidgets.QMainWindow):
                 f"DISK_USED :: {disk_usage}%",
                 f"THRD_CNT  :: {threading.active_count()}",
                 "AI_CORE   :: " + ("ONLINE" if self.core.is_active else "STANDBY"),
-                "V_MODULE  :: READY"
+                tts_str
+            ])
+
+            self.trace_panel.update_data([
+                f"{stage.upper():<9} :: {stats['p50_ms']:.0f} / {stats['p95_ms']:.0f} ms" if stats["samples"] else f"{stage.upper():<9} :: --"
+                for stage, stats in self.cypher.get_trace_stats().items()
             ])
 
         except Exception as e:
@@ -476,6 +495,9 @@ class MainWindow(QtWidgets.QMainWindow):
         if hasattr(self, 'ai_thread') and self.ai_thread and self.ai_thread.is_alive():
             self.terminal.log("Waiting for background tasks to terminate...")
             return
+        if hasattr(self, 'stop_thread') and self.stop_thread and self.stop_thread.is_alive():
+            self.terminal.log("Waiting for background tasks to terminate...")
+            return
 
         self.core.is_active = True
         self.btn_action.setText("TERMINATE SYSTEM")
@@ -498,7 +520,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ai_thread.start()
 
     def stop_system(self):
-        self.cypher.stop_execution() # Use instance method
+        # Shutting down joins background workers for a few seconds, so it runs off the GUI thread and on_stopped finishes the job
+        if hasattr(self, 'stop_thread') and self.stop_thread and self.stop_thread.is_alive():
+            return
+        self.btn_action.setEnabled(False)
+        self.btn_action.setText("HALTING...")
+        self.stop_thread = threading.Thread(target=self.run_stop)
+        self.stop_thread.daemon = True
+        self.stop_thread.start()
+
+    def run_stop(self):
+        try:
+            self.cypher.stop_execution() # Use instance method
+        except Exception as e:
+            print(f"Shutdown Error: {e}")
+        finally:
+            self.sig_stopped.emit()
+
+    @pyqtSlot()
+    def on_stopped(self):
         self.core.is_active = False
         self.core.set_state("idle")
         self.btn_action.setText("INITIATE PROTOCOL")
@@ -507,7 +547,10 @@ class MainWindow(QtWidgets.QMainWindow):
             font-family: '{self.tech_font}'; font-size: 24px; letter-spacing: 2px; 
             border-bottom-left-radius: 15px; border-bottom-right-radius: 15px; font-style: italic;
         """)
+        self.btn_action.setEnabled(True)
         self.terminal.log("System Halted.")
+        if getattr(self, 'close_pending', False):
+            QTimer.singleShot(1000, self.close)
 
     def run_ai(self):
         try:
@@ -532,12 +575,14 @@ class MainWindow(QtWidgets.QMainWindow):
     
     @pyqtSlot()
     def close_safely(self):
-        if self.core.is_active:
-            self.stop_system()
-        
         self.terminal.log("Shutdown Sequence Initiated...")
         self.btn_close.setEnabled(False)
-        QTimer.singleShot(1000, self.close)
+        if self.core.is_active:
+            # The window closes once on_stopped reports that the backend has halted
+            self.close_pending = True
+            self.stop_system()
+        else:
+            QTimer.singleShot(1000, self.close)
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
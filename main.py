@@ -18,24 +18,234 @@ import sqlite3
 from newsdataapi import NewsDataApiClient
 import edge_tts
 import asyncio
+import concurrent.futures
+import contextlib
+import functools
 from datetime import datetime, timedelta
 import random
 import io
 import imaplib
 import email
 from email.header import decode_header
+from email.message import EmailMessage
+from email.utils import formatdate
 import json
+import csv
 import speedtest
 from groq import Groq
 import wikipedia
 import re
+import queue
+import select
+import socketserver
+import itertools
+import sys
+import hashlib
+import heapq
+import mmap
+import gzip
+import bz2
+import xml.etree.ElementTree as ElementTree
+import wave
+import numpy as np
+from collections import deque, OrderedDict, namedtuple
+
+try:
+    import vosk  # Optional offline speech recognition
+except ImportError:
+    vosk = None
 
 
 load_dotenv()
 
 # --- CONSTANTS & DICTIONARIES ---
 ERROR_THRESHOLD = 300
-HISTORY_FILE = "chat_memory.json"
+HISTORY_FILE = "chat_memory.json"      # Snapshot of the conversation, replaced atomically on compaction
+HISTORY_JOURNAL = "chat_memory.jsonl"  # Append-only log of changes made since the snapshot
+
+# Microphone Capture
+WAKE_WORDS = ("cypher", "cipher", "saifer")
+MIC_RING_SECONDS = 30         # Audio kept in the ring buffer for the wake-word and command stages
+CALIBRATION_SECONDS = 0.5
+RECALIBRATE_INTERVAL = 60     # Seconds between background ambient-noise recalibrations
+WAKE_FOLLOW_UP_TIMEOUT = 0.6  # Seconds of audio after the wake word to check for a command spoken in the same breath
+
+# On-Device Wake-Word Spotting (template matching on MFCC features)
+WAKE_WORD_TEMPLATE_DIR = "wakeword"  # WAV recordings of the wake word; at least 2 enable the local spotter
+WAKE_WORD_SENSITIVITY = float(os.getenv("WAKE_WORD_SENSITIVITY", "0.5"))  # 0 = strict, 1 = lenient
+SPOTTER_RATE = 16000
+SPOTTER_WINDOW_SECONDS = 1.5
+SPOTTER_HOP_SECONDS = 0.1
+
+# Voice Activity Detection (gate in front of speech recognition)
+VAD_FRAME_SECONDS = 0.02
+VAD_MIN_SPEECH_FRAMES = 5     # 100 ms of consecutive speech frames before speech counts as started
+VAD_HANGOVER_FRAMES = 15      # 300 ms of speech status kept after the last speech frame
+VAD_PADDING_SECONDS = 0.15    # Silence left around the trimmed speech so word edges are not clipped
+VAD_MAX_ZCR = 0.35            # Zero-crossing rate above which quiet frames are treated as hiss rather than voice
+
+# Speech Recognition Backends
+STT_BACKEND = os.getenv("STT_BACKEND", "auto")    # "auto", "google" (cloud only) or "vosk" (offline only)
+STT_LANGUAGE = "en-IN"
+VOSK_MODEL_DIR = os.getenv("VOSK_MODEL", "vosk-model")  # Unpacked model from alphacephei.com/vosk/models
+STT_CLOUD_TIMEOUT = 5           # Seconds before a cloud recognition request is given up
+STT_CLOUD_MAX_LATENCY = 1500    # Milliseconds; while the cloud's recent median is slower, the offline engine is used
+STT_RETRY_INTERVAL = 60         # Seconds before the cloud is tried again after it failed or was too slow
+STT_WINDOW = 20                 # Recent recognitions per backend behind the latency decision
+
+# Early Dispatch (media keys and hotkeys fired from partial transcripts, before the phrase has ended)
+EARLY_DISPATCH = os.getenv("EARLY_DISPATCH", "1") == "1"
+EARLY_DISPATCH_INTENTS = ("hotkey", "media")
+EARLY_DISPATCH_STABLE = 0.2     # Seconds of audio a matching partial must stay unchanged before it fires
+EARLY_DISPATCH_MIN_WORDS = 2    # Single words ("copy", "find", "mute") too often begin a longer request
+
+# Speech Output
+TTS_VOICE = "hi-IN-SwaraNeural"
+TTS_RATE = "+20%"
+STREAM_REPLIES = True  # Speak AI replies sentence by sentence while they are still being generated
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u0964])[\"')\]]*\s+|\n+")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "e.g.", "i.e.", "etc."}
+
+# Progressive Playback (edge-tts streams 24 kHz / 48 kbps mono MP3, 144 bytes per 24 ms frame)
+FIRST_SEGMENT_BYTES = 1440   # ~0.25 s of audio before the first sound is played
+SEGMENT_BYTES = 6000         # ~1 s segments queued behind the one that is playing
+MP3_BITRATES = {
+    True: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],   # MPEG-1 Layer III
+    False: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2/2.5 Layer III
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# AI Providers
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "1.5"))  # Seconds to wait for the primary's first chunk before also asking the backup
+LLM_STREAM_TIMEOUT = 30         # Seconds without any chunk before a request is abandoned
+BREAKER_FAILURE_THRESHOLD = 3   # Consecutive failures that open a provider's circuit breaker
+BREAKER_COOLDOWN = 60           # Seconds a tripped provider is skipped before it gets a trial request
+
+# Conversation Context (what is sent to the AI on every request)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # Approximate tokens per request
+PINNED_MESSAGES = 4        # The system preamble from init_chat, always sent first
+SUMMARY_MAX_WORDS = 120    # Length asked for when older turns are folded into the rolling summary
+MAX_HISTORY = 200          # Hard cap on stored messages in case summarization keeps failing
+MEMORY_FLUSH_INTERVAL = 1.0   # Seconds between batched journal writes
+MEMORY_COMPACT_RECORDS = 200  # Journal records that trigger folding the journal into a new snapshot
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Contacts
+CONTACT_DB = "contact.db"
+CONTACT_CACHE_SIZE = 1024  # Lookups (including misses) remembered until the next write
+CONTACT_MATCH_THRESHOLD = 0.75  # Fuzzy match score above which a clear best candidate is used without asking
+CONTACT_SCORE_LIMIT = 50        # Most candidates scored per search
+CONTACT_POSTING_VISITS = 1500   # Most index postings read per search, keeping searches under a millisecond
+EMAIL_PATTERN = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+# Hinglish spelling variants folded together before phonetic coding ("Raahul" -> "rahul", "Shweta" -> "sveta")
+HINGLISH_FOLDS = [("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"), ("ph", "f"), ("bh", "b"), ("dh", "d"),
+                  ("th", "t"), ("kh", "k"), ("gh", "g"), ("jh", "j"), ("sh", "s"), ("ck", "k"), ("w", "v"), ("z", "j"),
+                  ("q", "k"), ("x", "ks"), ("y", "i")]
+SOUNDEX_CODES = {**dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+                 "l": "4", **dict.fromkeys("mn", "5"), "r": "6"}
+
+# Mail
+IMAP_HOST = "imap.gmail.com"
+IMAP_PORT = 993
+MAIL_HEADER_CACHE = "mail_headers.json"  # Decoded Subject/From/Date keyed by UIDVALIDITY and UID
+MAIL_HEADER_CACHE_SIZE = 500
+MAIL_READ_LIMIT = 3
+MAIL_PUSH_NOTIFICATIONS = os.getenv("MAIL_PUSH_NOTIFICATIONS", "1") == "1"  # Watch the inbox with IMAP IDLE
+IMAP_IDLE_SECONDS = 25 * 60  # IDLE is renewed before servers time it out (RFC 2177 allows 29 minutes)
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+OUTBOX_DB = "outbox.db"         # Emails waiting to be sent survive a restart
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_BACKOFF = 5              # Seconds before the first retry, doubled after every failure
+OUTBOX_MAX_BACKOFF = 600
+SMTP_IDLE_SECONDS = 240         # An unused SMTP session is closed before the server drops it
+
+# Weather
+DEFAULT_CITY = os.getenv("DEFAULT_CITY", "Mumbai")
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+WEATHER_TTL = 600               # Seconds a report is answered from memory without asking the API
+WEATHER_STALE_TTL = 3 * 3600    # Older reports are still answered instantly while a refresh runs in the background
+WEATHER_REFRESH_INTERVAL = 540  # The default city is refreshed just before its report goes stale
+
+# I/O Runtime
+RUNTIME_WORKERS = 16           # Shared pool for blocking calls (HTTP clients, provider streams, refreshes, GUI automation)
+SPEECH_WORKERS = 6             # Pool reserved for speech producers and players, so playback never queues behind background work
+RUNTIME_SHUTDOWN_TIMEOUT = 2   # Seconds stop_execution waits for cancelled work to unwind
+HTTP_POOL_HOSTS = 8            # Hosts the shared HTTP session keeps connection pools for
+WIKI_TIMEOUT = 10
+SPEEDTEST_TIMEOUT = 90
+
+# News
+NEWS_REFRESH_INTERVAL = 900     # Seconds between background headline refreshes
+NEWS_DAILY_QUOTA = int(os.getenv("NEWS_DAILY_QUOTA", "200"))  # API credits per day (NewsData free plan)
+NEWS_STALE_SECONDS = 3600       # Older briefings are introduced with their age
+NEWS_HEADLINES = 5
+NEWS_SEEN_LIMIT = 1000          # Headlines remembered to drop repeats across refreshes
+
+# Latency Tracing
+TRACE_ENABLED = os.getenv("CYPHER_TRACE", "1") == "1"
+TRACE_FILE = os.getenv("CYPHER_TRACE_FILE", "traces.jsonl")  # One JSON span per line; "" keeps spans in memory only
+TRACE_FILE_MAX_BYTES = 5 * 1024 * 1024  # The log is rotated to <file>.1 beyond this size
+TRACE_WINDOW = 200                      # Recent spans per stage used for the rolling percentiles
+TRACE_STAGES = ("wake", "stt", "route", "llm", "tts", "playback")
+
+# Alarms & Timers
+TIMERS_FILE = "timers.json"     # Pending alarms, timers and reminders, restored on startup
+TIMER_MAX_WAIT = 60             # The scheduler re-reads the wall clock at least this often (suspend, clock changes)
+TIMER_MISSED_GRACE = 6 * 3600   # One-shot timers that fell due while Cypher was off are still announced if this recent
+DURATION_UNITS = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600, "day": 86400, "week": 604800}
+DURATION_PATTERN = re.compile(r"\b(\d+(?:\.\d+)?|half an?|an?)\s*(second|sec|minute|min|hour|hr|day|week)s?\b")
+RECURRENCE_PATTERN = re.compile(r"\bevery\s+(?:(\d+)\s+)?(second|minute|hour|day|week)s?\b|\b(hourly|daily|weekly)\b")
+CLOCK_PATTERN = re.compile(r"\b(\d{1,2})(?::|\.(?!\d{2}\s*(?:second|sec|minute|min|hour|hr|day|week)))(\d{2})\b")  # "1.25 hours" is a duration
+TIMER_FILLER_WORDS = {"cancel", "stop", "delete", "the", "my", "a", "an", "all", "alarm", "alarms", "timer", "timers",
+                      "reminder", "reminders", "called", "named", "for", "at", "to", "please"}
+
+# Wikipedia
+WIKI_CACHE_DB = "wiki_cache.db"  # Summaries, disambiguation options and misses, evicted least recently used first
+WIKI_CACHE_SIZE = 2000
+WIKI_CACHE_TTL = 30 * 86400      # Seconds a cached summary or disambiguation answer is trusted
+WIKI_MISS_TTL = 86400            # "No such page" is re-checked sooner, as pages get created
+WIKI_SENTENCES = 2
+WIKI_INDEX = os.getenv("WIKI_INDEX", "wiki_abstracts")  # Offline index files <WIKI_INDEX>.idx and <WIKI_INDEX>.dat
+WIKI_OFFLINE = os.getenv("WIKI_OFFLINE", "0") == "1"    # Never go to the network, answer only from the cache and index
+
+# Headless Mode
+HEADLESS_HOST = "127.0.0.1"  # The command socket only accepts local connections
+HEADLESS_SLOWEST = 5         # Distinct commands listed in the replay report
+
+# TTS Audio Cache
+TTS_CACHE_DIR = "tts_cache"
+TTS_CACHE_MEMORY_BYTES = 8 * 1024 * 1024
+TTS_CACHE_DISK_BYTES = 64 * 1024 * 1024
+TTS_CACHE_MAX_CHARS = 200  # Longer one-off replies are not worth storing
+
+# Fixed Phrases (spoken word for word, so they are synthesized once and served from the cache)
+GREETINGS = {
+    "night": "You are up late, Sir.",
+    "morning": "Good Morning, Sir.",
+    "afternoon": "Good Afternoon, Sir.",
+    "evening": "Good Evening, Sir.",
+}
+ACTIVATE_MESSAGES = ["Yes, Sir?", "At your service.", "I'm here, Sir.", "Ready, Sir."]
+FAREWELL_MESSAGES = [
+    "Powering down all systems. Have a productive day, Sir.",
+    "Disconnecting from the mainframe. Namaste, Sir.",
+    "Shutting down. I will be ready when you need me next.",
+    "Going offline. Take care, Sir.",
+    "System hibernation initiated. Goodbye.",
+]
+COMMON_PHRASES = [
+    "Okay sir",
+    "Right away, Sir.",
+    "Entering standby mode.",
+    "Yes sir, I am here.",
+    "Could you please be more specific, Sir?",
+    "Memory Cleared. Starting fresh.",
+    "Checking for new emails, Sir...",
+    "You have no new emails, Sir.",
+    "That is all for now, Sir.",
+    "I didn't hear a name.",
+]
 
 WEB_LINKS = {
     "google": "https://www.google.com",
@@ -97,43 +307,2746 @@ APPS_NAMES = {
     "file explorer" : "File Explorer",
 }
 
+# Intent Registry: (intent, priority, trigger phrases, slot pattern, exact match only[, wins when it leads])
+# Triggers match whole words only. When several intents match, the highest priority wins, then the longest phrase.
+# A leading intent whose trigger comes first in the utterance wins outright, so the task of a reminder cannot set off the action it names.
+INTENTS = [
+    ("web_link", 100, list(WEB_LINKS), None, False),
+    ("hotkey", 90, [phrase for phrase in HOTKEYS if " " in phrase], None, False),
+    ("hotkey", 90, [phrase for phrase in HOTKEYS if " " not in phrase], None, True),  # "copy", "find", "lock"... only on their own, not in "find my phone"
+    ("media", 80, list(MEDIA_KEYS), None, False),
+    ("open_app", 70, ["open"], r"\bopen\s+(?P<app>.+)", False),
+    ("type_text", 65, ["type what i say"], None, False),
+    ("sleep_pc", 65, ["put on sleep"], None, False),
+    ("shutdown_pc", 65, ["shutdown", "shut down the computer"], None, False),
+    ("restart_pc", 65, ["restart"], None, False),
+    ("weather", 60, ["weather", "temperature"], r"\b(?:in|for|at)\s+(?P<city>[a-z][a-z .'-]*?)\s*(?:today|now|right now|please)?$", False),
+    ("send_email", 60, ["send email", "send an email", "send a mail"], None, False),
+    ("check_email", 60, ["check email", "read email", "check emails", "read emails", "check my email", "read my emails"], None, False),
+    ("internet_speed", 60, ["check internet speed", "internet speed"], None, False),
+    ("news", 55, ["news", "headlines"], None, False),
+    ("whatsapp", 60, ["send message on whatsapp", "whatsapp message", "message on whatsapp"], None, False),
+    ("add_contact", 60, ["add contact", "save contact", "new contact"], None, False),
+    ("wikipedia", 55, ["wikipedia"], r"(?:search wikipedia for|search wikipedia|wikipedia for|wikipedia)\s*(?P<topic>.*)", False),
+    ("reset_chat", 55, ["new session", "reset chat", "clear history"], None, False),
+    ("set_alarm", 50, ["set alarm", "set an alarm"], r"\b(?P<time>\d{1,2}[:. ]\d{2})\b", False, True),
+    ("set_timer", 50, ["set timer", "set a timer", "start a timer", "start timer", "timer for"], r"\b(?:called|named)\s+(?P<label>.+)$", False, True),
+    ("set_reminder", 50, ["remind me", "set a reminder", "set reminder"], r"\bremind me\s+(?:to\s+)?(?P<task>.+)$", False, True),
+    ("list_timers", 50, ["list alarms", "list timers", "list reminders", "pending alarms", "pending timers", "my alarms", "my timers", "my reminders"], None, False),
+    ("cancel_alarm", 50, ["cancel alarm", "stop alarm", "cancel the alarm", "cancel all alarms", "cancel timer", "stop timer",
+                          "cancel the timer", "cancel all timers", "cancel reminder", "cancel the reminder", "cancel all reminders"],
+     r"\b(?:alarm|timer|reminder)s?\s+(?:called\s+|named\s+|for\s+|at\s+|to\s+)?(?P<name>.+)$", False),
+    ("time", 40, ["time", "what time"], None, False),
+    ("date", 40, ["date", "today's date"], None, False),
+    ("day", 40, ["day", "what day"], None, False),
+    ("presence", 40, ["are you there"], None, False),
+    ("stop_speaking", 45, ["stop speaking", "stop talking"], None, False),
+    ("stop_speaking", 45, ["stop"], None, True),
+    ("turn_off", 45, ["turn off"], None, False),
+]
+
+def split_sentences(buffer):
+    """Splits finished sentences off the front of a streamed text buffer. Returns the list of complete sentences and the unfinished remainder."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        candidate = buffer[start:match.end()].strip()
+        if candidate and candidate.split()[-1].lower() in ABBREVIATIONS:
+            continue
+        if candidate:
+            sentences.append(candidate)
+        start = match.end()
+    return sentences, buffer[start:]
+
+def complete_mp3_frames(buffer):
+    """Returns how many leading bytes of the buffer form complete MPEG Layer III frames, or None if the buffer does not start with an MP3 frame."""
+    pos = 0
+    while pos + 4 <= len(buffer):
+        b1, b2 = buffer[pos + 1], buffer[pos + 2]
+        version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if (buffer[pos] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or layer != 1
+                or bitrate_index in (0, 15) or rate_index == 3):
+            return pos if pos else None
+        bitrate = MP3_BITRATES[version == 3][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        size = (144 if version == 3 else 72) * bitrate // sample_rate + ((b2 >> 1) & 1)
+        if pos + size > len(buffer):
+            break
+        pos += size
+    return pos
+
+def pcm_to_array(data, sample_width):
+    """Converts little-endian PCM bytes to float samples on the 16-bit scale used by the energy thresholds."""
+    if sample_width == 1:
+        return (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) * 256
+    if sample_width == 4:
+        return np.frombuffer(data, dtype="<i4").astype(np.float32) / 65536
+    return np.frombuffer(data, dtype="<i2").astype(np.float32)
+
+def load_wav(path):
+    """Reads a PCM WAV file and returns its mono samples (16-bit scale) and sample rate."""
+    with wave.open(path, "rb") as wav:
+        rate, channels, width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+        samples = pcm_to_array(wav.readframes(wav.getnframes()), width)
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+def percentile(values, pct):
+    """Returns the pct-th percentile of a list of numbers using the nearest-rank method."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def count_tokens(text):
+    """Approximates the provider tokenizers: one token per word or symbol, plus one for every 6 further characters of long words."""
+    return sum(1 + len(piece) // 6 for piece in TOKEN_PATTERN.findall(text))
+
+def message_tokens(messages):
+    """Approximate token count of a list of chat messages, including a small per-message overhead."""
+    return sum(4 + sum(count_tokens(part.get("text", "")) for part in message["parts"]) for message in messages)
+
+def normalize_phone(number):
+    """Reduces a spoken or written phone number to a 10-digit Indian mobile number, or returns None if it is not one."""
+    digits = "".join(filter(str.isdigit, number))
+    if len(digits) > 10 and digits.startswith("91"):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]
+    return digits if re.match(r"^[6-9]\d{9}$", digits) else None
+
+def normalize_email(address):
+    address = address.strip().lower()
+    return address if EMAIL_PATTERN.match(address) else None
+
+def _unfolded_lines(f):
+    """Yields vCard content lines with folded continuation lines joined back on."""
+    pending = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+def read_vcards(path):
+    """Yields (name, phone numbers, email addresses) for every card in a vCard file, one card at a time."""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        name, structured, phones, emails = "", "", [], []
+        for line in _unfolded_lines(f):
+            key, _, value = line.partition(":")
+            prop = key.split(";")[0].split(".")[-1].upper()  # Drops parameters and "item1." group prefixes
+            value = value.replace("\\,", ",").replace("\\;", ";").strip()
+            if prop == "BEGIN":
+                name, structured, phones, emails = "", "", [], []
+            elif prop == "FN":
+                name = value
+            elif prop == "N":
+                parts = value.split(";")
+                structured = " ".join(part for part in parts[1:2] + parts[:1] if part)  # Given name, then family name
+            elif prop == "TEL":
+                phones.append(value)
+            elif prop == "EMAIL":
+                emails.append(value)
+            elif prop == "END":
+                yield name or structured, phones, emails
+
+def read_contact_csv(path):
+    """Yields (name, phone numbers, email addresses) for every row of a CSV export. Columns are found by header, so plain name/phone/email files and phone-book exports with columns like "Phone 1 - Value" both work."""
+    with open(path, "r", newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.DictReader(f)
+        headers = [(header, header.lower()) for header in reader.fieldnames or []]
+        usable = [(header, lowered) for header, lowered in headers if "type" not in lowered and "label" not in lowered]
+        name_columns = [header for header, lowered in usable if lowered in ("name", "full name", "display name")] or \
+                       [header for header, lowered in usable if "name" in lowered][:1]
+        phone_columns = [header for header, lowered in usable if any(word in lowered for word in ("phone", "mobile", "number", "whatsapp"))]
+        email_columns = [header for header, lowered in usable if "mail" in lowered]
+        for row in reader:
+            name = " ".join((row.get(header) or "").strip() for header in name_columns).strip()
+            # Phone-book exports put several values in one cell separated by ":::"
+            phones = [value for header in phone_columns for value in (row.get(header) or "").split(":::") if value.strip()]
+            emails = [value for header in email_columns for value in (row.get(header) or "").split(":::") if value.strip()]
+            yield name, phones, emails
+
+def read_contact_file(path):
+    """Picks the vCard or CSV reader by file extension."""
+    if path.lower().endswith((".vcf", ".vcard")):
+        return read_vcards(path)
+    return read_contact_csv(path)
+
+def decode_mime_header(value):
+    """Decodes an RFC 2047 encoded header such as a non-ASCII subject into plain text."""
+    if not value:
+        return ""
+    return "".join(
+        part.decode(charset or "utf-8", errors="replace") if isinstance(part, bytes) else str(part)
+        for part, charset in decode_header(value)
+    )
+
+def read_wiki_abstracts(path):
+    """Yields (title, abstract) for every page of a Wikipedia abstracts dump (enwiki-latest-abstract.xml, optionally .gz or .bz2), parsing it incrementally."""
+    opener = gzip.open if path.endswith(".gz") else bz2.open if path.endswith(".bz2") else open
+    with opener(path, "rb") as f:
+        title = ""
+        for _, elem in ElementTree.iterparse(f):
+            if elem.tag == "title":
+                title = (elem.text or "").removeprefix("Wikipedia: ").strip()
+            elif elem.tag == "abstract":
+                abstract = " ".join((elem.text or "").split())
+                # Pages that open with an infobox or table leave markup fragments instead of prose
+                if title and len(abstract) > 20 and not abstract.startswith(("|", "{", "}")):
+                    yield title, abstract
+            elif elem.tag == "doc":
+                elem.clear()
+
+def first_sentences(text, count=WIKI_SENTENCES):
+    sentences, rest = split_sentences(text + " ")
+    return " ".join((sentences + [rest.strip()])[:count]).strip()
+
+def parse_duration(text):
+    """Adds up spoken durations such as "1 hour 30 minutes" or "half an hour". Returns seconds, or None if there are none."""
+    total = 0
+    for amount, unit in DURATION_PATTERN.findall(text.lower()):
+        value = 0.5 if amount.startswith("half") else 1 if amount in ("a", "an") else float(amount)
+        total += value * DURATION_UNITS[unit]
+    return total or None
+
+def parse_recurrence(text):
+    """Returns the repeat interval in seconds for phrases like "every day", "every 2 hours" or "hourly", or None."""
+    match = RECURRENCE_PATTERN.search(text.lower())
+    if not match:
+        return None
+    count, unit, adverb = match.groups()
+    if adverb:
+        return {"hourly": 3600, "daily": 86400, "weekly": 604800}[adverb]
+    return int(count or 1) * DURATION_UNITS[unit]
+
+def next_clock_time(hour, minute, now=None):
+    """Returns the timestamp of the next time the wall clock reads hour:minute (today or tomorrow)."""
+    now = now or datetime.now()
+    due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if due <= now:
+        due += timedelta(days=1)
+    return due.timestamp()
+
+def describe_duration(seconds):
+    """Speaks a duration such as 5400 seconds as "1 hour and 30 minutes", keeping the two largest units."""
+    seconds = int(round(seconds))
+    parts = []
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60), ("second", 1)):
+        count, seconds = divmod(seconds, size)
+        if count:
+            parts.append(f"{count} {unit}{'s' if count != 1 else ''}")
+    return " and ".join(parts[:2]) or "0 seconds"
+
+def describe_interval(seconds):
+    """Speaks a repeat interval: "day" rather than "1 day", so it reads naturally after "every"."""
+    duration = describe_duration(seconds)
+    return duration[2:] if duration.startswith("1 ") and " and " not in duration else duration
+
+def describe_age(seconds):
+    """Speaks a duration the way a person would say how long ago something happened."""
+    minutes = int(seconds // 60)
+    if minutes < 120:
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    return f"{minutes // 60} hours"
+
+def clean_reply(text):
+    """Removes markdown symbols that sound wrong when spoken."""
+    return text.replace("*", "").replace("#", "").replace("`", "")
+
+class AudioStream(queue.Queue):
+    """Queue of audio chunks for one utterance, stamped with the moment its synthesis was requested and the voice turn it belongs to."""
+    def __init__(self, turn=None):
+        super().__init__()
+        self.started_at = time.perf_counter()
+        self.turn = turn
+
+class SpanTracer:
+    """Records how long each stage of a voice turn takes (wake word, speech recognition, routing, AI provider, synthesis, playback start). begin_turn() hands out the turn ID that every span started during the turn is tagged with, also when the span ends on another thread. Spans go to a rolling window per stage for the GUI percentiles and are appended to a JSONL log once per turn; export_chrome() turns the log into a Chrome trace-event file. A span costs two perf_counter() calls and a deque append, and nothing at all when tracing is disabled or no turn is active."""
+    def __init__(self, path=TRACE_FILE, enabled=TRACE_ENABLED, window=TRACE_WINDOW):
+        self.path = path
+        self.enabled = enabled
+        self.turn = None
+        self.turn_started = None
+        self.last_turn = int(time.time() * 1000)  # Turn IDs stay unique across restarts sharing one log
+        self.durations = {stage: deque(maxlen=window) for stage in TRACE_STAGES}
+        self.pending = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.epoch = time.time()
+
+    def begin_turn(self, started=None):
+        """Starts a new turn (at the given perf_counter() time, by default now) and returns its ID."""
+        if not self.enabled:
+            return None
+        self.last_turn += 1
+        self.turn = self.last_turn
+        self.turn_started = started or time.perf_counter()
+        return self.turn
+
+    def end_turn(self):
+        """Closes the current turn and writes out the spans finished so far. Spans still running (playback) are written with the next turn."""
+        if self.turn is None:
+            return
+        self.record("turn", self.turn_started)
+        self.turn = None
+        self.flush()
+
+    def start(self, stage):
+        """Opens a span that may be finished on another thread. Returns a token for finish(), or None when there is nothing to trace."""
+        if self.turn is None:
+            return None
+        return stage, self.turn, time.perf_counter()
+
+    def finish(self, token, **args):
+        if token is not None:
+            stage, turn, started = token
+            self.record(stage, started, turn=turn, **args)
+
+    @contextlib.contextmanager
+    def span(self, stage, **args):
+        """Times the enclosed block as one span of the current turn."""
+        token = self.start(stage)
+        try:
+            yield args  # The block may add attributes to the span
+        finally:
+            self.finish(token, **args)
+
+    def record(self, stage, started, ended=None, turn=None, **args):
+        """Adds a span given its perf_counter() start (and end, by default now)."""
+        turn = turn or self.turn
+        if not self.enabled or turn is None:
+            return
+        ended = ended or time.perf_counter()
+        duration_ms = (ended - started) * 1000
+        span = {"turn": turn, "stage": stage, "ts": round(self.epoch + started - self.origin, 6), "ms": round(duration_ms, 3), **args}
+        with self.lock:
+            if stage in self.durations:
+                self.durations[stage].append(duration_ms)
+            self.pending.append(span)
+
+    def flush(self):
+        with self.lock:
+            spans, self.pending = self.pending, []
+        if not spans or not self.path:
+            return
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_FILE_MAX_BYTES:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(span) + "\n" for span in spans))
+        except OSError as e:
+            print(f"Trace Write Error: {e}")
+
+    def stats(self):
+        """Returns the rolling p50/p95 latency in milliseconds and the sample count of every stage."""
+        with self.lock:
+            windows = {stage: list(durations) for stage, durations in self.durations.items()}
+        return {stage: {"p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95), "samples": len(values)}
+                for stage, values in windows.items()}
+
+    def export_chrome(self, out_path):
+        """Converts the JSONL log (including the rotated part) into a Chrome trace-event file for chrome://tracing or Perfetto. Every stage gets its own row, and every turn a row-spanning slice on top. Returns the number of spans written."""
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                  for tid, name in enumerate(("turn",) + TRACE_STAGES)]
+        rows = {name: tid for tid, name in enumerate(("turn",) + TRACE_STAGES)}
+        count = 0
+        for path in (self.path + ".1", self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        span = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line
+                    args = {key: value for key, value in span.items() if key not in ("stage", "ts", "ms")}
+                    events.append({"name": span["stage"], "cat": "voice", "ph": "X", "pid": 1, "tid": rows.get(span["stage"], len(rows)),
+                                   "ts": round(span["ts"] * 1e6), "dur": round(span["ms"] * 1000), "args": args})
+                    count += 1
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return count
+
+class TTSCache:
+    """Two-tier cache of synthesized speech keyed by (text, voice, rate). A byte-bounded in-memory LRU sits in front of an on-disk store of MP3 files named by the hash of the key."""
+    def __init__(self, directory=TTS_CACHE_DIR, memory_limit=TTS_CACHE_MEMORY_BYTES, disk_limit=TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, voice, rate):
+        return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _remember(self, key, audio):
+        """Stores audio in the memory tier, evicting the least recently used clips beyond the size limit."""
+        with self.lock:
+            if key in self.entries:
+                self.memory_bytes -= len(self.entries.pop(key))
+            self.entries[key] = audio
+            self.memory_bytes += len(audio)
+            while self.memory_bytes > self.memory_limit and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+
+    def get(self, text, voice=TTS_VOICE, rate=TTS_RATE, count=True):
+        """Returns the cached MP3 bytes for the utterance, or None. Disk hits are promoted to memory."""
+        key = self.key(text, voice, rate)
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return audio
+
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            audio = None
+
+        if not audio:
+            if count:
+                self.misses += 1
+            return None
+        self._remember(key, audio)
+        if count:
+            self.hits += 1
+            self.disk_hits += 1
+        return audio
+
+    def put(self, text, audio, voice=TTS_VOICE, rate=TTS_RATE):
+        """Adds a fully synthesized clip to both tiers. The file is written under a temporary name and renamed so readers never see a partial clip."""
+        if not audio or len(text) > TTS_CACHE_MAX_CHARS:
+            return
+        key = self.key(text, voice, rate)
+        self._remember(key, audio)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"TTS Cache Write Error: {e}")
+
+    def prune_disk(self):
+        """Deletes the least recently used clips until the on-disk store fits its size limit."""
+        try:
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+            files = sorted((os.path.getmtime(path), os.path.getsize(path), path) for path in files)
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.disk_limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "cache_hits": self.hits,
+                "cache_disk_hits": self.disk_hits,
+                "cache_misses": self.misses,
+                "cache_entries": len(self.entries),
+                "cache_bytes": self.memory_bytes,
+            }
+
+class AudioCapture:
+    """Keeps one microphone stream open for the whole session and copies its audio into a ring buffer. Chunks are numbered, so the wake-word stage and the command stage can read the same audio from their own positions without reopening the device or losing speech between listening windows."""
+    def __init__(self, source_factory=sr.Microphone, ring_seconds=MIC_RING_SECONDS):
+        self.source_factory = source_factory
+        self.ring_seconds = ring_seconds
+        self.source = None
+        self.ring = deque()
+        self.head = 0  # Sequence number of the next chunk to be captured
+        self.cond = threading.Condition()
+        self.running = False
+        self.capture_thread = None
+
+    def start(self, recognizer):
+        """Opens the microphone, starts filling the ring buffer, calibrates the recognizer once and keeps recalibrating it in the background."""
+        if self.running:
+            return
+        self.source = self.source_factory()
+        self.source.__enter__()
+        self.SAMPLE_RATE = self.source.SAMPLE_RATE
+        self.SAMPLE_WIDTH = self.source.SAMPLE_WIDTH
+        self.CHUNK = self.source.CHUNK
+        with self.cond:
+            self.ring = deque(maxlen=self.chunks_for(self.ring_seconds))
+            self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+
+        recognizer.adjust_for_ambient_noise(self.reader(), duration=CALIBRATION_SECONDS)
+        threading.Thread(target=self._calibration_loop, args=(recognizer,), daemon=True).start()
+
+    def stop(self):
+        """Stops capturing, wakes up any blocked readers and releases the microphone."""
+        with self.cond:
+            if not self.running:
+                return
+            self.running = False
+            self.cond.notify_all()
+        if self.capture_thread:
+            self.capture_thread.join(timeout=1)
+        try:
+            self.source.__exit__(None, None, None)
+        except Exception as e:
+            print(f"Mic Close Error: {e}")
+
+    def chunks_for(self, seconds):
+        return max(1, int(seconds * self.SAMPLE_RATE / self.CHUNK))
+
+    def _capture_loop(self):
+        while self.running:
+            try:
+                data = self.source.stream.read(self.CHUNK)
+            except Exception as e:
+                print(f"Mic Capture Error: {e}")
+                data = b""
+            with self.cond:
+                if not data:
+                    self.running = False
+                else:
+                    self.ring.append(data)
+                    self.head += 1
+                self.cond.notify_all()
+
+    def _calibration_loop(self, recognizer):
+        """Periodically re-measures the ambient noise on the most recent audio. A sudden jump is taken to be speech rather than noise and is ignored."""
+        while self.running:
+            time.sleep(RECALIBRATE_INTERVAL)
+            if not self.running:
+                break
+            probe = sr.Recognizer()
+            probe.energy_threshold = recognizer.energy_threshold
+            probe.adjust_for_ambient_noise(self.reader(self.head - self.chunks_for(CALIBRATION_SECONDS)), duration=CALIBRATION_SECONDS)
+            if probe.energy_threshold < recognizer.energy_threshold * 2:
+                recognizer.energy_threshold = probe.energy_threshold
+
+    def read(self, position):
+        """Returns the chunk at the given sequence number and the next position, blocking until it has been captured. Readers that fell behind the ring skip ahead to the oldest chunk still kept. Returns empty audio once capture has stopped."""
+        with self.cond:
+            while self.running and position >= self.head:
+                self.cond.wait(0.5)
+            oldest = self.head - len(self.ring)
+            position = max(position, oldest)
+            if position >= self.head:
+                return b"", position
+            return self.ring[position - oldest], position + 1
+
+    def reader(self, position=None):
+        """Returns an audio source that reads the ring buffer from the given position, or from the live edge."""
+        return RingBufferSource(self, self.head if position is None else position)
+
+class RingBufferSource(sr.AudioSource):
+    """Audio source over the capture ring buffer, so sr.Recognizer can listen to buffered audio like a microphone."""
+    def __init__(self, capture, position):
+        self.capture = capture
+        self.position = position
+        self.SAMPLE_RATE = capture.SAMPLE_RATE
+        self.SAMPLE_WIDTH = capture.SAMPLE_WIDTH
+        self.CHUNK = capture.CHUNK
+        self.stream = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def read(self, size=None):
+        data, self.position = self.capture.read(self.position)
+        return data
+
+    def seek(self, position):
+        self.position = position
+
+class WakeWordSpotter:
+    """CPU keyword spotter for the wake word. Incoming audio is turned into MFCC features and compared against enrolled recordings with subsequence dynamic time warping, so the wake word is found locally without sending audio to the cloud."""
+    def __init__(self, template_dir=WAKE_WORD_TEMPLATE_DIR, sensitivity=WAKE_WORD_SENSITIVITY):
+        self.sensitivity = sensitivity
+        self.frame_size, self.frame_step, self.nfft = 400, 160, 512  # 25 ms frames every 10 ms at 16 kHz
+        self.window = np.hamming(self.frame_size)
+        self.mel_filters = self._mel_filterbank(26)
+        self.dct = self._dct_matrix(26, 13)
+        self.templates = []
+        self.threshold = None
+        self.eval_latencies = deque(maxlen=500)
+        if template_dir and os.path.isdir(template_dir):
+            self.load_templates(template_dir)
+
+    @property
+    def ready(self):
+        return len(self.templates) >= 2
+
+    def _mel_filterbank(self, count):
+        to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+        to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+        points = to_hz(np.linspace(to_mel(60), to_mel(SPOTTER_RATE / 2), count + 2))
+        bins = np.floor((self.nfft + 1) * points / SPOTTER_RATE).astype(int)
+        filters = np.zeros((count, self.nfft // 2 + 1))
+        for i in range(count):
+            left, center, right = bins[i], bins[i + 1], bins[i + 2]
+            filters[i, left:center] = (np.arange(left, center) - left) / max(center - left, 1)
+            filters[i, center:right] = (right - np.arange(center, right)) / max(right - center, 1)
+        return filters
+
+    def _dct_matrix(self, inputs, outputs):
+        n = np.arange(inputs)
+        return np.cos(np.pi / inputs * (n[None, :] + 0.5) * np.arange(outputs)[:, None])
+
+    def features(self, samples, rate, trim=False):
+        """Returns MFCCs (without the energy coefficient) normalized by the mean of the voiced frames. With trim, leading and trailing unvoiced frames are cut off."""
+        if rate != SPOTTER_RATE:
+            count = int(len(samples) * SPOTTER_RATE / rate)
+            samples = np.interp(np.linspace(0, len(samples) - 1, count), np.arange(len(samples)), samples)
+        samples = np.append(samples[:1], samples[1:] - 0.97 * samples[:-1])
+        if len(samples) < self.frame_size:
+            samples = np.pad(samples, (0, self.frame_size - len(samples)))
+
+        count = 1 + (len(samples) - self.frame_size) // self.frame_step
+        index = np.arange(self.frame_size)[None, :] + self.frame_step * np.arange(count)[:, None]
+        power = np.abs(np.fft.rfft(samples[index] * self.window, self.nfft)) ** 2 / self.nfft
+        mfcc = np.log(power @ self.mel_filters.T + 1e-6) @ self.dct.T
+
+        # Frames within 20 dB of the loudest one count as voiced, so silence does not shift the normalization
+        energy = np.log(power.sum(axis=1) + 1e-6)
+        voiced = energy > energy.max() - np.log(100)
+        features = mfcc[:, 1:] - mfcc[voiced, 1:].mean(axis=0)
+        if trim:
+            active = np.nonzero(voiced)[0]
+            features = features[active[0]:active[-1] + 1]
+        return features
+
+    def distance(self, template, features):
+        """Subsequence DTW distance of the template against the best-matching stretch of the features, averaged per template frame."""
+        rows, cols = len(template), len(features)
+        if cols < rows // 2:
+            return np.inf
+        cost = np.sqrt(((template[:, None, :] - features[None, :, :]) ** 2).sum(axis=2))
+        acc = np.full((rows, cols), np.inf)
+        acc[0] = cost[0]
+        for i in range(1, rows):
+            best = np.full(cols, np.inf)
+            best[1:] = acc[i - 1, :-1]
+            best[2:] = np.minimum(best[2:], acc[i - 1, :-2])
+            if i >= 2:
+                best[1:] = np.minimum(best[1:], acc[i - 2, :-1])
+            acc[i] = cost[i] + best
+        return acc[-1].min() / rows
+
+    def load_templates(self, template_dir):
+        """Loads the wake-word recordings and derives the detection threshold from how far apart they are from each other."""
+        self.templates = []
+        for name in sorted(os.listdir(template_dir)):
+            if name.lower().endswith(".wav"):
+                try:
+                    samples, rate = load_wav(os.path.join(template_dir, name))
+                    self.templates.append(self.features(samples, rate, trim=True))
+                except (wave.Error, EOFError, ValueError) as e:
+                    print(f"Wake Word Template Error ({name}): {e}")
+        if self.ready:
+            pairs = [self.distance(a, b) for i, a in enumerate(self.templates) for j, b in enumerate(self.templates) if i != j]
+            self.threshold = float(np.mean(pairs)) * (0.9 + 0.6 * self.sensitivity)
+
+    def score(self, samples, rate):
+        """Returns the smallest template distance for a window of audio."""
+        started = time.perf_counter()
+        window = self.features(samples, rate)
+        best = min(self.distance(template, window) for template in self.templates)
+        self.eval_latencies.append((time.perf_counter() - started) * 1000)
+        return best
+
+    def detect(self, samples, rate):
+        return self.ready and self.score(samples, rate) <= self.threshold
+
+    def spot(self, source, should_continue, energy_threshold):
+        """Reads audio from the source until the wake word is detected. Windows are only scored while someone is speaking. Returns False if should_continue() turns False or the audio ends first."""
+        chunk_seconds = source.CHUNK / source.SAMPLE_RATE
+        window = deque(maxlen=max(1, int(SPOTTER_WINDOW_SECONDS / chunk_seconds)))
+        hop = max(1, int(SPOTTER_HOP_SECONDS / chunk_seconds))
+        since_score, voiced_left = 0, 0
+        while should_continue():
+            data = source.stream.read(source.CHUNK)
+            if not data:
+                return False
+            samples = pcm_to_array(data, source.SAMPLE_WIDTH)
+            window.append(samples)
+            voiced_left = window.maxlen if np.sqrt(np.mean(samples ** 2)) > energy_threshold else voiced_left - 1
+            since_score += 1
+            if since_score >= hop and voiced_left > 0:
+                since_score = 0
+                if self.detect(np.concatenate(window), source.SAMPLE_RATE):
+                    return True
+        return False
+
+class VoiceActivityDetector:
+    """Lightweight speech detector run before every recognition call. Frame energy and zero-crossing rate are computed with numpy for the whole window at once, smoothed with a minimum-duration and hangover rule, and used to trim leading and trailing silence or drop windows without any speech."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows_checked = 0
+        self.windows_dropped = 0
+        self.seconds_in = 0.0
+        self.seconds_saved = 0.0
+
+    def speech_frames(self, samples, rate, energy_threshold):
+        """Returns a boolean per frame telling whether it belongs to speech after smoothing."""
+        frame = max(1, int(rate * VAD_FRAME_SECONDS))
+        count = len(samples) // frame
+        if not count:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:count * frame].reshape(count, frame)
+        energy = np.sqrt(np.mean(frames ** 2, axis=1))
+        zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+        raw = (energy > energy_threshold) & ((zcr < VAD_MAX_ZCR) | (energy > 2 * energy_threshold))
+
+        smoothed = np.zeros(count, dtype=bool)
+        run, hangover = 0, 0
+        for i, is_speech in enumerate(raw):
+            run = run + 1 if is_speech else 0
+            if run >= VAD_MIN_SPEECH_FRAMES:
+                smoothed[i - run + 1:i + 1] = True
+                hangover = VAD_HANGOVER_FRAMES
+            elif hangover > 0:
+                smoothed[i] = True
+                hangover -= 1
+        return smoothed
+
+    def trim(self, audio, energy_threshold):
+        """Returns the AudioData cut down to its speech plus a little padding, or None if it contains no speech."""
+        samples = pcm_to_array(audio.frame_data, audio.sample_width)
+        rate, width = audio.sample_rate, audio.sample_width
+        duration = len(samples) / rate
+        speech = np.nonzero(self.speech_frames(samples, rate, energy_threshold))[0]
+
+        with self.lock:
+            self.windows_checked += 1
+            self.seconds_in += duration
+            if not len(speech):
+                self.windows_dropped += 1
+                self.seconds_saved += duration
+                return None
+
+            frame = int(rate * VAD_FRAME_SECONDS)
+            padding = int(rate * VAD_PADDING_SECONDS)
+            start = max(0, speech[0] * frame - padding)
+            end = min(len(samples), (speech[-1] + 1) * frame + padding)
+            self.seconds_saved += (len(samples) - (end - start)) / rate
+        return sr.AudioData(audio.frame_data[start * width:end * width], rate, width)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "windows_checked": self.windows_checked,
+                "requests_saved": self.windows_dropped,
+                "audio_seconds_in": round(float(self.seconds_in), 1),
+                "audio_seconds_saved": round(float(self.seconds_saved), 1),
+            }
+
+class GoogleSTT:
+    """Cloud speech recognition through the Google Web Speech API client of SpeechRecognition. Accurate, but every phrase waits for a network round trip and nothing works offline."""
+    name = "google"
+
+    def __init__(self, recognizer, language=STT_LANGUAGE):
+        self.recognizer = recognizer
+        self.language = language
+
+    def available(self):
+        return True
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+class VoskSTT:
+    """Offline, CPU-only speech recognition with a Vosk (Kaldi) model. stream() returns a recognizer that is fed audio while it is being captured and reports partial hypotheses on the way, so the transcript is ready as soon as the phrase ends. Needs `pip install vosk` and a model unpacked into VOSK_MODEL_DIR; the model is loaded once, in the background."""
+    name = "vosk"
+
+    def __init__(self, model_dir=VOSK_MODEL_DIR):
+        self.model_dir = model_dir
+        self.model = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        return vosk is not None and os.path.isdir(self.model_dir)
+
+    def load(self):
+        with self.lock:
+            if self.model is None:
+                started = time.perf_counter()
+                vosk.SetLogLevel(-1)
+                self.model = vosk.Model(self.model_dir)
+                print(f"Offline speech model loaded in {time.perf_counter() - started:.1f} s.")
+            return self.model
+
+    def stream(self, sample_rate, sample_width, on_partial=None):
+        return VoskStream(self.load(), sample_rate, sample_width, on_partial)
+
+    def transcribe(self, audio):
+        stream = self.stream(audio.sample_rate, audio.sample_width)
+        stream.feed(audio.frame_data)
+        return stream.finish()
+
+class VoskStream:
+    """One phrase being recognized by Vosk while it is captured. on_partial(text) is called whenever the running hypothesis changes."""
+    def __init__(self, model, sample_rate, sample_width, on_partial=None):
+        self.recognizer = vosk.KaldiRecognizer(model, sample_rate)
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.on_partial = on_partial
+        self.segments = []  # Text of the segments Vosk has already finalized
+        self.partial = ""
+
+    def feed(self, data):
+        if self.sample_width != 2:
+            data = sr.AudioData(data, self.sample_rate, self.sample_width).get_raw_data(convert_width=2)
+        if self.recognizer.AcceptWaveform(data):
+            segment = json.loads(self.recognizer.Result()).get("text", "")
+            if segment:
+                self.segments.append(segment)
+            partial = " ".join(self.segments)
+        else:
+            partial = " ".join(self.segments + [json.loads(self.recognizer.PartialResult()).get("partial", "")]).strip()
+        if partial != self.partial:
+            self.partial = partial
+            if partial and self.on_partial:
+                self.on_partial(partial)
+
+    def finish(self):
+        """Returns the final transcript, or raises sr.UnknownValueError if nothing was recognized."""
+        text = " ".join(self.segments + [json.loads(self.recognizer.FinalResult()).get("text", "")]).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class StreamingSource(sr.AudioSource):
+    """Wraps an audio source so that every chunk sr.Recognizer reads from it is also fed to a streaming recognizer. end_phrase(seconds), if given, is called after every chunk with its duration; once it returns True, reads return nothing, which ends the phrase sr.Recognizer is listening to without waiting for the pause."""
+    def __init__(self, source, stream, end_phrase=None):
+        self.source = source
+        self.recognizer_stream = stream
+        self.end_phrase = end_phrase
+        self.ended = False
+        self.SAMPLE_RATE = source.SAMPLE_RATE
+        self.SAMPLE_WIDTH = source.SAMPLE_WIDTH
+        self.CHUNK = source.CHUNK
+        self.stream = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def read(self, size=None):
+        if self.end_phrase is not None and self.ended:
+            return b""
+        data = self.source.stream.read(size)
+        if data:
+            self.recognizer_stream.feed(data)
+            if self.end_phrase is not None:
+                self.ended = self.end_phrase(len(data) / (self.SAMPLE_RATE * self.SAMPLE_WIDTH))
+        return data
+
+class SpeechToText:
+    """Chooses the speech recognition backend for every phrase. In "auto" mode the cloud is used while it is reachable and its recent median latency stays under STT_CLOUD_MAX_LATENCY; after a failure or a slow spell the offline engine takes over, and the cloud gets another chance after STT_RETRY_INTERVAL. Whenever the offline engine is ready, the captured audio is also streamed into it as it arrives, which provides partial transcripts and makes falling back after a failed cloud request instant."""
+    def __init__(self, cloud, local, mode=STT_BACKEND):
+        self.cloud = cloud
+        self.local = local
+        self.mode = mode
+        self.latencies = {cloud.name: deque(maxlen=STT_WINDOW), local.name: deque(maxlen=STT_WINDOW)}
+        self.cloud_retry_at = 0.0
+        self.lock = threading.Lock()
+
+    def local_ready(self):
+        return self.mode != self.cloud.name and self.local.available()
+
+    def prepare(self):
+        """Loads the offline model (blocking), so the first phrase does not wait for it."""
+        if self.local_ready():
+            self.local.load()
+
+    def stream(self, source, on_partial=None, end_phrase=None):
+        """Returns (source, stream): the source wrapped so that its audio also feeds an offline stream, or the source unchanged and None while the offline engine is unavailable or still loading."""
+        if not self.local_ready() or self.local.model is None:
+            return source, None
+        stream = self.local.stream(source.SAMPLE_RATE, source.SAMPLE_WIDTH, on_partial)
+        return StreamingSource(source, stream, end_phrase), stream
+
+    def choose(self):
+        """Returns the backend for the next phrase."""
+        if self.local_ready() and (self.mode == self.local.name or time.time() < self.cloud_retry_at):
+            return self.local
+        return self.cloud
+
+    def transcribe(self, audio, stream=None):
+        """Returns (transcript, backend name). Raises sr.UnknownValueError if the phrase was not understood, and sr.RequestError only if no backend could be reached."""
+        backend = self.choose()
+        if backend is self.cloud:
+            started = time.perf_counter()
+            try:
+                text = self.cloud.transcribe(audio)
+            except sr.RequestError as e:
+                if self.mode != "auto" or not self.local_ready():
+                    raise
+                with self.lock:
+                    self.cloud_retry_at = time.time() + STT_RETRY_INTERVAL
+                print(f"Cloud STT unavailable ({e}). Using offline recognition.")
+            else:
+                self._record(self.cloud, started)
+                return text, self.cloud.name
+
+        started = time.perf_counter()
+        text = stream.finish() if stream is not None else self.local.transcribe(audio)
+        self._record(self.local, started)
+        return text, self.local.name
+
+    def _record(self, backend, started):
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            latencies = self.latencies[backend.name]
+            latencies.append(latency_ms)
+            slow = backend is self.cloud and len(latencies) >= 3 and percentile(list(latencies), 50) > STT_CLOUD_MAX_LATENCY
+            if slow and self.mode == "auto" and self.local_ready():
+                self.cloud_retry_at = time.time() + STT_RETRY_INTERVAL
+                latencies.clear()  # Judge the cloud afresh when it is tried again
+                print(f"Cloud STT is slow (median over {STT_CLOUD_MAX_LATENCY} ms). Using offline recognition.")
+
+class EarlyDispatcher:
+    """Recognizes deterministic commands (media keys and hotkeys) from the partial transcripts of the offline recognizer, so they can run before the speaker has paused and before the final transcript is in. A partial qualifies when it is exactly one such trigger phrase of at least EARLY_DISPATCH_MIN_WORDS words, the router picks it, and no registered phrase starts with it ("volume" could still become "volume up" or "volume down"). It fires once it has stayed the same for EARLY_DISPATCH_STABLE seconds of audio; on_fire(match) then runs the action at once and listening stops."""
+    def __init__(self, router, on_fire, intents=EARLY_DISPATCH_INTENTS, stable=EARLY_DISPATCH_STABLE):
+        self.router = router
+        self.on_fire = on_fire
+        self.intents = intents
+        self.stable = stable
+        self.reset()
+
+    def reset(self, forward=None):
+        """Starts a new phrase. Partials are passed on to forward(text) as well."""
+        self.forward = forward
+        self.candidate = None
+        self.candidate_since = 0.0
+        self.heard = 0.0  # Seconds of audio read in this phrase
+        self.fired = None
+
+    def on_partial(self, text):
+        if self.forward is not None:
+            self.forward(text)
+        tokens = self.router.tokenize(text)
+        while tokens and tokens[0] in WAKE_WORDS:
+            tokens.pop(0)
+        match = self.router.route(" ".join(tokens))
+        if (match is None or match.intent not in self.intents or len(tokens) < EARLY_DISPATCH_MIN_WORDS
+                or tokens != self.router.tokenize(match.phrase) or self.router.continues(tokens)):
+            self.candidate = None
+        elif self.candidate is None or self.candidate.phrase != match.phrase:
+            self.candidate, self.candidate_since = match, self.heard
+
+    def on_audio(self, seconds):
+        """Advances the phrase clock by one chunk. Returns True once a command has fired, to end the phrase."""
+        self.heard += seconds
+        if self.fired is None and self.candidate is not None and self.heard - self.candidate_since >= self.stable:
+            self.fired = self.candidate
+            self.on_fire(self.fired)
+        return self.fired is not None
+
+class LLMProvider:
+    """One streaming AI backend together with its circuit breaker and latency statistics. open_stream(history) must return an iterator of text chunks."""
+    def __init__(self, name, open_stream):
+        self.name = name
+        self.open_stream = open_stream
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.outcomes = deque(maxlen=50)
+        self.latencies = deque(maxlen=100)  # Time to first chunk in milliseconds
+
+    def available(self):
+        """False while the breaker is open. After the cooldown the provider is half-open and gets a trial request."""
+        with self.lock:
+            return self.opened_at is None or time.time() - self.opened_at >= BREAKER_COOLDOWN
+
+    def record_success(self, latency_ms):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.outcomes.append(True)
+            self.latencies.append(latency_ms)
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.outcomes.append(False)
+            if self.opened_at is not None or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                self.opened_at = time.time()
+
+    def stats(self):
+        with self.lock:
+            latencies, outcomes = list(self.latencies), list(self.outcomes)
+            state = "closed" if self.opened_at is None else ("open" if time.time() - self.opened_at < BREAKER_COOLDOWN else "half-open")
+        return {
+            "state": state,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "error_rate": outcomes.count(False) / len(outcomes) if outcomes else 0.0,
+            "requests": len(outcomes),
+        }
+
+class AsyncRuntime:
+    """The assistant's I/O runtime: one asyncio event loop on a background thread, a shared worker pool for blocking calls, a small pool reserved for speech and one pooled requests.Session for HTTP. Work started through it (edge-tts streams, refresh loops, provider requests, playback) can be bounded by a timeout, and close() cancels everything still in flight in one place instead of leaving orphaned threads behind. Work submitted after close() comes back already cancelled; start() brings up a fresh runtime."""
+    def __init__(self, workers=RUNTIME_WORKERS, speech_workers=SPEECH_WORKERS):
+        self.workers = workers
+        self.speech_workers = speech_workers
+        self.loop = None
+        self.executor = None
+        self.speech_executor = None
+        self.session = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cypher-io")
+            self.speech_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.speech_workers, thread_name_prefix="cypher-speech")
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=self.workers)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.session.headers["User-Agent"] = "CypherVoiceAssistant/1.0"
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_default_executor(self.executor)
+            self.thread = threading.Thread(target=self._run_loop, args=(self.loop,), daemon=True, name="cypher-runtime")
+            self.thread.start()
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+        loop.close()
+
+    def submit(self, coro, timeout=None):
+        """Schedules a coroutine on the loop from any thread and returns a concurrent.futures.Future for its result."""
+        with self.lock:
+            if self.loop is None:
+                coro.close()
+                future = concurrent.futures.Future()
+                future.cancel()
+                return future
+            if timeout is not None:
+                coro = asyncio.wait_for(coro, timeout)
+            return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Runs a coroutine on the loop and blocks the calling thread until it finishes, times out (TimeoutError) or is cancelled by close() (CancelledError)."""
+        return self.submit(coro, timeout).result()
+
+    @staticmethod
+    async def _in_pool(func, args, kwargs, executor=None):
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    def call(self, func, *args, timeout=None, **kwargs):
+        """Runs a blocking function in the shared pool and waits for it, giving up after timeout seconds."""
+        return self.run(self._in_pool(func, args, kwargs), timeout)
+
+    def spawn(self, func, *args, **kwargs):
+        """Starts a blocking function in the shared pool without waiting for it. Errors are printed, as they would be from a thread."""
+        return self._spawn(func, args, kwargs, None)
+
+    def spawn_speech(self, func, *args, **kwargs):
+        """Like spawn(), but in the pool reserved for speech, so slow provider streams or refreshes filling the shared pool cannot hold up playback."""
+        return self._spawn(func, args, kwargs, self.speech_executor)
+
+    def _spawn(self, func, args, kwargs, executor):
+        future = self.submit(self._in_pool(func, args, kwargs, executor))
+
+        def report(done):
+            if not done.cancelled() and done.exception() is not None:
+                print(f"Background Task Error ({getattr(func, '__name__', func)}): {done.exception()!r}")
+
+        future.add_done_callback(report)
+        return future
+
+    def repeat(self, func, interval):
+        """Calls func in the pool now and then every interval seconds (a number, or a callable asked after each run) until the returned future is cancelled or the runtime closes."""
+        async def loop():
+            while True:
+                try:
+                    await self._in_pool(func, (), {})
+                except Exception as e:
+                    print(f"Background Task Error ({getattr(func, '__name__', func)}): {e!r}")
+                await asyncio.sleep(interval() if callable(interval) else interval)
+        return self.submit(loop())
+
+    def close(self, timeout=RUNTIME_SHUTDOWN_TIMEOUT):
+        """Cancels every task on the loop, stops it and releases the pool and the HTTP session. Blocking calls already running in the pool finish on their own, bounded by their timeouts, but nobody is left waiting for them."""
+        with self.lock:
+            loop, executor, speech_executor, session, thread = self.loop, self.executor, self.speech_executor, self.session, self.thread
+            self.loop = self.executor = self.speech_executor = self.session = self.thread = None
+        if loop is None:
+            return
+
+        async def cancel_all():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.wait(tasks, timeout=timeout)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(timeout + 1)
+        except Exception as e:
+            print(f"Runtime Shutdown Error: {e!r}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+        speech_executor.shutdown(wait=False, cancel_futures=True)
+        session.close()
+
+class ProviderManager:
+    """Sends AI requests to the first available provider in priority order. If it has not produced its first chunk within the hedge delay, the next provider is asked as well; whichever answers first is streamed and the other request is cancelled. A provider that fails is replaced immediately, and providers with an open circuit breaker are skipped."""
+    def __init__(self, providers=(), hedge_delay=LLM_HEDGE_DELAY, spawn=None):
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        self.spawn = spawn or (lambda target, *args: threading.Thread(target=target, args=args, daemon=True).start())
+        self.active = []  # (cancel events, results queue) of every stream in flight
+        self.lock = threading.Lock()
+
+    def stream(self, history):
+        """Yields text chunks of the reply to the history from the winning provider."""
+        candidates = [provider for provider in self.providers if provider.available()] or list(self.providers)
+        if not candidates:
+            raise Exception("No AI providers are configured.")
+
+        results = queue.Queue()
+        cancels = {}
+        finished = set()
+        winner, last_error = None, None
+
+        def launch():
+            provider = candidates[len(cancels)]
+            cancels[provider] = threading.Event()
+            self.spawn(self._run, provider, list(history), cancels[provider], results)
+
+        stream = (cancels, results)
+        with self.lock:
+            self.active.append(stream)
+        launch()
+        try:
+            while True:
+                can_hedge = winner is None and len(cancels) < len(candidates)
+                try:
+                    provider, item = results.get(timeout=self.hedge_delay if can_hedge else LLM_STREAM_TIMEOUT)
+                except queue.Empty:
+                    if can_hedge:
+                        print(f"{candidates[len(cancels) - 1].name} is slow. Hedging with {candidates[len(cancels)].name}...")
+                        launch()
+                        continue
+                    raise TimeoutError("AI providers stopped responding.")
+                if provider is None:
+                    raise item  # cancel_all()
+
+                if winner is None:
+                    if isinstance(item, str):
+                        winner = provider
+                        for other, cancel in cancels.items():
+                            if other is not winner:
+                                cancel.set()
+                        yield item
+                        continue
+                    finished.add(provider)
+                    last_error = item if isinstance(item, Exception) else Exception(f"{provider.name} returned an empty reply.")
+                    print(f"{provider.name} Brain Offline ({last_error}).")
+                    if len(cancels) < len(candidates):
+                        launch()
+                    elif len(finished) == len(cancels):
+                        raise last_error
+                elif provider is winner:
+                    if item is None:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            with self.lock:
+                self.active.remove(stream)
+            for cancel in cancels.values():
+                cancel.set()
+
+    def cancel_all(self):
+        """Cancels every request in flight; streams being read raise InterruptedError."""
+        with self.lock:
+            active = list(self.active)
+        for cancels, results in active:
+            for cancel in list(cancels.values()):
+                cancel.set()
+            results.put((None, InterruptedError("AI request cancelled.")))
+
+    def _run(self, provider, history, cancel, results):
+        """Streams one provider's reply into the shared results queue until it ends or is cancelled."""
+        started = time.perf_counter()
+        produced = False
+        stream = None
+        try:
+            stream = provider.open_stream(history)
+            for chunk in stream:
+                if chunk and not produced:
+                    produced = True
+                    provider.record_success((time.perf_counter() - started) * 1000)
+                if cancel.is_set():
+                    return
+                if chunk:
+                    results.put((provider, chunk))
+            if not produced:
+                provider.record_failure()
+            results.put((provider, None))
+        except Exception as e:
+            if not cancel.is_set():
+                if not produced:
+                    provider.record_failure()
+                results.put((provider, e))
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+
+    def stats(self):
+        return {provider.name: provider.stats() for provider in self.providers}
+
+IntentMatch = namedtuple("IntentMatch", "intent phrase priority slots")
+
+class IntentRouter:
+    """Compiles the intent registry into a single word-level trie, so routing is one pass over the utterance however many phrases are registered. Triggers only match whole words, ties are broken by priority and then by phrase length, and slot values are pulled out with each intent's pattern. A leading intent (alarms, timers, reminders) wins over everything when its trigger is the first one in the utterance, whatever its task or label mentions."""
+    def __init__(self, intents=()):
+        self.trie = {}
+        self.slot_patterns = {}
+        self.phrase_count = 0
+        for intent in intents:
+            self.register(*intent)
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r"[a-z0-9']+", text.lower())
+
+    def register(self, intent, priority, phrases, slot_pattern=None, exact=False, leading=False):
+        if slot_pattern:
+            self.slot_patterns[intent] = re.compile(slot_pattern)
+        for phrase in phrases:
+            node = self.trie
+            for token in self.tokenize(phrase):
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append((priority, intent, phrase, exact, leading))
+            self.phrase_count += 1
+
+    def continues(self, tokens):
+        """True if a registered trigger phrase is longer than the given words and starts with all of them."""
+        node = self.trie
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                return False
+        return any(key is not None for key in node)
+
+    def route(self, text):
+        """Returns the best IntentMatch for the utterance, or None if no trigger phrase occurs in it."""
+        tokens = self.tokenize(text)
+        best, best_rank = None, None
+        lead, lead_rank = None, None
+        first = None  # Where the earliest trigger starts
+        for start in range(len(tokens)):
+            node = self.trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                for priority, intent, phrase, exact, leading in node.get(None, ()):
+                    if exact and (start != 0 or end != len(tokens) - 1):
+                        continue
+                    if first is None:
+                        first = start
+                    rank = (priority, end - start)
+                    if leading and start == first and (lead_rank is None or rank > lead_rank):
+                        lead, lead_rank = (intent, phrase, priority), rank
+                    if best_rank is None or rank > best_rank:
+                        best, best_rank = (intent, phrase, priority), rank
+        best = lead or best
+        if best is None:
+            return None
+
+        intent, phrase, priority = best
+        slots = {}
+        pattern = self.slot_patterns.get(intent)
+        found = pattern.search(text.lower()) if pattern else None
+        if found:
+            slots = {name: value.strip() for name, value in found.groupdict().items() if value and value.strip()}
+        return IntentMatch(intent, phrase, priority, slots)
+
+class ConversationWindow:
+    """Builds the messages sent to the AI under a token budget. The system preamble stays pinned, the newest turns are kept while they fit, and the turns that no longer fit are handed back as overflow so they can be folded into a rolling summary in the background."""
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        self.summary = ""
+        self.overflow = []
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+    def summary_messages(self):
+        if not self.summary:
+            return []
+        return [{"role": "user", "parts": [{"text": f"Summary of our earlier conversation: {self.summary}"}]}]
+
+    def build(self, history):
+        """Returns the messages to send for the history. The last message (the new prompt) is always included."""
+        pinned, turns = history[:PINNED_MESSAGES], history[PINNED_MESSAGES:]
+        with self.lock:
+            head = pinned + self.summary_messages()
+            remaining = self.budget - message_tokens(head)
+            kept = 0
+            for message in reversed(turns):
+                cost = message_tokens([message])
+                if kept and cost > remaining:
+                    break
+                remaining -= cost
+                kept += 1
+            recent = turns[len(turns) - kept:] if kept else []
+            self.overflow = turns[:len(turns) - kept]
+            pending, summarized = len(self.overflow), bool(self.summary)
+
+        messages = head + recent
+        full, sent = message_tokens(history), message_tokens(messages)
+        if pending or summarized:
+            print(f"Context: {sent} tokens sent instead of {full} ({1 - sent / full:.0%} smaller), {pending} old messages pending summary.")
+        return messages
+
+    def claim_overflow(self):
+        """Returns the overflow to summarize and marks a summary as running, or None if there is none or a summary is already running."""
+        with self.lock:
+            if not self.overflow or self.summarizing:
+                return None
+            self.summarizing = True
+            return list(self.overflow)
+
+    def release(self):
+        with self.lock:
+            self.summarizing = False
+
+    def fold(self, messages, summary):
+        """Records a new rolling summary that now covers the given messages."""
+        with self.lock:
+            self.summary = summary.strip()
+            self.overflow = [message for message in self.overflow if not any(message is folded for folded in messages)]
+
+    def reset(self):
+        with self.lock:
+            self.summary = ""
+            self.overflow = []
+
+class ConversationStore:
+    """Crash-safe chat memory. Every change is one JSON line in an append-only journal, written by a background thread in batches. Once the journal grows long it is compacted into a snapshot that replaces the old one atomically, so loading only ever reads one small snapshot and a short journal. Records carry sequence numbers, so a journal left behind by a crash during compaction is never replayed twice."""
+    def __init__(self, path=HISTORY_FILE, journal_path=HISTORY_JOURNAL, flush_interval=MEMORY_FLUSH_INTERVAL, compact_records=MEMORY_COMPACT_RECORDS):
+        self.path = path
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.compact_records = compact_records
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.writer = None
+        self.pending = []
+        self.journal_records = 0
+        self.seq = 0
+        self.summary = ""
+        self.history = []
+
+    def load(self):
+        """Reads the snapshot and replays the journal after it. Returns (summary, history); the history is empty if nothing was stored."""
+        snapshot = {"seq": 0, "summary": "", "history": []}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    stored = json.load(f)
+                if isinstance(stored, list):  # Older memory files hold just the message list
+                    stored = {"history": stored}
+                snapshot.update(stored)
+            except (ValueError, OSError) as e:
+                try:
+                    os.replace(self.path, self.path + ".corrupt")
+                    print(f"Memory snapshot unreadable ({e}), moved aside to {self.path}.corrupt")
+                except OSError as move_error:
+                    print(f"Memory snapshot unreadable ({e}) and could not be moved aside ({move_error}). Starting without it.")
+
+        records, torn = [], False
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        torn = True
+                        break  # A torn final line from a crash mid-write; everything before it is intact
+
+        with self.lock:
+            self.seq = snapshot["seq"]
+            self.summary = snapshot["summary"]
+            self.history = snapshot["history"]
+            for record in records:
+                if record["seq"] > self.seq:
+                    self.seq = record["seq"]
+                    self._apply(record)
+            self.journal_records = len(records)
+            summary, history = self.summary, list(self.history)
+        if records or torn:
+            self.compact()  # Also drops a torn line, which new records must not be appended onto
+        return summary, history
+
+    def append(self, *messages):
+        if messages:
+            self._record({"op": "append", "messages": list(messages)})
+
+    def drop(self, count, summary=None):
+        """Removes the oldest count messages after the pinned preamble, optionally replacing the rolling summary."""
+        self._record({"op": "drop", "count": count, "summary": summary})
+
+    def reset(self, history):
+        self._record({"op": "reset", "history": list(history)})
+
+    def _apply(self, record):
+        if record["op"] == "append":
+            self.history.extend(record["messages"])
+        elif record["op"] == "drop":
+            del self.history[PINNED_MESSAGES:PINNED_MESSAGES + record["count"]]
+            if record.get("summary") is not None:
+                self.summary = record["summary"]
+        elif record["op"] == "reset":
+            self.history = list(record["history"])
+            self.summary = ""
+
+    def _record(self, record):
+        with self.lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            self._apply(record)
+            self.pending.append(json.dumps(record) + "\n")
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self.writer.start()
+        self.wake.set()
+
+    def _writer_loop(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.flush_interval)  # Let the rest of the turn's changes join the batch
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Memory Save Error: {e}")
+
+    def flush(self):
+        """Appends all pending records to the journal in one write, then compacts if the journal has grown long."""
+        with self.write_lock:
+            with self.lock:
+                lines, self.pending = self.pending, []
+            if not lines:
+                return
+            with open(self.journal_path, "a") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_records += len(lines)
+        if self.journal_records >= self.compact_records:
+            self.compact()
+
+    def compact(self):
+        """Writes the current state to a fresh snapshot, swaps it in atomically and empties the journal."""
+        with self.write_lock:
+            with self.lock:
+                snapshot = {"seq": self.seq, "summary": self.summary, "history": list(self.history)}
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            # Records still pending are already in the snapshot; their lower sequence numbers make load() skip them.
+            open(self.journal_path, "w").close()
+            self.journal_records = 0
+
+class ContactNameIndex:
+    """In-memory index over the names in both contact tables for names that speech recognition spelled differently. Names are folded to a Hinglish-insensitive form and indexed by their Soundex-style token codes and character trigrams; candidates come from the phonetic postings first and the rarest trigrams second, and are ranked by trigram overlap plus phonetic agreement."""
+    def __init__(self):
+        self.ids = {}      # (kind, name) -> entry id; postings hold ids because small ints hash far faster than tuples
+        self.keys = []     # entry id -> (kind, name)
+        self.entries = []  # entry id -> (folded name, token codes, trigrams)
+        self.by_folded = {}
+        self.by_codes = {}
+        self.by_token = {}
+        self.by_trigram = {}
+        self.word_codes = {}
+
+    @staticmethod
+    def fold(name):
+        folded = re.sub(r"[^a-z ]", "", name.lower())
+        for spelling, replacement in HINGLISH_FOLDS:
+            folded = folded.replace(spelling, replacement)
+        folded = re.sub(r"(.)\1+", r"\1", folded)  # "adittya" -> "aditia"
+        return " ".join(folded.split())
+
+    @staticmethod
+    def soundex(word):
+        if not word:
+            return ""
+        code, previous = word[0], SOUNDEX_CODES.get(word[0])
+        for letter in word[1:]:
+            digit = SOUNDEX_CODES.get(letter)
+            if digit and digit != previous:
+                code += digit
+            if letter != "h":  # As in Soundex, an h between two same-coded letters does not separate them
+                previous = digit
+        return (code + "000")[:4]
+
+    @staticmethod
+    def trigrams(folded):
+        padded = f"  {folded} "
+        return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    def _features(self, name):
+        folded = self.fold(name)
+        codes = []
+        for word in folded.split():
+            code = self.word_codes.get(word)
+            if code is None:
+                code = self.word_codes[word] = self.soundex(word)
+            codes.append(code)
+        return folded, tuple(codes), self.trigrams(folded)
+
+    def add(self, kind, name):
+        """Indexes one contact name. Adding a name that is already indexed does nothing."""
+        key = (kind, name)
+        if key in self.ids:
+            return
+        entry = self.ids[key] = len(self.keys)
+        folded, codes, grams = self._features(name)
+        self.keys.append(key)
+        self.entries.append((folded, codes, grams))
+        self.by_folded.setdefault(folded, set()).add(entry)
+        self.by_codes.setdefault(codes, set()).add(entry)
+        for code in set(codes):
+            self.by_token.setdefault(code, set()).add(entry)
+        for gram in grams:
+            self.by_trigram.setdefault(gram, set()).add(entry)
+
+    def _candidates(self, folded, codes, grams):
+        """Collects at most CONTACT_SCORE_LIMIT entry ids to score. Names that fold or code exactly like the query come first; the rest are voted for by the query's word codes and trigrams, reading the rarest postings first within a fixed budget."""
+        found = self.by_folded.get(folded, set()) | self.by_codes.get(codes, set())
+        if found:
+            return found
+
+        votes = {}
+        visited = 0
+        postings = [(self.by_token.get(code, ()), 3) for code in set(codes)] + [(self.by_trigram.get(gram, ()), 1) for gram in grams]
+        for posting, weight in sorted(postings, key=lambda item: len(item[0])):
+            if visited + len(posting) > CONTACT_POSTING_VISITS:
+                break
+            visited += len(posting)
+            for entry in posting:
+                votes[entry] = votes.get(entry, 0) + weight
+        if not votes:
+            return []
+        cutoff = max(votes.values()) - 3  # Only names within one word code of the best-voted are worth scoring
+        leaders = [entry for entry, count in votes.items() if count >= cutoff]
+        return leaders if len(leaders) <= CONTACT_SCORE_LIMIT else heapq.nlargest(CONTACT_SCORE_LIMIT, leaders, key=votes.get)
+
+    def search(self, name, kind=None, limit=5):
+        """Returns up to limit (kind, name, score) candidates for a spoken name, best first. Scores run from 0 to 1."""
+        folded, codes, grams = self._features(name)
+        if not folded:
+            return []
+        ranked = []
+        code_set = set(codes)
+        for entry in self._candidates(folded, codes, grams):
+            key = self.keys[entry]
+            if kind and key[0] != kind:
+                continue
+            other_folded, other_codes, other_grams = self.entries[entry]
+            if other_folded == folded:
+                score = 1.0
+            else:
+                shared = len(grams & other_grams)
+                # A first name alone should still find the full stored name, so containment counts nearly as much as similarity.
+                overlap = max(2 * shared / (len(grams) + len(other_grams)), 0.9 * shared / len(grams))
+                phonetic = len(code_set.intersection(other_codes)) / len(code_set)
+                score = 0.7 * overlap + 0.3 * phonetic
+            ranked.append((key[0], key[1], round(score, 3)))
+        ranked.sort(key=lambda candidate: (-candidate[2], candidate[1]))
+        return ranked[:limit]
+
+    def __len__(self):
+        return len(self.entries)
+
+class ContactRepository:
+    """All access to contact.db goes through one long-lived connection in WAL mode. Names are matched case-insensitively through COLLATE NOCASE indexes, and lookups pass through a read-through LRU cache (misses included) that is cleared on every write."""
+    KINDS = {"whatsapp": ("contacts", "phone_number"), "email": ("email_contacts", "email")}
+
+    def __init__(self, path=CONTACT_DB, cache_size=CONTACT_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.conn = None
+        self.lock = threading.RLock()
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.index = None
+        self.index_lock = threading.Lock()
+
+    def connect(self):
+        """Opens the connection on first use and makes sure the tables and indexes exist."""
+        with self.lock:
+            if self.conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, phone_number TEXT)")
+                conn.execute("CREATE TABLE IF NOT EXISTS email_contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, email TEXT)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_contacts_name_nocase ON contacts (name COLLATE NOCASE)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_email_contacts_name_nocase ON email_contacts (name COLLATE NOCASE)")
+                conn.commit()
+                self.conn = conn
+            return self.conn
+
+    @staticmethod
+    def normalize_name(name):
+        return " ".join(name.lower().split())
+
+    def lookup(self, kind, name):
+        """Returns the stored phone number or email address for the name, or None."""
+        key = (kind, self.normalize_name(name))
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+            table, column = self.KINDS[kind]
+            row = self.connect().execute(f"SELECT {column} FROM {table} WHERE name = ? COLLATE NOCASE", (key[1],)).fetchone()
+            value = row[0] if row else None
+            self.cache[key] = value
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return value
+
+    def save(self, kind, name, value):
+        """Inserts or updates a contact. Returns True if an existing contact was updated."""
+        table, column = self.KINDS[kind]
+        name = self.normalize_name(name)
+        with self.lock:
+            conn = self.connect()
+            try:
+                updated = conn.execute(f"UPDATE {table} SET {column} = ? WHERE name = ? COLLATE NOCASE", (value, name)).rowcount > 0
+                if not updated:
+                    conn.execute(f"INSERT INTO {table} (name, {column}) VALUES (?, ?)", (name, value))
+                conn.commit()
+                if self.index is not None and not updated:
+                    self.index.add(kind, name)
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                self.cache.clear()
+            return updated
+
+    def _all_names(self):
+        with self.lock:
+            conn = self.connect()
+            return [(kind, name) for kind, (table, _) in self.KINDS.items() for (name,) in conn.execute(f"SELECT name FROM {table}")]
+
+    def name_index(self):
+        """Returns the fuzzy name index, building it from both tables on first use. Lookups and writes are not blocked while it is built."""
+        with self.index_lock:
+            if self.index is None:
+                index = ContactNameIndex()
+                for kind, name in self._all_names():
+                    index.add(kind, name)
+                with self.lock:
+                    # Names saved during the build are picked up here; add() skips everything already indexed.
+                    for kind, name in self._all_names():
+                        index.add(kind, name)
+                    self.index = index
+            return self.index
+
+    def suggest(self, kind, name, limit=5):
+        """Returns up to limit (name, score) pairs of stored contacts that sound like the spoken name, best first."""
+        return [(match, score) for _, match, score in self.name_index().search(name, kind, limit)]
+
+    def import_contacts(self, records):
+        """Bulk-loads (name, phone numbers, email addresses) records. Numbers and addresses are normalized as in add_contact, the first valid one of each is kept, and later records for the same name replace earlier ones. Everything is written with executemany in a single transaction. Returns counts for the report."""
+        started = time.perf_counter()
+        phones, emails = {}, {}
+        report = {"records": 0, "duplicates": 0, "invalid": 0}
+        for name, numbers, addresses in records:
+            report["records"] += 1
+            name = self.normalize_name(name)
+            number = next(filter(None, map(normalize_phone, numbers)), None)
+            address = next(filter(None, map(normalize_email, addresses)), None)
+            if not name or not (number or address):
+                report["invalid"] += 1
+                continue
+            if (number and name in phones) or (address and name in emails):
+                report["duplicates"] += 1
+            if number:
+                phones[name] = number
+            if address:
+                emails[name] = address
+
+        with self.lock:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.executemany("INSERT INTO contacts (name, phone_number) VALUES (?, ?) "
+                                     "ON CONFLICT(name) DO UPDATE SET phone_number = excluded.phone_number", phones.items())
+                    conn.executemany("INSERT INTO email_contacts (name, email) VALUES (?, ?) "
+                                     "ON CONFLICT(name) DO UPDATE SET email = excluded.email", emails.items())
+            finally:
+                self.cache.clear()
+            if self.index is not None:
+                for kind, names in (("whatsapp", phones), ("email", emails)):
+                    for name in names:
+                        self.index.add(kind, name)
+
+        report.update(whatsapp=len(phones), email=len(emails), seconds=time.perf_counter() - started)
+        return report
+
+    def export_contacts(self, path):
+        """Streams every contact, with its number and address merged by name, to a vCard (.vcf) or CSV file. Rows are written as they are read, so the tables are never held in memory. Returns the number of contacts written."""
+        query = ("SELECT name, MAX(phone_number), MAX(email) FROM ("
+                 "SELECT name, phone_number, NULL AS email FROM contacts UNION ALL "
+                 "SELECT name, NULL, email FROM email_contacts) GROUP BY name COLLATE NOCASE ORDER BY name COLLATE NOCASE")
+        as_vcard = path.lower().endswith((".vcf", ".vcard"))
+        written = 0
+        with self.lock, open(path, "w", newline="", encoding="utf-8") as f:
+            writer = None if as_vcard else csv.writer(f)
+            if writer:
+                writer.writerow(["name", "phone_number", "email"])
+            for name, number, address in self.connect().execute(query):
+                if writer:
+                    writer.writerow([name, number or "", address or ""])
+                else:
+                    card = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{name.title()}"]
+                    if number:
+                        card.append(f"TEL;TYPE=CELL:+91{number}")
+                    if address:
+                        card.append(f"EMAIL:{address}")
+                    card.append("END:VCARD")
+                    f.write("\r\n".join(card) + "\r\n")
+                written += 1
+        return written
+
+    def stats(self):
+        with self.lock:
+            return {"contact_cache_hits": self.hits, "contact_cache_misses": self.misses, "contact_cache_entries": len(self.cache)}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            self.cache.clear()
+            self.index = None
+
+class MailReader:
+    """Reads the inbox over one persistent, authenticated IMAP connection. Unseen messages are found with UID SEARCH, and the Subject, From and Date headers of all of them are fetched in a single BODY.PEEK command, which leaves the messages unread. Decoded headers are cached on disk by UIDVALIDITY and UID, so each message is only fetched once. watch() keeps a second connection in IMAP IDLE to hear about new mail as it arrives."""
+    HEADER_FIELDS = "(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)])"
+
+    def __init__(self, user, password, host=IMAP_HOST, port=IMAP_PORT, cache_path=MAIL_HEADER_CACHE, connect=None):
+        self.user = user
+        self.password = password
+        self.connect = connect or (lambda: imaplib.IMAP4_SSL(host, port))
+        self.cache_path = cache_path
+        self.conn = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watcher = None
+        self.uidvalidity = None
+        self.headers = {}
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            self.uidvalidity, self.headers = cached["uidvalidity"], cached["headers"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _open(self):
+        conn = self.connect()
+        conn.login(self.user, self.password)
+        conn.select("INBOX", readonly=True)
+        return conn
+
+    def _connection(self, fresh=False):
+        if fresh and self.conn is not None:
+            self._logout(self.conn)
+            self.conn = None
+        if self.conn is None:
+            self.conn = self._open()
+        return self.conn
+
+    @staticmethod
+    def _logout(conn):
+        try:
+            conn.logout()
+        except Exception:
+            pass
+
+    def unseen(self, limit=MAIL_READ_LIMIT):
+        """Returns (number of unseen messages, headers of the newest ones, newest first). Each header is a dict with sender, subject and date."""
+        with self.lock:
+            try:
+                return self._unseen(self._connection(), limit)
+            except (imaplib.IMAP4.abort, OSError):
+                # The server dropped the idle connection; one fresh login is enough to recover.
+                return self._unseen(self._connection(fresh=True), limit)
+
+    def _unseen(self, conn, limit):
+        _, validity = conn.response("UIDVALIDITY")
+        if validity and validity[0]:
+            self._check_validity(validity[0].decode())
+        _, data = conn.uid("SEARCH", None, "UNSEEN")
+        uids = data[0].split() if data and data[0] else []
+        newest = [uid.decode() for uid in uids[-limit:]] if limit else []
+        missing = [uid for uid in newest if uid not in self.headers]
+        if missing:
+            _, data = conn.uid("FETCH", ",".join(missing), self.HEADER_FIELDS)
+            for item in data:
+                if not isinstance(item, tuple):
+                    continue
+                found = re.search(rb"UID (\d+)", item[0])
+                if not found:
+                    continue
+                message = email.message_from_bytes(item[1])
+                sender = decode_mime_header(message.get("From")) or "Unknown"
+                if "<" in sender:
+                    sender = sender.split("<")[0].strip().replace('"', "") or sender
+                self.headers[found.group(1).decode()] = {
+                    "sender": sender,
+                    "subject": decode_mime_header(message.get("Subject")),
+                    "date": message.get("Date", ""),
+                }
+            self._save()
+        return len(uids), [self.headers[uid] for uid in reversed(newest) if uid in self.headers]
+
+    def _check_validity(self, uidvalidity):
+        """A changed UIDVALIDITY means the server renumbered the mailbox, so cached UIDs no longer mean anything."""
+        if uidvalidity != self.uidvalidity:
+            self.uidvalidity = uidvalidity
+            self.headers = {}
+
+    def _save(self):
+        if len(self.headers) > MAIL_HEADER_CACHE_SIZE:
+            keep = sorted(self.headers, key=int)[-MAIL_HEADER_CACHE_SIZE:]
+            self.headers = {uid: self.headers[uid] for uid in keep}
+        try:
+            temp_path = self.cache_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"uidvalidity": self.uidvalidity, "headers": self.headers}, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Mail Cache Error: {e}")
+
+    def watch(self, on_new_mail):
+        """Starts a background IDLE watcher. on_new_mail(headers) is called with the newest unseen message whenever the server reports new mail."""
+        if self.watcher is None:
+            self.stop_event.clear()
+            self.watcher = threading.Thread(target=self._watch_loop, args=(on_new_mail,), daemon=True)
+            self.watcher.start()
+
+    def _watch_loop(self, on_new_mail):
+        backoff = 5
+        while not self.stop_event.is_set():
+            conn = None
+            try:
+                conn = self._open()
+                backoff = 5
+                while not self.stop_event.is_set():
+                    if self._idle(conn):
+                        count, latest = self.unseen(limit=1)
+                        if count and latest:
+                            on_new_mail(latest[0])
+            except Exception as e:
+                print(f"Mail Watcher Error: {e}")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 300)
+            finally:
+                if conn is not None:
+                    self._logout(conn)
+
+    def _idle(self, conn):
+        """Waits in IDLE until the server reports new mail (returns True), the renewal time passes or the watcher is stopped. imaplib has no IDLE command, so it is spoken directly on the connection."""
+        tag = b"IDLE" + str(int(time.time() * 1000)).encode()
+        conn.send(tag + b" IDLE\r\n")
+        if not conn.readline().startswith(b"+"):
+            raise imaplib.IMAP4.error("Server refused IDLE.")
+        deadline = time.time() + IMAP_IDLE_SECONDS
+        new_mail = False
+        while not new_mail and not self.stop_event.is_set() and time.time() < deadline:
+            pending = conn.sock.pending() if hasattr(conn.sock, "pending") else 0
+            if pending or select.select([conn.sock], [], [], 1.0)[0]:
+                line = conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connection closed during IDLE.")
+                new_mail = line.startswith(b"*") and (b"EXISTS" in line or b"RECENT" in line)
+        conn.send(b"DONE\r\n")
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed during IDLE.")
+            if line.startswith(tag):
+                return new_mail
+            new_mail = new_mail or (line.startswith(b"*") and b"EXISTS" in line)
+
+    def close(self):
+        self.stop_event.set()
+        self.watcher = None
+        with self.lock:
+            if self.conn is not None:
+                self._logout(self.conn)
+                self.conn = None
+
+class MailOutbox:
+    """Persisted queue of outgoing emails with a background sender. enqueue() only writes the message to outbox.db, so the voice thread returns at once. The sender keeps one authenticated SMTP session open while there is mail to send, reuses it for every message, and retries temporary failures with exponential backoff. on_result(message, error) is called after each message is sent (error None) or given up on."""
+    def __init__(self, user, password, path=OUTBOX_DB, connect=None, on_result=None, backoff=OUTBOX_BACKOFF):
+        self.user = user
+        self.password = password
+        self.path = path
+        self.connect = connect or self._connect_gmail
+        self.on_result = on_result
+        self.backoff = backoff
+        self.db = None
+        self.session = None
+        self.session_used_at = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.sender = None
+        self.sent = 0
+        self.failed = 0
+
+    @staticmethod
+    def _connect_gmail():
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        server.starttls()
+        return server
+
+    def _database(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, to_address TEXT, subject TEXT, "
+                            "body TEXT, attempts INTEGER DEFAULT 0, next_attempt REAL DEFAULT 0, last_error TEXT)")
+            self.db.commit()
+        return self.db
+
+    def start(self):
+        """Starts the background sender, which also picks up messages left over from an earlier session."""
+        with self.lock:
+            self._database()
+            self.stop_event.clear()  # A sender still finishing its last message after close() simply carries on
+            if self.sender is None:
+                self.sender = threading.Thread(target=self._sender_loop, daemon=True)
+                self.sender.start()
+        self.wake.set()
+
+    def enqueue(self, to_address, subject, body):
+        """Queues one email and returns its outbox id."""
+        with self.lock:
+            db = self._database()
+            with db:
+                message_id = db.execute("INSERT INTO outbox (to_address, subject, body) VALUES (?, ?, ?)", (to_address, subject, body)).lastrowid
+        self.start()
+        return message_id
+
+    def pending(self):
+        with self.lock:
+            return self._database().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _next_due(self):
+        """Returns (message, None) for the oldest message that may be sent now, otherwise (None, seconds until one is due) or (None, None) if the outbox is empty."""
+        with self.lock:
+            row = self._database().execute(
+                "SELECT id, to_address, subject, body, attempts, next_attempt FROM outbox ORDER BY next_attempt, id LIMIT 1").fetchone()
+        if row is None:
+            return None, None
+        message = dict(zip(("id", "to_address", "subject", "body", "attempts", "next_attempt"), row))
+        wait = message["next_attempt"] - time.time()
+        return (message, None) if wait <= 0 else (None, wait)
+
+    def _sender_loop(self):
+        while True:
+            while not self.stop_event.is_set():
+                message, wait = self._next_due()
+                if message is not None:
+                    self._deliver(message)
+                    continue
+                idle = time.time() - self.session_used_at
+                if self.session is not None and idle >= SMTP_IDLE_SECONDS:
+                    self._close_session()
+                timeout = SMTP_IDLE_SECONDS if wait is None else wait
+                if self.session is not None:
+                    timeout = min(timeout, max(0.1, SMTP_IDLE_SECONDS - idle))
+                self.wake.wait(timeout)
+                self.wake.clear()
+            self._close_session()
+
+            # The sender owns the database while it runs, so it is closed here rather than under a send still in progress
+            with self.lock:
+                if not self.stop_event.is_set():
+                    continue  # start() was called again while the last message was being sent
+                if self.db is not None:
+                    self.db.close()
+                    self.db = None
+                self.sender = None
+                return
+
+    def _session(self):
+        if self.session is not None and time.time() - self.session_used_at > 60:
+            try:
+                self.session.noop()
+            except (smtplib.SMTPException, OSError):
+                self._close_session()
+        if self.session is None:
+            session = self.connect()
+            session.login(self.user, self.password)
+            self.session = session
+        return self.session
+
+    def _close_session(self):
+        if self.session is not None:
+            try:
+                self.session.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.session = None
+
+    def _deliver(self, message):
+        try:
+            email_message = EmailMessage()
+            email_message["From"] = self.user
+            email_message["To"] = message["to_address"]
+            email_message["Subject"] = message["subject"]
+            email_message["Date"] = formatdate(localtime=True)
+            email_message.set_content(message["body"])
+            self._session().send_message(email_message)
+            self.session_used_at = time.time()
+            self.sent += 1
+            self._finish(message, None)
+        except (smtplib.SMTPException, OSError) as e:
+            self._close_session()
+            attempts = message["attempts"] + 1
+            if isinstance(e, smtplib.SMTPRecipientsRefused):
+                codes = [code for code, _ in e.recipients.values()]
+            else:
+                codes = [getattr(e, "smtp_code", 0)]
+            # 5xx replies are permanent (bad address, wrong password); retrying will not change the server's answer.
+            if attempts >= OUTBOX_MAX_ATTEMPTS or min(codes) >= 500:
+                self._finish(message, e)
+                return
+            delay = min(self.backoff * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+            print(f"Email to {message['to_address']} failed ({e}). Retrying in {delay:g} s.")
+            with self.lock:
+                with self._database() as db:
+                    db.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                                    (attempts, time.time() + delay, str(e), message["id"]))
+        except Exception as e:
+            # Anything else (a malformed address or header, an encoding error) fails the same way on every attempt
+            self._close_session()
+            self._finish(message, e)
+
+    def _finish(self, message, error):
+        with self.lock:
+            with self._database() as db:
+                db.execute("DELETE FROM outbox WHERE id = ?", (message["id"],))
+        if error is not None:
+            self.failed += 1
+            print(f"Email to {message['to_address']} dropped: {error}")
+        if self.on_result:
+            try:
+                self.on_result(message, error)
+            except Exception as e:
+                print(f"Outbox Callback Error: {e}")
+
+    def close(self):
+        """Stops the sender. Messages not yet sent stay in the outbox for the next session. A send still in progress after the timeout is finished (and removed from the outbox) by the sender, which then closes the database itself."""
+        self.stop_event.set()
+        self.wake.set()
+        sender = self.sender
+        if sender is not None:
+            sender.join(timeout=5)
+        with self.lock:
+            if self.sender is None and self.db is not None:
+                self.db.close()
+                self.db = None
+
+class WeatherService:
+    """Current weather from OpenWeather over the runtime's keep-alive HTTP session. Reports are cached per city: within WEATHER_TTL they are returned straight from memory, and up to WEATHER_STALE_TTL the cached report is returned at once while a background refresh fetches a new one. start_refresh() keeps the default city fresh so the common question never waits for the network."""
+    def __init__(self, api_key, runtime, ttl=WEATHER_TTL, stale_ttl=WEATHER_STALE_TTL):
+        self.api_key = api_key
+        self.runtime = runtime
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.cache = {}  # city -> (fetched at, report)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.refresher = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(city):
+        return " ".join(city.lower().split())
+
+    def report(self, city):
+        """Returns the spoken weather report for the city. Network problems and unknown cities come back as spoken messages."""
+        key = self._key(city)
+        with self.lock:
+            cached = self.cache.get(key)
+            age = time.time() - cached[0] if cached else None
+            if cached and age < self.ttl:
+                self.hits += 1
+                return cached[1]
+            if cached and age < self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self.refreshing:
+                    self.refreshing.add(key)
+                    self.runtime.spawn(self._refresh, city)
+                return cached[1]
+            self.misses += 1
+
+        try:
+            return self._fetch(city)
+        except LookupError:
+            return f"I'm sorry, I couldn't find any weather data for the city {city}."
+        except requests.exceptions.RequestException:
+            return "I am currently unable to connect to the weather network. Please check your internet connection."
+        except RuntimeError:
+            return "There was an error communicating with the weather server."
+        except Exception:
+            return "Sorry, I encountered an internal error while fetching the weather."
+
+    def _fetch(self, city):
+        """Asks the API for the city's weather and caches the report."""
+        response = self.runtime.session.get(WEATHER_URL, params={"q": city, "appid": self.api_key, "units": "metric"}, timeout=10)
+        if response.status_code == 404:
+            raise LookupError(city)
+        if response.status_code != 200:
+            raise RuntimeError(f"Weather API returned {response.status_code}")
+
+        data = response.json()
+        city_name = data['name']
+        temp = round(data['main']['temp'])
+        description = data['weather'][0]['description']
+        humidity = data['main']['humidity']
+        wind_speed = data['wind']['speed']
+        report = f"Currently in {city_name}, it is {temp} degrees Celsius with {description}. The humidity is at {humidity} percent, with a wind speed of {wind_speed} meters per second."
+        with self.lock:
+            self.cache[self._key(city)] = (time.time(), report)
+        return report
+
+    def _refresh(self, city):
+        try:
+            self._fetch(city)
+        except Exception as e:
+            print(f"Weather Refresh Error ({city}): {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(self._key(city))
+
+    def start_refresh(self, city=DEFAULT_CITY, interval=WEATHER_REFRESH_INTERVAL):
+        """Fetches the city now and then every interval seconds on the runtime."""
+        if self.refresher is None:
+            self.refresher = self.runtime.repeat(functools.partial(self._refresh, city), interval)
+
+    def stats(self):
+        with self.lock:
+            return {"weather_hits": self.hits, "weather_stale_hits": self.stale_hits, "weather_misses": self.misses}
+
+    def close(self):
+        if self.refresher is not None:
+            self.refresher.cancel()
+            self.refresher = None
+
+class NewsRefresher:
+    """Keeps the news briefing ready before it is asked for. Headlines are fetched in the background, articles already seen (the same id, or the same headline from another outlet) are dropped, and the briefing sentences are rebuilt and handed to on_update, which pre-synthesizes their audio. The interval is stretched to stay within the daily API quota and doubles after failures."""
+    def __init__(self, api_key, runtime, interval=NEWS_REFRESH_INTERVAL, daily_quota=NEWS_DAILY_QUOTA, on_update=None):
+        self.client = NewsDataApiClient(apikey=api_key)
+        self.runtime = runtime
+        self.interval = interval
+        self.daily_quota = daily_quota
+        self.on_update = on_update
+        self.articles = []  # Unique articles, newest first
+        self.seen = OrderedDict()
+        self.sentences = None
+        self.fetched_at = None
+        self.requests = deque()  # Request times within the last 24 hours
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.refresher = None
+
+    @staticmethod
+    def _headline_key(title):
+        return " ".join(re.sub(r"[^a-z0-9 ]", " ", title.lower()).split())
+
+    def refresh(self, notify=True):
+        """Fetches the latest headlines and rebuilds the briefing. Returns the number of new articles."""
+        with self.lock:
+            self.requests.append(time.time())
+        response = self.client.latest_api(country="in", language="en")
+        if response.get("status") != "success":
+            raise RuntimeError(f"News API returned {response.get('status')}")
+
+        with self.lock:
+            fresh = []
+            for article in response.get("results", []):
+                title = clean_reply((article.get("title") or "").strip())
+                keys = [self._headline_key(title), article.get("article_id")]
+                if not keys[0] or any(key in self.seen for key in keys if key):
+                    continue
+                for key in keys:
+                    if key:
+                        self.seen[key] = True
+                fresh.append(title)
+            while len(self.seen) > NEWS_SEEN_LIMIT:
+                self.seen.popitem(last=False)
+
+            self.articles = (fresh + self.articles)[:NEWS_SEEN_LIMIT]
+            self.fetched_at = time.time()
+            if self.articles:
+                self.sentences = ["Here are the top news headlines."] + [
+                    f"{i}. {title.rstrip('.')}." for i, title in enumerate(self.articles[:NEWS_HEADLINES], 1)
+                ]
+            sentences = self.sentences
+        if sentences and fresh and notify and self.on_update:
+            self.on_update(list(sentences))
+        return len(fresh)
+
+    def briefing(self):
+        """Returns (briefing sentences, age in seconds), or (None, None) before the first successful refresh."""
+        with self.lock:
+            if self.sentences is None:
+                return None, None
+            return list(self.sentences), time.time() - self.fetched_at
+
+    def next_interval(self):
+        """Seconds until the next refresh: the configured interval, stretched to fit the daily quota and backed off after failures."""
+        with self.lock:
+            day_ago = time.time() - 86400
+            while self.requests and self.requests[0] < day_ago:
+                self.requests.popleft()
+            if len(self.requests) >= self.daily_quota:
+                return self.requests[0] - day_ago  # Quota used up: wait until the oldest request leaves the window
+            interval = max(self.interval, 86400 / max(1, self.daily_quota))
+            return min(interval * 2 ** min(self.failures, 4), 6 * 3600)
+
+    def _scheduled_refresh(self):
+        try:
+            fresh = self.refresh()
+            self.failures = 0
+            print(f"News refreshed ({fresh} new headlines).")
+        except Exception as e:
+            self.failures += 1
+            print(f"News Refresh Error: {e}")
+
+    def start(self):
+        """Refreshes now and then on the schedule on the runtime."""
+        if self.refresher is None:
+            self.refresher = self.runtime.repeat(self._scheduled_refresh, self.next_interval)
+
+    def close(self):
+        if self.refresher is not None:
+            self.refresher.cancel()
+            self.refresher = None
+
+class WikiSummaryCache:
+    """Disk-backed LRU cache of Wikipedia answers in wiki_cache.db. Each topic maps to a summary, a list of disambiguation options or a recorded miss, so a repeated question never reaches the network; the least recently used topics are evicted beyond the size limit."""
+    TTL = {"summary": WIKI_CACHE_TTL, "disambiguation": WIKI_CACHE_TTL, "missing": WIKI_MISS_TTL}
+
+    def __init__(self, path=WIKI_CACHE_DB, size=WIKI_CACHE_SIZE):
+        self.path = path
+        self.size = size
+        self.db = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _database(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS wiki_cache (topic TEXT PRIMARY KEY, kind TEXT, content TEXT, fetched_at REAL, used_at REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_wiki_cache_used ON wiki_cache (used_at)")
+            self.db.commit()
+        return self.db
+
+    @staticmethod
+    def normalize(topic):
+        return " ".join(topic.lower().split())
+
+    def get(self, topic):
+        """Returns (kind, content) for the topic, or None if it is not cached or has expired. Disambiguation content is the list of options."""
+        key = self.normalize(topic)
+        with self.lock:
+            db = self._database()
+            row = db.execute("SELECT kind, content, fetched_at FROM wiki_cache WHERE topic = ?", (key,)).fetchone()
+            if row is None or time.time() - row[2] > self.TTL.get(row[0], 0):
+                self.misses += 1
+                return None
+            db.execute("UPDATE wiki_cache SET used_at = ? WHERE topic = ?", (time.time(), key))
+            db.commit()
+            self.hits += 1
+        kind, content = row[0], row[1]
+        return kind, json.loads(content) if kind == "disambiguation" else content
+
+    def put(self, topic, kind, content):
+        key = self.normalize(topic)
+        if kind == "disambiguation":
+            content = json.dumps(content)
+        now = time.time()
+        with self.lock:
+            db = self._database()
+            db.execute("INSERT OR REPLACE INTO wiki_cache (topic, kind, content, fetched_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                       (key, kind, content, now, now))
+            db.execute("DELETE FROM wiki_cache WHERE topic IN (SELECT topic FROM wiki_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.size,))
+            db.commit()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+class WikiAbstractIndex:
+    """Read-only offline index of Wikipedia abstracts, built once from a dump with build(). The .dat file holds "title\x1fabstract" records; the .idx file holds a header and three columns sorted by a 64-bit hash of the normalized title: hashes, record offsets and record lengths. Both files are memory-mapped, so opening is instant, a lookup is a binary search that touches a few pages, and the OS shares and evicts the pages as needed."""
+    MAGIC = b"CYWI"
+    HEADER = 16  # Magic, format version, record count
+
+    def __init__(self, prefix=WIKI_INDEX):
+        self.files = [open(prefix + ".idx", "rb"), open(prefix + ".dat", "rb")]
+        try:
+            self.index = mmap.mmap(self.files[0].fileno(), 0, access=mmap.ACCESS_READ)
+            if self.index[:4] != self.MAGIC or int.from_bytes(self.index[4:8], "little") != 1:
+                raise ValueError(f"{prefix}.idx is not a Cypher abstract index")
+            self.count = int.from_bytes(self.index[8:16], "little")
+            self.data = mmap.mmap(self.files[1].fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        except Exception:
+            self.close()
+            raise
+        self.hashes = np.frombuffer(self.index, dtype="<u8", count=self.count, offset=self.HEADER)
+        self.offsets = np.frombuffer(self.index, dtype="<u8", count=self.count, offset=self.HEADER + 8 * self.count)
+        self.lengths = np.frombuffer(self.index, dtype="<u4", count=self.count, offset=self.HEADER + 16 * self.count)
+
+    @staticmethod
+    def normalize(title):
+        return " ".join(title.replace("_", " ").lower().split())
+
+    @staticmethod
+    def title_hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+    @classmethod
+    def open(cls, prefix=WIKI_INDEX):
+        """Returns the index, or None if it has not been built."""
+        if not (os.path.exists(prefix + ".idx") and os.path.exists(prefix + ".dat")):
+            return None
+        try:
+            return cls(prefix)
+        except (OSError, ValueError) as e:
+            print(f"Wikipedia Index Error: {e}")
+            return None
+
+    @classmethod
+    def build(cls, abstracts, prefix=WIKI_INDEX):
+        """Writes the index files from (title, abstract) pairs, keeping the first abstract for each title. Both files are written under temporary names and renamed, so a running assistant never sees a half-built index. Returns the number of abstracts indexed."""
+        hashes = np.zeros(1 << 16, dtype="<u8")
+        offsets = np.zeros(1 << 16, dtype="<u8")
+        lengths = np.zeros(1 << 16, dtype="<u4")
+        count, offset = 0, 0
+        with open(prefix + ".dat.tmp", "wb") as data:
+            for title, abstract in abstracts:
+                record = f"{title}\x1f{abstract}".encode("utf-8")
+                if count == len(hashes):
+                    hashes, offsets, lengths = (np.resize(column, 2 * count) for column in (hashes, offsets, lengths))
+                hashes[count] = cls.title_hash(cls.normalize(title))
+                offsets[count] = offset
+                lengths[count] = len(record)
+                data.write(record)
+                offset += len(record)
+                count += 1
+
+        order = np.argsort(hashes[:count], kind="stable")  # Stable, so the first abstract of a duplicated title wins
+        with open(prefix + ".idx.tmp", "wb") as index:
+            index.write(cls.MAGIC + (1).to_bytes(4, "little") + count.to_bytes(8, "little"))
+            for column in (hashes, offsets, lengths):
+                index.write(column[:count][order].tobytes())
+        os.replace(prefix + ".dat.tmp", prefix + ".dat")
+        os.replace(prefix + ".idx.tmp", prefix + ".idx")
+        return count
+
+    def lookup(self, title):
+        """Returns the abstract for the title, or None."""
+        key = self.normalize(title)
+        target = self.title_hash(key)
+        i = int(np.searchsorted(self.hashes, target))
+        while i < self.count and int(self.hashes[i]) == target:
+            offset = int(self.offsets[i])
+            found, _, abstract = self.data[offset:offset + int(self.lengths[i])].decode("utf-8").partition("\x1f")
+            if self.normalize(found) == key:
+                return abstract
+            i += 1
+        return None
+
+    def close(self):
+        for name in ("hashes", "offsets", "lengths"):
+            setattr(self, name, None)  # Release the views before the map they point into
+        for mapped in (getattr(self, "index", None), getattr(self, "data", None)):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for f in self.files:
+            f.close()
+
+class TimerScheduler:
+    """Alarms, timers and reminders on one scheduler thread. Pending timers sit in a min-heap keyed by due time and the thread sleeps until the earliest one is due (or an earlier one is added), so any number of timers costs a single thread. Cancelled timers are dropped lazily when they reach the top of the heap. Every change is saved to timers.json and restored by start(): recurring timers move on to their next occurrence, and one-shot timers that fell due while Cypher was off are announced late if they are recent. on_fire(timer, late) is called on the scheduler thread."""
+    def __init__(self, path=TIMERS_FILE, on_fire=None):
+        self.path = path
+        self.on_fire = on_fire
+        self.timers = {}  # id -> {"id", "kind", "name", "due", "every", "message"}
+        self.heap = []    # (due, id)
+        self.next_id = 1
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+
+    @staticmethod
+    def name_tokens(text):
+        """Words of a timer name with numbers compared by value, so "7:30" finds the "07:30 alarm"."""
+        return [str(int(token)) if token.isdigit() else token for token in re.findall(r"[a-z0-9]+", text.lower())]
+
+    def _load(self):
+        """Fills the heap from the saved file and returns the one-shot timers missed while Cypher was off."""
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"Timer Load Error: {e}")
+            return []
+
+        now, missed = time.time(), []
+        for timer in saved.get("timers", []):
+            if timer["due"] <= now:
+                if not timer.get("every"):
+                    if now - timer["due"] <= TIMER_MISSED_GRACE:
+                        missed.append(timer)
+                    continue
+                timer["due"] += ((now - timer["due"]) // timer["every"] + 1) * timer["every"]
+            self.timers[timer["id"]] = timer
+            heapq.heappush(self.heap, (timer["due"], timer["id"]))
+        self.next_id = max([saved.get("next_id", 1)] + [timer_id + 1 for timer_id in self.timers])
+        if missed:
+            self._save()
+        return missed
+
+    def _save(self):
+        """Writes the pending timers atomically. Called with the condition held."""
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"next_id": self.next_id, "timers": sorted(self.timers.values(), key=lambda timer: timer["due"])}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Timer Save Error: {e}")
+
+    def start(self):
+        """Restores the saved timers and starts the scheduler thread."""
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.timers, self.heap, self.stopping = {}, [], False
+            missed = self._load()
+            self.thread = threading.Thread(target=self._run, args=(missed,), daemon=True, name="cypher-timers")
+            self.thread.start()
+
+    def add(self, kind, name, due, every=None, message=None):
+        """Schedules a timer and returns a copy of it. A name already in use gets a number appended."""
+        with self.condition:
+            taken = {tuple(self.name_tokens(timer["name"])) for timer in self.timers.values()}
+            unique, suffix = name, 2
+            while tuple(self.name_tokens(unique)) in taken:
+                unique, suffix = f"{name} {suffix}", suffix + 1
+            timer = {"id": self.next_id, "kind": kind, "name": unique, "due": due, "every": every, "message": message}
+            self.next_id += 1
+            self.timers[timer["id"]] = timer
+            heapq.heappush(self.heap, (due, timer["id"]))
+            self._save()
+            self.condition.notify()
+            return dict(timer)
+
+    def cancel(self, timer_id):
+        """Cancels one timer. Returns the cancelled timer, or None if it was no longer pending."""
+        with self.condition:
+            timer = self.timers.pop(timer_id, None)
+            if timer is not None:
+                self._save()
+            return timer
+
+    def pending(self, kind=None):
+        """Returns copies of the pending timers (optionally of one kind), soonest first."""
+        with self.condition:
+            timers = [dict(timer) for timer in self.timers.values() if kind in (None, timer["kind"])]
+        return sorted(timers, key=lambda timer: timer["due"])
+
+    def find(self, name="", kind=None):
+        """Returns the pending timers whose name contains every word of the spoken name, soonest first. An exact name match wins over partial ones; an empty name matches all."""
+        words = lambda text: [token for token in self.name_tokens(text) if token not in TIMER_FILLER_WORDS]
+        wanted = words(name)
+        timers = self.pending(kind)
+        exact = [timer for timer in timers if wanted and words(timer["name"]) == wanted]
+        return exact or [timer for timer in timers if set(wanted) <= set(words(timer["name"]))]
+
+    def _run(self, missed):
+        for timer in missed:
+            self._fire(timer, late=True)
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopping:
+                        return
+                    while self.heap and self.timers.get(self.heap[0][1], {}).get("due") != self.heap[0][0]:
+                        heapq.heappop(self.heap)  # Cancelled
+                    delay = self.heap[0][0] - time.time() if self.heap else TIMER_MAX_WAIT
+                    if delay <= 0:
+                        break
+                    self.condition.wait(min(delay, TIMER_MAX_WAIT))
+
+                due, timer_id = heapq.heappop(self.heap)
+                timer = self.timers[timer_id]
+                if timer["every"]:
+                    timer["due"] = max(due + timer["every"], time.time())
+                    heapq.heappush(self.heap, (timer["due"], timer_id))
+                else:
+                    del self.timers[timer_id]
+                self._save()
+                fired = dict(timer, due=due)
+            self._fire(fired)
+
+    def _fire(self, timer, late=False):
+        try:
+            if self.on_fire:
+                self.on_fire(timer, late)
+        except Exception as e:
+            print(f"Timer Error ({timer['name']}): {e}")
+
+    def close(self):
+        """Stops the scheduler thread. Pending timers stay saved for the next start."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join(timeout=2)
+
+class HeadlessSession:
+    """Drives a CypherCore from text instead of the microphone, for automation and load tests. Commands come from any iterable of lines (stdin, a script file or a socket connection), and follow-up questions such as "Whom do you want to email?" are answered by the next line. Each command runs through process_command until its reply has finished, and its latency is recorded; a command that raises is recorded as failed and the session carries on. Blank lines and lines starting with # are skipped."""
+    def __init__(self, core, echo=True):
+        self.core = core
+        self.echo = echo
+        self.lines = iter(())
+        self.output = []        # What Cypher said during the current command
+        self.latencies = []     # (command, milliseconds)
+        self.failures = []      # (command, error)
+        self.error = None       # Error of the current command, if it failed
+        self.elapsed = 0.0
+        self.stopped = False
+        core.text_input = self.next_line
+        core.is_running = True
+        core.set_callbacks(self.say, self.stop, None)
+
+    def say(self, text):
+        self.output.append(text)
+        if self.echo:
+            print(text)
+
+    def stop(self):
+        """Close callback: "turn off" ends the session after the current command."""
+        self.stopped = True
+
+    def next_line(self):
+        """Returns the next command line, or "" once the input has run out."""
+        for line in self.lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8", "replace")
+            line = line.strip()
+            if line and not line.startswith("#"):
+                return line
+        return ""
+
+    def run_command(self, command):
+        """Runs one command as a voice turn, waits until its reply is complete and returns the latency in milliseconds. An exception from the command is recorded in self.error and self.failures instead of ending the session."""
+        self.output = []
+        self.error = None
+        self.say(f"USER: {command}")
+        started = time.perf_counter()
+        self.core.tracer.begin_turn(started)
+        try:
+            self.core.process_command(command)
+            self.core.wait_until_silent()
+        except Exception as e:
+            self.error = repr(e)
+            self.failures.append((command, self.error))
+            self.say(f"ERROR: {self.error}")
+        finally:
+            self.core.tracer.end_turn()
+        latency = (time.perf_counter() - started) * 1000
+        self.latencies.append((command, latency))
+        return latency
+
+    def run(self, lines, on_result=None):
+        """Runs the commands in the lines until they run out or Cypher is told to turn off. on_result(command, milliseconds, output) is called after each one."""
+        self.lines = iter(lines)
+        started = time.perf_counter()
+        try:
+            while not self.stopped:
+                command = self.next_line()
+                if not command:
+                    break
+                latency = self.run_command(command)
+                if on_result:
+                    on_result(command, latency, self.output)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+    def serve(self, port, host=HEADLESS_HOST):
+        """Accepts command connections on a local TCP port, one client at a time, until Cypher is told to turn off. Every command line is answered with one JSON line holding the command, its latency and what Cypher said."""
+        session = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def reply(command, latency, output):
+                    result = {"command": command, "ms": round(latency, 1), "output": output}
+                    if session.error:
+                        result["error"] = session.error
+                    self.wfile.write(json.dumps(result).encode() + b"\n")
+                    self.wfile.flush()
+                session.run(self.rfile, on_result=reply)
+
+        with socketserver.TCPServer((host, port), Handler) as server:
+            print(f"Headless Cypher listening on {host}:{server.server_address[1]}")
+            while not self.stopped:
+                server.handle_request()
+
+    def report(self):
+        """Returns throughput and latency percentiles over every command run so far, together with the distinct commands that took longest (p50 and worst case)."""
+        latencies = [latency for _, latency in self.latencies]
+        by_command = {}
+        for command, latency in self.latencies:
+            by_command.setdefault(command, []).append(latency)
+        slowest = sorted(by_command.items(), key=lambda item: percentile(item[1], 50), reverse=True)[:HEADLESS_SLOWEST]
+        return {
+            "commands": len(latencies),
+            "failed": len(self.failures),
+            "seconds": self.elapsed,
+            "per_second": len(latencies) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": max(latencies, default=0.0),
+            "slowest": [(command, len(values), percentile(values, 50), max(values)) for command, values in slowest],
+        }
+
 class CypherCore:
     def __init__(self):
         # UI Callbacks
         self.ui_print = print
         self.close_callback = None
         self.ui_state_callback = None
+        self.text_input = None  # Headless mode: returns the next typed command instead of listening
         
         # System Flags
         self.is_running = False
         self.stop_speaking_flag = False
         self.speech_id_counter = 0
         self.chat_history = []
+        self.history_lock = threading.RLock()  # The summarizer trims the history from a pool thread
+        self.context = ConversationWindow()
+        self.memory = ConversationStore()
+        self.contacts = ContactRepository()
+        self.mail_reader = None
+        self.outbox = None
+        self.weather = None
+        self.news = None
+        self.wiki_cache = WikiSummaryCache()
+        self.wiki_index = None
+        self.wiki_index_checked = False
         
         # API Clients
         self.gemini_client = None
         self.groq_client = None
+        self.runtime = AsyncRuntime()
+        self.providers = ProviderManager(spawn=self.runtime.spawn)
 
         # Threading & Concurrency
-        self.speech_thread = None
+        self.speech_future = None
         self.speech_lock = threading.Lock()
-        self.alarm_event = threading.Event()
+        self.first_audio_latencies = deque(maxlen=100)
+        self.speech_enabled = True  # Headless mode can switch synthesis off...
+        self.speech_dir = None      # ...or write the clips to this folder instead of playing them
+        self.clip_numbers = itertools.count(1)
+        self.tracer = SpanTracer()
+        self.tts_cache = TTSCache()
+        self.timers = TimerScheduler(on_fire=self._on_timer)
 
         # Original Stable Audio Recognition
         self.recognizer = sr.Recognizer()
         self.recognizer.energy_threshold = ERROR_THRESHOLD
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8
+        self.recognizer.operation_timeout = STT_CLOUD_TIMEOUT
+        self.stt = SpeechToText(GoogleSTT(self.recognizer), VoskSTT())
+        self.capture = AudioCapture()
+        self.wake_spotter = WakeWordSpotter()
+        self.vad = VoiceActivityDetector()
+        self.router = IntentRouter(INTENTS)
+        self.early = EarlyDispatcher(self.router, on_fire=self._dispatch_early)
 
         # Wikimedia Setup
         wikipedia.set_lang("en")
 
-        # TTS Event Loop
-        self.tts_loop = asyncio.new_event_loop()
-        threading.Thread(target=self._start_tts_loop, daemon=True).start()
-
-        
-
         # Pygame Mixer Setup
         try:
             if pygame.mixer.get_init():
@@ -142,11 +3055,6 @@ class CypherCore:
         except Exception as e:
             print("Pygame Mixer Initialization Error:", e)
 
-    def _start_tts_loop(self):
-        """Starts the asyncio event loop for TTS in a separate thread."""
-        asyncio.set_event_loop(self.tts_loop)
-        self.tts_loop.run_forever()
-
     def set_callbacks(self, ui_print_fn, close_fn, state_fn):
         """Sets the UI callbacks for printing, closing, and state updates."""
         if ui_print_fn: 
@@ -162,11 +3070,40 @@ class CypherCore:
             self.ui_state_callback(state)
 
     def stop_execution(self):
-        """Stops all ongoing processes, including speech and resets flags."""
+        """Stops all ongoing processes, including speech and resets flags. Waits a few seconds at most for background workers to wind down, so a GUI should call it from a worker thread."""
         self.is_running = False
         self.stop_speaking_flag = True
         if pygame.mixer.get_init():
             pygame.mixer.stop()
+        self.capture.stop()
+        try:
+            self.memory.flush()
+        except Exception as e:
+            print(f"Memory Save Error: {e}")
+        self.contacts.close()
+        if self.mail_reader:
+            self.mail_reader.close()
+            self.mail_reader = None
+        if self.outbox:
+            self.outbox.close()  # Kept, so a restart reuses the sender if it is still finishing a message
+        if self.weather:
+            self.weather.close()
+            self.weather = None
+        if self.news:
+            self.news.close()
+            self.news = None
+        self.wiki_cache.close()
+        if self.wiki_index:
+            self.wiki_index.close()
+            self.wiki_index = None
+            self.wiki_index_checked = False
+        self.timers.close()
+        self.tracer.end_turn()
+        self.tracer.flush()
+        self.providers.cancel_all()
+        self.runtime.close()  # Cancels synthesis, refreshes and queued work still in flight
+        vad = self.vad.stats()
+        print(f"VAD saved {vad['audio_seconds_saved']} s of audio and {vad['requests_saved']} recognition requests.")
         self.ui_print("System halting...")
 
     def stop_speaking(self):
@@ -182,6 +3119,7 @@ class CypherCore:
     def check_env_variable(self):
         """Checks for required environment variables and initializes API clients."""
         self.ui_print("Performing system checks...")
+        self.runtime.start()
         required_keys = [
             "GEMINI_API_KEY", 
             "GROQ_API_KEY", 
@@ -199,19 +3137,37 @@ class CypherCore:
             self.gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
         if os.getenv("GROQ_API_KEY"):
             self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+        providers = []
+        if self.gemini_client:
+            providers.append(LLMProvider("Gemini", self._gemini_stream))
+        if self.groq_client:
+            providers.append(LLMProvider("Groq", self._groq_stream))
+        self.providers = ProviderManager(providers, spawn=self.runtime.spawn)
             
-        if not os.path.exists("contact.db"):
+        if not os.path.exists(CONTACT_DB):
             self.ui_print("Warning: contact.db database file is missing.")
         self.init_db()
+        self.timers.start()
+        if self.stt.local_ready():
+            self.runtime.spawn(self.stt.prepare)
+        elif STT_BACKEND == self.stt.local.name:
+            self.ui_print(f"Warning: offline speech recognition needs 'pip install vosk' and a model in '{VOSK_MODEL_DIR}'. Using Google.")
+        if MAIL_PUSH_NOTIFICATIONS:
+            self.get_mail_reader()
+        if os.path.exists(OUTBOX_DB):
+            self.get_outbox()  # Resumes emails queued before the last shutdown
+        if os.getenv("OPENWEATHER_KEY"):
+            self.weather = WeatherService(os.getenv("OPENWEATHER_KEY"), self.runtime)
+            self.weather.start_refresh(DEFAULT_CITY)
+        if os.getenv("NEWS_API_KEY"):
+            self.news = NewsRefresher(os.getenv("NEWS_API_KEY"), self.runtime, on_update=self.cache_phrases)
+            self.news.start()
 
     def init_db(self):
-        """Initializes the SQLite database and creates necessary tables if they don't exist."""
-        conn = sqlite3.connect("contact.db")
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, phone_number TEXT)''')
-        cursor.execute('''CREATE TABLE IF NOT EXISTS email_contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, email TEXT)''')
-        conn.commit()
-        conn.close()
+        """Opens the contact database, creates the tables and name indexes if they don't exist, and builds the fuzzy name index in the background."""
+        self.contacts.connect()
+        self.runtime.spawn(self.contacts.name_index)
 
     def add_contact(self):
         """Guides the user through adding a new contact, either a WhatsApp number or an email address, and saves it to the database."""
@@ -234,34 +3190,19 @@ class CypherCore:
             self.wait_until_silent()
             number_spoken = self.listen()
             
-            clean_number = "".join(filter(str.isdigit, number_spoken))
-            
-            if len(clean_number) > 10 and clean_number.startswith("91"):
-                clean_number = clean_number[2:]
-            elif len(clean_number) == 11 and clean_number.startswith("0"):
-                clean_number = clean_number[1:]
-
-            if not re.match(r"^[6-9]\d{9}$", clean_number):
+            clean_number = normalize_phone(number_spoken)
+            if not clean_number:
                 self.speak("That doesn't seem to be a valid 10-digit mobile number. Cancelling.")
                 return
                 
             try:
-                conn = sqlite3.connect("contact.db")
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM contacts WHERE name=?", (name.lower(),))
-                if cursor.fetchone():
-                    cursor.execute("UPDATE contacts SET phone_number=? WHERE name=?", (clean_number, name.lower()))
+                if self.contacts.save("whatsapp", name, clean_number):
                     self.speak(f"Updated existing WhatsApp number for {name}.")
                 else:
-                    cursor.execute("INSERT INTO contacts (name, phone_number) VALUES (?, ?)", (name.lower(), clean_number))
                     self.speak(f"Successfully saved WhatsApp number for {name}.")
-                conn.commit()
             except sqlite3.Error as e:
                 self.speak("A database error occurred.")
                 print(f"DB Error: {e}")
-            finally:
-                if 'conn' in locals(): 
-                    conn.close()
             
         elif "email" in contact_type:
             self.speak("What is the name of the contact?")
@@ -275,111 +3216,329 @@ class CypherCore:
             self.wait_until_silent()
             email_spoken = self.listen().lower()
             
-            clean_email = email_spoken.replace(" at ", "@").replace(" dot ", ".").replace(" ", "")
-            pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-            if not re.match(pattern, clean_email):
+            clean_email = normalize_email(email_spoken.replace(" at ", "@").replace(" dot ", ".").replace(" ", ""))
+            if not clean_email:
                 self.speak("That email address format is invalid. Cancelling.")
                 return
             
             try:
-                conn = sqlite3.connect("contact.db")
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM email_contacts WHERE name=?", (name.lower(),))
-                if cursor.fetchone():
-                    cursor.execute("UPDATE email_contacts SET email=? WHERE name=?", (clean_email, name.lower()))
+                if self.contacts.save("email", name, clean_email):
                     self.speak(f"Updated existing email address for {name}.")
                 else:
-                    cursor.execute("INSERT INTO email_contacts (name, email) VALUES (?, ?)", (name.lower(), clean_email))
                     self.speak(f"Successfully saved email address for {name}.")
-                conn.commit()
             except sqlite3.Error as e:
                 self.speak("A database error occurred.")
                 print(f"DB Error: {e}")
-            finally:
-                if 'conn' in locals(): 
-                    conn.close()
             
         else:
             self.speak("I didn't understand the contact type. Please try again.")
 
     def speak(self, text):
         """Converts text to speech using edge-tts, plays it back, and handles interruption and UI state updates."""
+        my_id = self._begin_speech()
+        self.set_ui_state("processing")
+
+        def run_wrapper():
+            """Wrapper function to run TTS and playback in a separate thread."""
+            try:
+                self._play_clip(self._start_synthesis(text, my_id), text, my_id)
+            finally:
+                if my_id == self.speech_id_counter:
+                    self.set_ui_state("idle")
+
+        self.speech_future = self.runtime.spawn_speech(run_wrapper)
+
+    def speak_stream(self, sentences):
+        """Speaks sentences from an iterator as soon as each one arrives. Every sentence is handed to edge-tts the moment it is produced, so synthesis of later sentences overlaps playback of earlier ones and the first sentence starts playing while the rest is still being generated."""
+        my_id = self._begin_speech()
+        self.set_ui_state("processing")
+        playlist = queue.Queue()
+        started = time.perf_counter()
+
+        def producer():
+            """Pulls sentences from the iterator and starts their synthesis immediately."""
+            try:
+                for sentence in sentences:
+                    if self.stop_speaking_flag or my_id != self.speech_id_counter:
+                        break
+                    playlist.put((sentence, self._start_synthesis(sentence, my_id)))
+            except Exception as e:
+                print(f"Reply Stream Error: {e}")
+            finally:
+                if hasattr(sentences, "close"):
+                    sentences.close()
+                playlist.put(None)
+
+        def on_first_audio():
+            print(f"Time to first audio: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        def player():
+            """Plays the synthesized sentences in order until the stream ends or speech is interrupted."""
+            on_start = on_first_audio
+            try:
+                while True:
+                    item = playlist.get()
+                    if item is None:
+                        break
+                    sentence, chunks = item
+                    if self._play_clip(chunks, sentence, my_id, on_start=on_start):
+                        on_start = None
+                    elif self.stop_speaking_flag or my_id != self.speech_id_counter:
+                        break
+            finally:
+                if my_id == self.speech_id_counter:
+                    self.set_ui_state("idle")
+
+        self.runtime.spawn_speech(producer)
+        self.speech_future = self.runtime.spawn_speech(player)
+
+    def _begin_speech(self):
+        """Stops whatever is currently playing and claims a new speech ID, so older speech threads know they have been superseded."""
         with self.speech_lock:
             if pygame.mixer.get_init():
                 pygame.mixer.stop()
                 pygame.mixer.music.stop()
 
             self.speech_id_counter += 1
-            my_id = self.speech_id_counter
             self.stop_speaking_flag = False
+            return self.speech_id_counter
 
-        self.set_ui_state("processing")
+    def _start_synthesis(self, text, my_id):
+        """Returns a queue that receives the audio chunks for the text. Cached clips are handed over at once without any network I/O; otherwise edge-tts synthesis is scheduled on the runtime's event loop and a complete clip is added to the cache. The queue ends with None, or with the exception if synthesis failed."""
+        chunks = AudioStream(self.tracer.turn)
+        if not self.speech_enabled:
+            chunks.put(None)
+            return chunks
+        token = self.tracer.start("tts")
+        cached = self.tts_cache.get(text)
+        if cached:
+            self.tracer.finish(token, cached=True)
+            chunks.put(cached)
+            chunks.put(None)
+            return chunks
 
-        def run_wrapper():
-            """Wrapper function to run TTS and playback in a separate thread."""
-            target_source = io.BytesIO()
+        async def collect_audio():
+            audio = bytearray()
             try:
-                communicate = edge_tts.Communicate(text, "hi-IN-SwaraNeural", rate="+20%")
-                async def collect_audio():
-                    async for chunk in communicate.stream():
-                        if my_id != self.speech_id_counter: 
-                            return
-                        if chunk["type"] == "audio":
-                            target_source.write(chunk["data"])
-
-                future = asyncio.run_coroutine_threadsafe(collect_audio(), self.tts_loop)
-                future.result()
-
-                if my_id != self.speech_id_counter: 
-                    return
-                target_source.seek(0)
+                communicate = edge_tts.Communicate(text, TTS_VOICE, rate=TTS_RATE)
+                async for chunk in communicate.stream():
+                    if self.stop_speaking_flag or my_id != self.speech_id_counter:
+                        audio = None
+                        break
+                    if chunk["type"] == "audio" and chunk["data"]:  # Empty chunks would re-trigger the first-audio mark
+                        if not audio:
+                            self.tracer.finish(token, cached=False, chars=len(text))
+                        chunks.put(chunk["data"])
+                        audio.extend(chunk["data"])
+                chunks.put(None)
+                if audio:
+                    self.tts_cache.put(text, bytes(audio))
             except Exception as e:
-                self.set_ui_state("idle")
-                return
+                chunks.put(e)
 
-            try:
-                if not pygame.mixer.get_init():
-                    self.set_ui_state("idle")
-                    return
-                    
-                sound = pygame.mixer.Sound(file=target_source)
+        if self.runtime.submit(collect_audio()).cancelled():
+            chunks.put(None)  # Runtime already closed
+        return chunks
 
-                if my_id != self.speech_id_counter: 
-                    return
-                self.ui_print(f"CYPHER: {text}")
-                
-                channel = pygame.mixer.Channel(0)
-                channel.play(sound)
+    def _play_clip(self, chunks, text, my_id, on_start=None):
+        """Plays a clip progressively while it is still being synthesized. Complete MP3 frames are decoded in short segments and queued on channel 0 behind the segment that is playing, so the first sound starts after only a fraction of a second of audio has arrived. Returns True only if the clip played to completion."""
+        if not self.speech_enabled or self.speech_dir:
+            return self._save_clip(chunks, text, my_id)
+        if not pygame.mixer.get_init():
+            return False
 
-                while channel.get_busy():
-                    if self.stop_speaking_flag or my_id != self.speech_id_counter:
+        pending = bytearray()
+        channel = None
+        finished = False
+        segment_bytes = FIRST_SEGMENT_BYTES
+        try:
+            while True:
+                if self.stop_speaking_flag or my_id != self.speech_id_counter:
+                    if channel:
                         channel.stop()
-                        break
-                    time.sleep(0.05)
+                    return False
+
+                if not finished:
+                    try:
+                        chunk = chunks.get(timeout=0.02)
+                    except queue.Empty:
+                        chunk = b""
+                    if chunk is None:
+                        finished = True
+                    elif isinstance(chunk, Exception):
+                        print(f"TTS Error: {chunk}")
+                        if channel is None:
+                            return False
+                        finished = True
+                    else:
+                        pending.extend(chunk)
+
+                ready = complete_mp3_frames(pending)
+                if ready is None:
+                    # Not a frame-aligned MP3 stream, so fall back to decoding the whole clip at once
+                    ready = len(pending) if finished else 0
+                can_queue = channel is None or not channel.get_busy() or channel.get_queue() is None
+
+                if ready and (ready >= segment_bytes or finished) and can_queue:
+                    sound = pygame.mixer.Sound(file=io.BytesIO(bytes(pending[:ready])))
+                    del pending[:ready]
+                    segment_bytes = SEGMENT_BYTES
+                    if my_id != self.speech_id_counter:
+                        return False
+
+                    if channel is None:
+                        self.ui_print(f"CYPHER: {text}")
+                        channel = pygame.mixer.Channel(0)
+                        channel.play(sound)
+                        self._record_first_audio(chunks.started_at)
+                        self.tracer.record("playback", chunks.started_at, turn=chunks.turn)
+                        if on_start:
+                            on_start()
+                    elif not channel.get_busy():
+                        channel.play(sound)
+                    else:
+                        channel.queue(sound)
+                elif finished:
+                    if not ready:
+                        if channel is None:
+                            return False
+                        if not channel.get_busy():
+                            return True
+                    time.sleep(0.02)
+        except Exception as e:
+            print(f"Playback Error: {e}")
+            return False
+
+    def _save_clip(self, chunks, text, my_id):
+        """Headless replacement for playback: prints the text and, if a speech folder is set, writes the clip there as a numbered MP3. Returns True once the whole clip has arrived."""
+        audio = bytearray()
+        while True:
+            if self.stop_speaking_flag or my_id != self.speech_id_counter:
+                return False
+            try:
+                chunk = chunks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                print(f"TTS Error: {chunk}")
+                return False
+            audio.extend(chunk)
+
+        self.ui_print(f"CYPHER: {text}")
+        if audio and self.speech_dir:
+            self.tracer.record("playback", chunks.started_at, turn=chunks.turn)
+            name = re.sub(r"[^a-z0-9]+", "_", text.lower())[:40].strip("_")
+            with open(os.path.join(self.speech_dir, f"{next(self.clip_numbers):05d}_{name}.mp3"), "wb") as f:
+                f.write(audio)
+        return True
+
+    def _record_first_audio(self, started_at):
+        """Records the delay between requesting synthesis and the first audible sample."""
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        self.first_audio_latencies.append(latency_ms)
+        print(f"TTS first audio after {latency_ms:.0f} ms")
+
+    def get_vad_stats(self):
+        """Returns how much audio and how many recognition requests the voice activity detector has saved."""
+        return self.vad.stats()
+
+    def get_trace_stats(self):
+        """Returns the rolling p50/p95 latency of every voice-turn stage for the GUI."""
+        return self.tracer.stats()
+
+    def get_tts_stats(self):
+        """Returns the synthesis-start-to-first-sample latency metrics in milliseconds together with the TTS cache hit and miss counters."""
+        latencies = list(self.first_audio_latencies)
+        return {
+            "last_ms": latencies[-1] if latencies else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "samples": len(latencies),
+            **self.tts_cache.stats(),
+        }
+
+    def prewarm_tts_cache(self):
+        """Synthesizes the fixed phrase set into the TTS cache in the background, so greetings, acknowledgements and farewells play without waiting for edge-tts."""
+        def prewarm_worker():
+            self.tts_cache.prune_disk()
+            warmed = self.cache_phrases(self._fixed_phrases(), lambda: self.is_running)
+            print(f"TTS cache prewarmed ({warmed} new phrases).")
+
+        self.runtime.spawn(prewarm_worker)
+
+    def cache_phrases(self, phrases, should_continue=lambda: True):
+        """Synthesizes the phrases that are not in the TTS cache yet, one after another on the calling thread. Returns how many were added."""
+        warmed = 0
+        for phrase in phrases:
+            if not should_continue():
+                break
+            if self.tts_cache.get(phrase, count=False):
+                continue
+            try:
+                self.tts_cache.put(phrase, self.runtime.run(self._synthesize_bytes(phrase), timeout=30))
+                warmed += 1
             except Exception as e:
-                print(f"Playback Error: {e}")
-            finally:
-                if my_id == self.speech_id_counter:
-                    self.set_ui_state("idle")
+                print(f"TTS Prewarm Error: {e}")
+                break
+        return warmed
 
-        self.speech_thread = threading.Thread(target=run_wrapper, daemon=True)
-        self.speech_thread.start()
+    def _fixed_phrases(self):
+        """Lists every utterance that is always spoken word for word."""
+        phrases = [f"{greeting} I am Cypher. How may I assist you?" for greeting in GREETINGS.values()]
+        phrases += ACTIVATE_MESSAGES + FAREWELL_MESSAGES + COMMON_PHRASES
+        phrases += [f"Opening {site}, Sir." for site in WEB_LINKS]
+        phrases += [f"Executing {trigger}, Sir." for trigger in HOTKEYS]
+        phrases += [f"Opening {app}, Sir." for app in APPS_NAMES.values()]
+        return list(dict.fromkeys(phrases))
+
+    async def _synthesize_bytes(self, text):
+        """Synthesizes a whole clip with edge-tts and returns the MP3 bytes."""
+        audio = bytearray()
+        communicate = edge_tts.Communicate(text, TTS_VOICE, rate=TTS_RATE)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+        return bytes(audio)
 
     def wait_until_silent(self):
         """Blocks until the current speech has finished playing or is interrupted."""
-        if self.speech_thread and self.speech_thread.is_alive():
-            self.speech_thread.join(timeout=10)
+        if self.speech_future is not None:
+            concurrent.futures.wait([self.speech_future], timeout=10)
 
-    def listen(self, duration=5):
+    def listen(self, duration=5, position=None, timeout=5, on_partial=None, early_dispatch=False):
+        """Records one phrase from the shared capture buffer and transcribes it. By default listening starts at the live edge; a buffer position can be given to pick up speech that was already captured. While the offline recognizer is ready, on_partial(text) receives its running hypothesis as the phrase is spoken, and with early_dispatch a media key or hotkey recognized in it is executed on the spot and returned without waiting for the pause or the final transcript (self.early.fired tells the caller it already ran). In headless mode the next typed line is returned instead."""
+        if self.text_input is not None:
+            text = self.text_input()
+            if text:
+                self.ui_print(f"USER: {text}")
+            return text
         self.set_ui_state("listening")
         try:
-            with sr.Microphone() as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                # Listen for the actual command
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=8)
+            if not self.capture.running:
+                self.capture.start(self.recognizer)
+            # Listen for the actual command
+            end_phrase = None
+            if early_dispatch and EARLY_DISPATCH:
+                self.early.reset(forward=on_partial)
+                on_partial, end_phrase = self.early.on_partial, self.early.on_audio
+            source, stream = self.stt.stream(self.capture.reader(position), on_partial, end_phrase)
+            audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=8)
+            if end_phrase is not None and self.early.fired is not None:
+                text = self.early.fired.phrase
+                self.ui_print(f"USER: {text}")
+                self.set_ui_state("idle")
+                return text
+
+            audio = self.vad.trim(audio, self.recognizer.energy_threshold)
+            if audio is None:
+                self.set_ui_state("idle")
+                return ""
             
             self.set_ui_state("processing")
-            text = self.recognizer.recognize_google(audio, language="en-IN")
+            with self.tracer.span("stt", audio_s=round(len(audio.frame_data) / (audio.sample_rate * audio.sample_width), 2)) as span:
+                text, span["backend"] = self.stt.transcribe(audio, stream)
             
             self.ui_print(f"USER: {text}")
             self.set_ui_state("idle")
@@ -396,97 +3555,199 @@ class CypherCore:
             self.set_ui_state("idle")
             return ""
 
-    def save_memory(self):
-        """Saves the current chat history to a JSON file, ensuring that the history does not exceed a certain length to manage memory effectively."""
-        MAX_HISTORY = 30
-        if len(self.chat_history) > MAX_HISTORY:
-            self.chat_history = self.chat_history[:4] + self.chat_history[-(MAX_HISTORY - 4):]
-            
-        try:
-            with open(HISTORY_FILE, "w") as f:
-                json.dump(self.chat_history, f)
-        except Exception as e:
-            print(f"Memory Save Error: {e}")
+    def save_memory(self, *messages):
+        """Journals the messages just added to the chat history. The disk write happens on the memory store's background thread, so the voice thread never waits for it. Old turns normally leave the history by being summarized; the hard cap only guards against summaries failing for a long time."""
+        with self.history_lock:
+            self.memory.append(*messages)
+            overflow = len(self.chat_history) - MAX_HISTORY
+            if overflow > 0:
+                del self.chat_history[PINNED_MESSAGES:PINNED_MESSAGES + overflow]
+                self.memory.drop(overflow)
 
     def load_memory(self):
-        """Loads the chat history from a JSON file if it exists, otherwise initializes a new chat history. Handles potential corruption of the memory file gracefully."""
-        if os.path.exists(HISTORY_FILE):
-            try:
-                with open(HISTORY_FILE, "r") as f:
-                    self.chat_history = json.load(f)
+        """Loads the chat history and its rolling summary from the memory store if one exists, otherwise initializes a new chat history."""
+        try:
+            summary, history = self.memory.load()
+            if history:
+                with self.history_lock:
+                    self.chat_history = history
+                    self.context.reset()
+                    self.context.summary = summary
                 print("Previous chat history loaded.")
                 return
-            except Exception as e:
-                print("Memory corrupted, starting fresh.")
+        except Exception as e:
+            print(f"Memory Load Error: {e}. Starting fresh.")
         self.init_chat()
 
     def init_chat(self):
         """Initializes the chat history with a predefined system prompt and user instructions to set the tone and behavior of the AI assistant."""
-        self.chat_history = [
-            {"role": "user", "parts": [{"text": "You are CYPHER, a stylish, empathetic, and witty AI assistant. Speak in a mix of English and Hindi (Hinglish) when appropriate, and always address the user as 'Sir'."}]},
-            {"role": "model", "parts": [{"text": "Namaste Sir. Systems are online. I am Cypher, ready to assist."}]},
-            {"role": "user", "parts": [{"text": "You are CYPHER, created by Pratik Pattanayak."}]},
-            {"role": "user", "parts": [{"text": "CRITICAL RULE: You must always give extremely short, punchy, and direct responses. NEVER exceed 1 or 2 sentences unless I explicitly ask you for a detailed explanation. Do not use markdown formatting. Be quick and conversational."}]},
-        ]
+        with self.history_lock:
+            self.context.reset()
+            self.chat_history = [
+                {"role": "user", "parts": [{"text": "You are CYPHER, a stylish, empathetic, and witty AI assistant. Speak in a mix of English and Hindi (Hinglish) when appropriate, and always address the user as 'Sir'."}]},
+                {"role": "model", "parts": [{"text": "Namaste Sir. Systems are online. I am Cypher, ready to assist."}]},
+                {"role": "user", "parts": [{"text": "You are CYPHER, created by Pratik Pattanayak."}]},
+                {"role": "user", "parts": [{"text": "CRITICAL RULE: You must always give extremely short, punchy, and direct responses. NEVER exceed 1 or 2 sentences unless I explicitly ask you for a detailed explanation. Do not use markdown formatting. Be quick and conversational."}]},
+            ]
+            self.memory.reset(self.chat_history)
 
     def reset_chat(self):
         """Clears the current chat history and resets it to the initial system prompt, effectively starting a new conversation with a clean slate."""
         self.init_chat()
-        self.save_memory()
         self.speak("Memory Cleared. Starting fresh.")
 
     def ai_process(self, prompt):
-        """Processes the user's prompt through the Gemini API, with a fallback to the Groq API in case of failure. Updates the chat history and handles errors gracefully, ensuring that the user is informed of any connectivity issues with the AI modules."""
+        """Processes the user's prompt through the AI providers (Gemini first, Groq as hedge and fallback) and returns the whole reply. Updates the chat history and handles errors gracefully, ensuring that the user is informed of any connectivity issues with the AI modules."""
         if not self.gemini_client and not self.groq_client:
             return "System Warning: Both primary and backup AI modules are missing their API keys."
         
-        self.chat_history.append({"role": "user", "parts": [{"text": prompt}]})
+        request = {"role": "user", "parts": [{"text": prompt}]}
+        with self.history_lock:
+            self.chat_history.append(request)
         
         try:
-            if not self.gemini_client:
-                raise Exception("Gemini Client not initialized.")
+            pieces, token = [], self.tracer.start("llm")
+            for piece in self.providers.stream(self._request_context()):
+                if not pieces:
+                    self.tracer.finish(token, mode="whole")
+                pieces.append(piece)
+            reply = "".join(pieces).strip()
+            if not reply:
+                raise Exception("Empty reply.")
+
+            answer = {"role": "model", "parts": [{"text": reply}]}
+            with self.history_lock:
+                self.chat_history.append(answer)
+                self.save_memory(request, answer)
+            return reply
                 
-            response = self.gemini_client.models.generate_content(
-                model="gemini-2.5-flash", contents=self.chat_history
+        except Exception as e:
+            print(f"AI Brain Offline: {e}")
+            with self.history_lock:
+                if self.chat_history and self.chat_history[-1] is request:
+                    self.chat_history.pop()
+            return "I have lost connection to both my primary and backup servers, sir."
+
+    def ai_process_stream(self, prompt):
+        """Streams the reply to the user's prompt one sentence at a time using the providers' streaming APIs, with Groq hedging a slow Gemini and taking over a failed one. Whatever was generated is added to the chat history when the stream ends, even if the listener stops early."""
+        if not self.gemini_client and not self.groq_client:
+            yield "System Warning: Both primary and backup AI modules are missing their API keys."
+            return
+
+        request = {"role": "user", "parts": [{"text": prompt}]}
+        with self.history_lock:
+            self.chat_history.append(request)
+        reply = ""
+        buffer = ""
+        token = self.tracer.start("llm")
+        try:
+            for piece in self.providers.stream(self._request_context()):
+                if not piece:
+                    continue
+                if not reply:
+                    self.tracer.finish(token, mode="stream")
+                reply += piece
+                sentences, buffer = split_sentences(buffer + piece)
+                for sentence in sentences:
+                    yield sentence
+            if buffer.strip():
+                yield buffer.strip()
+        except Exception as e:
+            print(f"AI Stream Error: {e}")
+            if not reply.strip():
+                with self.history_lock:
+                    if self.chat_history and self.chat_history[-1] is request:
+                        self.chat_history.pop()
+                yield "I have lost connection to both my primary and backup servers, sir."
+        finally:
+            if reply.strip():
+                answer = {"role": "model", "parts": [{"text": reply.strip()}]}
+                with self.history_lock:
+                    self.chat_history.append(answer)
+                    self.save_memory(request, answer)
+
+    def _request_context(self):
+        """Returns the token-budgeted messages for the next AI request and starts folding any turns that no longer fit into the rolling summary."""
+        with self.history_lock:
+            messages = self.context.build(self.chat_history)
+        overflow = self.context.claim_overflow()
+        if overflow:
+            self.runtime.spawn(self._summarize_overflow, overflow)
+        return messages
+
+    def _summarize_overflow(self, messages):
+        """Asks the AI providers to merge the given old turns into the rolling summary, then drops those turns from the stored history."""
+        try:
+            transcript = "\n".join(
+                f"{'Sir' if message['role'] == 'user' else 'Cypher'}: {' '.join(part.get('text', '') for part in message['parts'])}"
+                for message in messages
             )
-            reply = response.text.strip().replace("*", "").replace("#", "").replace("`", "")
-            
-            self.chat_history.append({"role": "model", "parts": [{"text": reply}]})
-            self.save_memory()
-            return reply
+            prompt = (
+                f"Update the running summary of a conversation between Sir and his assistant Cypher. Keep names, facts, preferences "
+                f"and unfinished requests. Reply with the summary only, in under {SUMMARY_MAX_WORDS} words.\n\n"
+                f"Current summary: {self.context.summary or 'None'}\n\nNew messages:\n{transcript}"
+            )
+            summary = "".join(self.providers.stream([{"role": "user", "parts": [{"text": prompt}]}])).strip()
+            if not summary:
+                return
 
-        except Exception as gemini_error:
-            print(f"Gemini Brain Offline ({gemini_error}). Switching to Groq Backup...")
-            
-            try:
-                if not self.groq_client:
-                    raise Exception("Groq Client not initialized.")
-                    
-                groq_history = []
-                for msg in self.chat_history:
-                    role = "assistant" if msg["role"] == "model" else "user"
-                    content = msg["parts"][0]["text"]
-                    groq_history.append({"role": role, "content": content})
-                    
-                groq_response = self.groq_client.chat.completions.create(
-                    messages=groq_history,
-                    model="llama-3.3-70b-versatile" 
-                )
-                
-                reply = groq_response.choices[0].message.content.strip().replace("*", "").replace("#", "").replace("`", "")
-                
-                self.chat_history.append({"role": "model", "parts": [{"text": reply}]})
-                self.save_memory()
-                return reply
-                
-            except Exception as groq_error:
-                print(f"Groq Brain Offline: {groq_error}")
-                if self.chat_history and self.chat_history[-1]["role"] == "user":
-                    self.chat_history = self.chat_history[:-1]
-                return "I have lost connection to both my primary and backup servers, sir."
+            # The oldest turns are deleted in place, so messages appended meanwhile are kept.
+            with self.history_lock:
+                history, count = self.chat_history, len(messages)
+                if len(history) < PINNED_MESSAGES + count or any(a is not b for a, b in zip(history[PINNED_MESSAGES:], messages)):
+                    return  # The chat was reset, reloaded or trimmed while the summary was being written
+                self.context.fold(messages, summary)
+                del history[PINNED_MESSAGES:PINNED_MESSAGES + count]
+                self.memory.drop(count, self.context.summary)
+            print(f"Summarized {count} old messages ({message_tokens(messages)} tokens) into {count_tokens(summary)} tokens.")
+        except Exception as e:
+            print(f"Summary Error: {e}")
+        finally:
+            self.context.release()
+
+    def _gemini_stream(self, history):
+        """Yields cleaned text chunks of a Gemini reply."""
+        stream = self.gemini_client.models.generate_content_stream(
+            model="gemini-2.5-flash", contents=history
+        )
+        try:
+            for chunk in stream:
+                if chunk.text:
+                    yield clean_reply(chunk.text)
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+    def _groq_stream(self, history):
+        """Yields cleaned text chunks of a Groq reply, converting the history to Groq's message format."""
+        groq_history = []
+        for msg in history:
+            role = "assistant" if msg["role"] == "model" else "user"
+            groq_history.append({"role": role, "content": msg["parts"][0]["text"]})
+
+        stream = self.groq_client.chat.completions.create(
+            messages=groq_history,
+            model="llama-3.3-70b-versatile",
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield clean_reply(chunk.choices[0].delta.content)
+        finally:
+            stream.close()
+
+    def get_provider_stats(self):
+        """Returns per-provider latency percentiles, error rates and circuit breaker states for the GUI."""
+        return self.providers.stats()
 
     def speak_while_thinking(self, prompt):
-        """Processes the user's prompt through the AI and speaks the response, ensuring that the UI state is updated appropriately and that the user is informed of any delays or issues with the AI response generation."""
+        """Processes the user's prompt through the AI and speaks the response, ensuring that the UI state is updated appropriately and that the user is informed of any delays or issues with the AI response generation. In streaming mode the first sentence is spoken while the rest of the reply is still being generated."""
+        if STREAM_REPLIES:
+            self.speak_stream(self.ai_process_stream(prompt))
+            self.wait_until_silent()
+            return
+
         res = self.ai_process(prompt)
         if res:
             self.speak(res)
@@ -509,45 +3770,53 @@ class CypherCore:
         hour = int(datetime.now().hour)
         greeting = ""
         if hour >= 0 and hour < 5:
-            greeting = "You are up late, Sir."
+            greeting = GREETINGS["night"]
         elif hour >= 5 and hour < 12:
-            greeting = "Good Morning, Sir."
+            greeting = GREETINGS["morning"]
         elif hour >= 12 and hour < 18:
-            greeting = "Good Afternoon, Sir."
+            greeting = GREETINGS["afternoon"]
         else:
-            greeting = "Good Evening, Sir."
+            greeting = GREETINGS["evening"]
         self.speak(f"{greeting} I am Cypher. How may I assist you?")
 
     def shutdown_sequence(self):
         """Speaks a random farewell message from a predefined list, waits for the speech to finish, and then triggers the close callback to shut down the system gracefully."""
-        farewell_messages = [
-            "Powering down all systems. Have a productive day, Sir.",
-            "Disconnecting from the mainframe. Namaste, Sir.",
-            "Shutting down. I will be ready when you need me next.",
-            "Going offline. Take care, Sir.",
-            "System hibernation initiated. Goodbye.",
-        ]
-        choice = random.choice(farewell_messages)
+        choice = random.choice(FAREWELL_MESSAGES)
         self.speak(choice)
         self.wait_until_silent()
         if self.close_callback:
             self.close_callback()
 
+    def resolve_contact(self, kind, name_spoken):
+        """Looks up a contact by the spoken name. If there is no exact match, the closest sounding stored name is used when it is a clear winner, otherwise the user is asked to confirm it."""
+        value = self.contacts.lookup(kind, name_spoken)
+        if value:
+            return value
+        candidates = self.contacts.suggest(kind, name_spoken, limit=2)
+        if not candidates:
+            return None
+
+        best, score = candidates[0]
+        runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+        if score >= CONTACT_MATCH_THRESHOLD and score - runner_up >= 0.1:
+            self.ui_print(f"Heard '{name_spoken}', using contact '{best}'.")
+            return self.contacts.lookup(kind, best)
+
+        self.speak(f"Did you mean {best}?")
+        self.wait_until_silent()
+        answer = self.listen().lower()
+        if any(word in answer.split() for word in ("yes", "yeah", "haan", "ha", "correct", "right")):
+            return self.contacts.lookup(kind, best)
+        return None
+
     def get_email_from_db(self, name_spoken):
         """Retrieves an email address from the database based on the spoken name. Handles database errors gracefully and informs the user if a database error occurs."""
         try:
-            conn = sqlite3.connect("contact.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT email FROM email_contacts WHERE LOWER(name) = ?", (name_spoken.lower().strip(),))
-            result = cursor.fetchone()
-            return result[0] if result else None
+            return self.resolve_contact("email", name_spoken)
         except sqlite3.Error as e:
             print(f"Database Error: {e}")
             self.speak("A database error occurred while retrieving the email address.")
             return None
-        finally:
-            if 'conn' in locals(): 
-                conn.close()
 
     def send_mail(self):
         """Guides the user through sending an email by first asking for the recipient's name, retrieving the email address from the database, and then prompting for the subject and body of the email. Finally, it sends the email using SMTP and handles any errors that may occur during the process."""
@@ -589,169 +3858,127 @@ class CypherCore:
         self.wait_until_silent()
         return self.listen()
 
-    def send_email_smtp(self, to_address, subject, body):
-        """Sends an email using the SMTP protocol with the provided recipient address, subject, and body. Handles authentication using environment variables for the email credentials and manages potential errors during the sending process, ensuring that the user is informed of the success or failure of the email delivery."""
-        from_address = os.getenv("EMAIL_USER")
+    def get_outbox(self):
+        """Returns the shared outbox, creating it on first use and making sure its sender runs. Returns None without credentials."""
+        user = os.getenv("EMAIL_USER")
         password = os.getenv("EMAIL_PASS")
-        if not from_address or not password:
+        if not user or not password:
+            return None
+        if self.outbox is None:
+            self.outbox = MailOutbox(user, password, on_result=self._on_email_result)
+        self.outbox.start()
+        return self.outbox
+
+    def _on_email_result(self, message, error):
+        """Called from the outbox sender once an email has been delivered or given up on."""
+        if error is None:
+            self.ui_print(f"Email to {message['to_address']} sent.")
+        else:
+            self.speak(f"Sorry, I was unable to send the email to {message['to_address']}.")
+
+    def send_email_smtp(self, to_address, subject, body):
+        """Queues an email for the background SMTP sender and returns immediately. Delivery, session reuse and retries happen in the outbox; the user is only interrupted again if the email cannot be sent."""
+        outbox = self.get_outbox()
+        if not outbox:
             self.speak("Email credentials are not configured in the environment variables.")
             return
-        message = f"Subject: {subject}\n\n{body}"
-        server = None
         try:
-            server = smtplib.SMTP("smtp.gmail.com", 587)
-            server.starttls()
-            server.login(from_address, password)
-            server.sendmail(from_address, to_address, message)
-            self.speak("Email has been sent successfully.")
-        except Exception as e:
+            outbox.enqueue(to_address, subject, body)
+            self.speak("Email is on its way, Sir.")
+        except sqlite3.Error as e:
             print(e)
             self.speak("Sorry, I was unable to send the email.")
-        finally:
-            if server: 
-                server.quit()
 
-    def check_emails(self):
-        """Checks for new emails in the user's inbox using the IMAP protocol, retrieves the subject and sender of the latest unread emails, and speaks this information to the user. Handles authentication using environment variables for the email credentials and manages potential errors during the email retrieval process, ensuring that the user is informed of any issues accessing their inbox."""
+    def get_mail_reader(self):
+        """Returns the shared inbox reader, creating it (and its IDLE watcher) on first use. Returns None without credentials."""
         user = os.getenv("EMAIL_USER")
         password = os.getenv("EMAIL_PASS")
-        
         if not user or not password:
+            return None
+        if self.mail_reader is None:
+            self.mail_reader = MailReader(user, password)
+            if MAIL_PUSH_NOTIFICATIONS:
+                self.mail_reader.watch(self._on_new_mail)
+        return self.mail_reader
+
+    def _on_new_mail(self, headers):
+        """Called by the IDLE watcher. The headers are already cached, so asking about new mail afterwards is instant."""
+        self.ui_print(f"New email from {headers['sender']}: {headers['subject']}")
+
+    def check_emails(self):
+        """Checks for new emails in the user's inbox and speaks the subject and sender of the latest unread ones. Headers are fetched in one batch over the shared IMAP connection while the first acknowledgement is still being spoken, and messages already seen are answered from the local header cache."""
+        reader = self.get_mail_reader()
+        if not reader:
             self.speak("Email credentials are not configured.")
             return
         
         try:
             self.speak("Checking for new emails, Sir...")
+            count, latest = reader.unseen(limit=MAIL_READ_LIMIT)
             self.wait_until_silent()
 
-            mail = imaplib.IMAP4_SSL("imap.gmail.com")
-            mail.login(user, password)
-            mail.select("inbox")
-
-            status, messages = mail.search(None, "UNSEEN")
-            email_ids = messages[0].split()
-
-            if not email_ids:
+            if not count:
                 self.speak("You have no new emails, Sir.")
                 self.wait_until_silent()
                 return
 
-            count = len(email_ids)
             self.speak(f"You have {count} new emails.")
             self.wait_until_silent()
-            if count > 3:
-                self.speak("Reading the latest 3 emails. subject and sender only, Sir.")
+            if count > MAIL_READ_LIMIT:
+                self.speak(f"Reading the latest {MAIL_READ_LIMIT} emails. subject and sender only, Sir.")
                 self.wait_until_silent()
 
-            for i in range(min(3, count)):
-                latest_email_id = email_ids[-(i + 1)] 
-                _, msg_data = mail.fetch(latest_email_id, "(RFC822)")
-
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
-                        subject_parts = decode_header(msg["Subject"])
-                        subject = "".join([
-                            (part[0].decode(part[1] or "utf-8") if isinstance(part[0], bytes) else str(part[0]))
-                            for part in subject_parts
-                        ])
-
-                        from_header = msg.get("From")
-                        if from_header:
-                            from_parts = decode_header(from_header)
-                            from_ = "".join([
-                                (part[0].decode(part[1] or "utf-8") if isinstance(part[0], bytes) else str(part[0]))
-                                for part in from_parts
-                            ])
-                            if "<" in from_:
-                                from_ = from_.split("<")[0].strip().replace('"', "")
-                        else:
-                            from_ = "Unknown"
-
-                        self.speak(f"Email {i+1} from {from_}. Subject: {subject}")
-                        self.wait_until_silent()
-                        time.sleep(0.5)
-
+            for i, headers in enumerate(latest):
+                self.speak(f"Email {i+1} from {headers['sender']}. Subject: {headers['subject']}")
+                self.wait_until_silent()
+                time.sleep(0.5)
             self.speak("That is all for now, Sir.")
 
         except Exception as e:
             print(e)
             self.speak("I encountered an error while accessing your inbox, Sir.")
-        finally:
-            if 'mail' in locals():
-                try:
-                    mail.close()
-                    mail.logout()
-                except: 
-                    pass
 
     def get_weather(self, city):
-        """Fetches the current weather information for a specified city using the OpenWeather API. Handles potential errors such as missing API keys, city not found, and network issues gracefully, providing informative feedback to the user in each case."""
-        try:
-            api_key = os.getenv("OPENWEATHER_KEY")
-            if not api_key:
-                return "Error: OpenWeather API key is missing from the environment variables."
-
-            url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-            headers = {"User-Agent": "CypherVoiceAssistant/1.0"}
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 404:
-                return f"I'm sorry, I couldn't find any weather data for the city {city}."
-                
-            if response.status_code == 200:
-                data = response.json()
-                city_name = data['name']
-                temp = round(data['main']['temp'])
-                description = data['weather'][0]['description']
-                humidity = data['main']['humidity']
-                wind_speed = data['wind']['speed']
-                return f"Currently in {city_name}, it is {temp} degrees Celsius with {description}. The humidity is at {humidity} percent, with a wind speed of {wind_speed} meters per second."
-            else:
-                return "There was an error communicating with the weather server."
-                
-        except requests.exceptions.RequestException as e:
-            return "I am currently unable to connect to the weather network. Please check your internet connection."
-        except Exception as e:
-            return "Sorry, I encountered an internal error while fetching the weather."
+        """Returns the current weather report for a city from the weather service, which answers repeated questions from its cache. Handles a missing API key, unknown cities and network issues with informative spoken messages."""
+        api_key = os.getenv("OPENWEATHER_KEY")
+        if not api_key:
+            return "Error: OpenWeather API key is missing from the environment variables."
+        if self.weather is None:
+            self.weather = WeatherService(api_key, self.runtime)
+        return self.weather.report(city)
 
     def get_news(self):
-        """Fetches the latest news headlines using the NewsData API. Handles potential errors such as missing API keys, issues with the API response, and network problems gracefully, providing informative feedback to the user in each case."""
-        try:
-            api = NewsDataApiClient(apikey=os.getenv("NEWS_API_KEY"))
-            response = api.latest_api(country="in", language="en")
-
-            if response.get("status") == "success":
-                articles = response.get("results", [])
-                news_brief = "Here are the top news headlines. "
-                for i in range(min(5, len(articles))):
-                    news_brief += f"{i+1}. {articles[i]['title']}. "
-                print(news_brief)
-                return news_brief
-            else:
-                return "Sorry, I could not fetch the news at this moment."
-                
-        except Exception as e:
-            print(f"News API Error: {e}")
-            return "Unable to fetch news right now due to a network error."
+        """Returns the news briefing as a list of sentences. The background refresher normally has it ready (with its audio already synthesized), so no network request is made; a briefing older than an hour is introduced with its age. Only before the first refresh has succeeded are the headlines fetched on demand."""
+        if not os.getenv("NEWS_API_KEY"):
+            return ["Sorry, I could not fetch the news at this moment."]
+        if self.news is None:
+            self.news = NewsRefresher(os.getenv("NEWS_API_KEY"), self.runtime, on_update=self.cache_phrases)
+
+        sentences, age = self.news.briefing()
+        if sentences is None:
+            try:
+                self.news.refresh(notify=False)  # speak_stream synthesizes (and caches) these itself
+            except Exception as e:
+                print(f"News API Error: {e}")
+                return ["Unable to fetch news right now due to a network error."]
+            sentences, age = self.news.briefing()
+            if sentences is None:
+                return ["Sorry, I could not fetch the news at this moment."]
+
+        if age > NEWS_STALE_SECONDS:
+            sentences.insert(0, f"These headlines are from {describe_age(age)} ago.")
+        print(" ".join(sentences))
+        return sentences
 
     def get_whatsapp_number_from_db(self, name_spoken):
         """Retrieves a WhatsApp number from the database based on the spoken name. Cleans and formats the phone number to ensure it is in the correct format for sending messages. Handles database errors gracefully and informs the user if a database error occurs."""
         try:
-            conn = sqlite3.connect("contact.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT phone_number FROM contacts WHERE LOWER(name) = ?", (name_spoken.lower().strip(),))
-            result = cursor.fetchone()
+            raw_number = self.resolve_contact("whatsapp", name_spoken)
         except sqlite3.Error as e:
             print(f"Database Error: {e}")
             return None
-        finally:
-            if 'conn' in locals(): 
-                conn.close()
 
-        if result:
-            raw_number = result[0]
+        if raw_number:
             clean_number = "".join(filter(str.isdigit, raw_number))
             if len(clean_number) == 10:
                 clean_number = "+91" + clean_number
@@ -784,7 +4011,7 @@ class CypherCore:
             self.speak("I didn't hear a message.")
             return
 
-        threading.Thread(target=self.send_whatsapp_message, args=(phone_number, message), daemon=True).start()
+        self.runtime.spawn(self.send_whatsapp_message, phone_number, message)
 
     def send_whatsapp_message(self, phone_number, message):
         self.speak("Sending message...")
@@ -797,94 +4024,155 @@ class CypherCore:
             print(f"WhatsApp/Internet Error: {e}")
             self.speak("Sorry, I am unable to connect to WhatsApp at the moment. Please check the internet connection.")
 
+    def get_wiki_index(self):
+        """Opens the offline abstract index on first use, if one has been built."""
+        if not self.wiki_index_checked:
+            self.wiki_index = WikiAbstractIndex.open()
+            self.wiki_index_checked = True
+        return self.wiki_index
+
     def search_wikipedia(self, topic):
-        """Searches Wikipedia for a given topic and returns a brief summary. Handles potential errors such as disambiguation, page not found, and network issues gracefully, providing informative feedback to the user in each case."""
+        """Searches Wikipedia for a given topic and returns a brief summary. Answers come from the local cache first, then from the offline abstract index, and only then from the network; network answers (including disambiguation options and missing pages) are cached for next time."""
         if not topic:
             return "I didn't catch the topic, sir."
-        try:
-            result = wikipedia.summary(topic, sentences=2)
-            return f"According to Wikipedia: {result}"
-        except wikipedia.exceptions.DisambiguationError:
-            return "There are too many different results for that topic. Please be more specific."
-        except wikipedia.exceptions.PageError:
-            return "I couldn't find any matching page on Wikipedia, sir."
-        except Exception as e:
-            print(f"Wikipedia Error: {e}")
-            return "Connection to Wikipedia failed, sir."  
+        cached = self.wiki_cache.get(topic)
+        if cached is None:
+            index = self.get_wiki_index()
+            abstract = index.lookup(topic) if index else None
+            if abstract:
+                return f"According to Wikipedia: {first_sentences(abstract)}"
+            if WIKI_OFFLINE:
+                return "I couldn't find that topic in the offline Wikipedia index, sir."
+            try:
+                cached = ("summary", self.runtime.call(wikipedia.summary, topic, sentences=WIKI_SENTENCES, timeout=WIKI_TIMEOUT))
+            except wikipedia.exceptions.DisambiguationError as e:
+                cached = ("disambiguation", [option for option in e.options if option][:3])
+            except wikipedia.exceptions.PageError:
+                cached = ("missing", "")
+            except Exception as e:
+                print(f"Wikipedia Error: {e}")
+                return "Connection to Wikipedia failed, sir."
+            self.wiki_cache.put(topic, *cached)
+
+        kind, content = cached
+        if kind == "summary":
+            return f"According to Wikipedia: {content}"
+        if kind == "disambiguation":
+            examples = f" Did you mean {', '.join(content[:-1])} or {content[-1]}?" if len(content) > 1 else ""
+            return f"There are too many different results for that topic. Please be more specific.{examples}"
+        return "I couldn't find any matching page on Wikipedia, sir."
 
     def check_internet_speed(self):
         """Checks the current internet speed using the speedtest library and returns the download speed, upload speed, and ping. Handles potential errors during the speed test process gracefully and informs the user if the internet speed check fails."""
         try:
             self.speak("Checking internet speed, please wait...")
             self.wait_until_silent()
-            st = speedtest.Speedtest()
-            st.get_best_server()
-            download_speed = st.download(threads=1) / 1_000_000
-            upload_speed = st.upload(threads=1) / 1_000_000
-            ping = st.results.ping
+
+            def measure():
+                st = speedtest.Speedtest()
+                st.get_best_server()
+                return st.download(threads=1) / 1_000_000, st.upload(threads=1) / 1_000_000, st.results.ping
+
+            download_speed, upload_speed, ping = self.runtime.call(measure, timeout=SPEEDTEST_TIMEOUT)
             return f"Download {download_speed:.1f} Mbps, Upload {upload_speed:.1f} Mbps, Ping {ping:.0f} ms"
         except Exception as e:
             print(e)
             return "Internet speed check failed, sir."
 
-    def set_alarm(self, time_str):
-        """Sets an alarm for a specified time in HH:MM format. The alarm will trigger a spoken notification when the time is reached. Handles potential errors in time parsing and ensures that the alarm can be cancelled if needed."""
-        self.alarm_event.clear()
-        def alarm_worker():
-            try:
-                now = datetime.now()
-                alarm_datetime = datetime.strptime(time_str, "%H:%M")
-                alarm_datetime = alarm_datetime.replace(year=now.year, month=now.month, day=now.day)
+    def set_alarm(self, time_str, every=None):
+        """Sets an alarm for a specified time in HH:MM format (today, or tomorrow if that time has passed), optionally repeating every given number of seconds. Returns the scheduled timer."""
+        hour, minute = map(int, time_str.replace(".", ":").split(":"))
+        return self.timers.add("alarm", f"{hour:02d}:{minute:02d} alarm", next_clock_time(hour, minute), every)
 
-                if alarm_datetime <= now:
-                    alarm_datetime += timedelta(days=1)
+    def set_timer(self, seconds, label=None):
+        """Starts a countdown timer, named after its label or its length."""
+        name = f"{label} timer" if label and "timer" not in label else label or f"timer for {describe_duration(seconds)}"
+        return self.timers.add("timer", name, time.time() + seconds)
 
-                sleep_seconds = (alarm_datetime - datetime.now()).total_seconds()
-                was_cancelled = self.alarm_event.wait(timeout=sleep_seconds)
+    def _on_timer(self, timer, late):
+        """Announces an alarm, timer or reminder that has fallen due."""
+        due = datetime.fromtimestamp(timer["due"]).strftime("%H:%M")
+        if timer["kind"] == "reminder":
+            text = f"{'While I was offline, you had a reminder at ' + due if late else 'Reminder, Sir'}: {timer['message']}."
+        elif late:
+            text = f"While I was offline, your {timer['name']} went off at {due}, Sir."
+        elif timer["kind"] == "alarm":
+            text = "Alarm ringing, Sir!"
+        else:
+            text = f"Sir, your {timer['name']} is done."
+        self.ui_print(text)
+        self.speak(text)
 
-                if not was_cancelled:
-                    self.speak("Alarm ringing, Sir!")
-            except Exception as e:
-                print(f"Alarm Error: {e}")
-                self.speak("Failed to set alarm, sir.")
-        threading.Thread(target=alarm_worker, daemon=True).start()
+    def set_reminder(self, text):
+        """Schedules a reminder from an utterance such as "drink water in 20 minutes", "call mom at 18:30" or "stretch every hour". Asks when, if the utterance does not say. Returns the timer, or None."""
+        every = parse_recurrence(text)
+        rest = RECURRENCE_PATTERN.sub("", text)
+        clock, delay = CLOCK_PATTERN.search(rest), parse_duration(rest)
+        task = re.sub(r"(?:\b(?:at|by)\s+)?" + CLOCK_PATTERN.pattern, "", rest)
+        task = re.sub(r"(?:\b(?:in|after)\s+)?" + DURATION_PATTERN.pattern, "", task)
+        task = " ".join(task.split()).strip(" ,.") or "check your reminder"
+
+        if clock is None and delay is None and every is None:
+            self.speak("When should I remind you, Sir?")
+            self.wait_until_silent()
+            when = self.listen().lower()
+            clock, delay = CLOCK_PATTERN.search(when), parse_duration(when)
+            if clock is None and delay is None:
+                self.speak("I didn't catch a time, so I haven't set the reminder.")
+                return None
+
+        if clock and delay is None:
+            hour, minute = int(clock.group(1)), int(clock.group(2))
+            if hour > 23 or minute > 59:
+                self.speak("I didn't catch a valid time, so I haven't set the reminder.")
+                return None
+            due = next_clock_time(hour, minute)
+        else:
+            due = time.time() + (delay or every)
+        return self.timers.add("reminder", task, due, every, message=task)
 
     def process_command(self, c):
-        """Processes a user command by checking for various triggers and executing the corresponding actions. Handles a wide range of commands including opening websites, executing hotkeys, controlling media playback, managing applications, fetching information, and more. Provides feedback to the user for each action taken and ensures that the UI state is updated appropriately throughout the process."""
+        """Processes a user command by routing it to an intent and executing the corresponding action. Handles a wide range of commands including opening websites, executing hotkeys, controlling media playback, managing applications, fetching information, and more. Provides feedback to the user for each action taken and ensures that the UI state is updated appropriately throughout the process."""
         c_lower = c.lower()
         self.ui_print(f"Processing: {c}")
 
-        # Check for web links first
-        for site, url in WEB_LINKS.items():
-            if site in c_lower:
-                self.speak(f"Opening {site}, Sir.")
-                self.wait_until_silent()
-                return webbrowser.open(url)
+        with self.tracer.span("route") as span:
+            match = self.router.route(c_lower)
+            intent = span["intent"] = match.intent if match else None
 
-        # Check for hotkeys next
-        for trigger, keys in HOTKEYS.items():
-            if trigger in c_lower:
-                self.speak(f"Executing {trigger}, Sir.")
-                self.wait_until_silent()
-                return pyautogui.hotkey(*keys)
+        # Open web links
+        if intent == "web_link":
+            self.speak(f"Opening {match.phrase}, Sir.")
+            self.wait_until_silent()
+            return webbrowser.open(WEB_LINKS[match.phrase])
 
-        # Check for media controls
-        for key, media_key in MEDIA_KEYS.items():
-            if key in c_lower:
-                self.speak("Right away, Sir.")
-                self.wait_until_silent()
-                return pyautogui.press(media_key)
+        # Execute hotkeys
+        elif intent == "hotkey":
+            self.speak(f"Executing {match.phrase}, Sir.")
+            self.wait_until_silent()
+            return pyautogui.hotkey(*HOTKEYS[match.phrase])
 
-        # Check for application openings
-        if "open" in c_lower:
-            app_name = c_lower.replace("open", "").strip()
-            actual_app_name = APPS_NAMES.get(app_name, app_name)
-            self.speak(f"Opening {actual_app_name}, Sir.")
+        # Media controls
+        elif intent == "media":
+            self.speak("Right away, Sir.")
             self.wait_until_silent()
-            self.open_app(actual_app_name)
+            return pyautogui.press(MEDIA_KEYS[match.phrase])
+
+        # Application openings
+        elif intent == "open_app":
+            app_name = match.slots.get("app", "")
+            if not app_name:
+                self.speak("Which application should I open, Sir?")
+                self.wait_until_silent()
+                app_name = self.listen().lower().strip()
+            if app_name:
+                actual_app_name = APPS_NAMES.get(app_name, app_name)
+                self.speak(f"Opening {actual_app_name}, Sir.")
+                self.wait_until_silent()
+                self.open_app(actual_app_name)
             
-        # Check for typing command
-        elif "type what i say" in c_lower:
+        # Typing command
+        elif intent == "type_text":
             self.speak("What do you want to type?")
             self.wait_until_silent()
             text = self.listen()
@@ -892,16 +4180,16 @@ class CypherCore:
                 pyautogui.typewrite(text)
                 pyautogui.press("enter")
                 
-        # Check for sleep command
-        elif "put on sleep" in c_lower:
+        # Sleep command
+        elif intent == "sleep_pc":
             pyautogui.hotkey("win", 'x')
             time.sleep(0.2)
             pyautogui.press('u')
             time.sleep(0.2)
             pyautogui.press('s')
             
-        # Check for shutdown command
-        elif "shutdown" in c_lower:
+        # Shutdown command
+        elif intent == "shutdown_pc":
             self.speak("Are you sure you want to shut down the computer, Sir? Say yes to confirm.")
             self.wait_until_silent()
             confirmation = self.listen()
@@ -911,8 +4199,8 @@ class CypherCore:
             else:
                 self.speak("Shutdown cancelled.") 
             
-        # Check for restart command
-        elif "restart" in c_lower:
+        # Restart command
+        elif intent == "restart_pc":
             self.speak("Are you sure you want to restart the system, Sir? Say yes to confirm.")
             self.wait_until_silent()
             confirmation = self.listen()
@@ -922,42 +4210,42 @@ class CypherCore:
             else:
                 self.speak("Restart cancelled.")
             
-        # Check for weather command
-        elif "weather" in c_lower:
-            city = c_lower.split("in")[-1].strip() if "in" in c_lower else "Mumbai"
+        # Weather command
+        elif intent == "weather":
+            city = match.slots.get("city", DEFAULT_CITY)
             res = self.get_weather(city)
             self.speak(res)
             self.wait_until_silent()
             
-        # Check for send email command
-        elif "send email" in c_lower:
+        # Send email command
+        elif intent == "send_email":
             self.send_mail()
             
-        # Check for check email command
-        elif "check email" in c_lower or "read email" in c_lower:
+        # Check email command
+        elif intent == "check_email":
             self.check_emails()
             
-        # Check for check internet speed command
-        elif "check internet speed" in c_lower:
+        # Check internet speed command
+        elif intent == "internet_speed":
             self.speak(self.check_internet_speed())
             self.wait_until_silent()
             
-        # Check for news command
-        elif "news" in c_lower:
-            self.speak(self.get_news())
+        # News command
+        elif intent == "news":
+            self.speak_stream(iter(self.get_news()))
             self.wait_until_silent()
             
-        # Check for send WhatsApp message command
-        elif "send message on whatsapp" in c_lower:
+        # Send WhatsApp message command
+        elif intent == "whatsapp":
             self.prompt_whatsapp_message()
         
-        # Check for add contact command
-        elif "add contact" in c_lower or "save contact" in c_lower or "new contact" in c_lower:
+        # Add contact command
+        elif intent == "add_contact":
             self.add_contact()
             
-        # Check for Wikipedia search command
-        elif "wikipedia" in c_lower:
-            topic = re.sub(r"(search wikipedia for|wikipedia|who is|what is)", "", c_lower).strip()
+        # Wikipedia search command
+        elif intent == "wikipedia":
+            topic = match.slots.get("topic", "")
             if not topic:
                 self.speak("What is the topic?")
                 self.wait_until_silent()
@@ -969,48 +4257,91 @@ class CypherCore:
                 self.speak(self.search_wikipedia(topic))
                 self.wait_until_silent()
                 
-        # Check for conversational words
-        elif any(phrase in c_lower for phrase in ["new session", "reset chat", "clear history"]):
+        # Conversation reset
+        elif intent == "reset_chat":
             self.reset_chat()
 
-        # Check for time, date, and day commands
-        elif "time" in c_lower:
+        # Alarm commands
+        elif intent == "set_alarm":
+            alarm_time = match.slots.get("time", "")
+            if not alarm_time:
+                self.speak("At what time should I set the alarm, Sir? Please say it in HH:MM format.")
+                self.wait_until_silent()
+                alarm_time = self.listen()
+            alarm_time = re.sub(r"^(\d{1,2})\s*[:. ]\s*(\d{2})$", r"\1:\2", alarm_time.strip())
+            try:
+                datetime.strptime(alarm_time, "%H:%M")
+                every = parse_recurrence(c_lower)
+                repeat = f", repeating every {describe_interval(every)}" if every else ""
+                self.speak(f"Setting alarm for {alarm_time}{repeat}, Sir.")
+                self.set_alarm(alarm_time, every)
+            except ValueError:
+                self.speak("I received an invalid time format. Cancelling alarm.")
+
+        elif intent == "set_timer":
+            label = match.slots.get("label")
+            seconds = parse_duration(c_lower.split(" called ")[0].split(" named ")[0])
+            if not seconds:
+                self.speak("For how long, Sir?")
+                self.wait_until_silent()
+                seconds = parse_duration(self.listen())
+            if seconds:
+                timer = self.set_timer(seconds, label)
+                self.speak(f"Starting the {timer['name']} for {describe_duration(seconds)}, Sir." if label else f"Starting a timer for {describe_duration(seconds)}, Sir.")
+            else:
+                self.speak("I didn't catch how long, so I haven't started a timer.")
+
+        elif intent == "set_reminder":
+            reminder = self.set_reminder(match.slots.get("task", ""))
+            if reminder:
+                repeat = f", and every {describe_interval(reminder['every'])} after that" if reminder["every"] else ""
+                self.speak(f"I will remind you to {reminder['message']} at {datetime.fromtimestamp(reminder['due']).strftime('%H:%M')}{repeat}, Sir.")
+
+        elif intent == "list_timers":
+            pending = self.timers.pending()
+            if not pending:
+                self.speak("You have no alarms, timers or reminders pending, Sir.")
+            else:
+                items = [f"{timer['name']} at {datetime.fromtimestamp(timer['due']).strftime('%H:%M')}" for timer in pending[:5]]
+                self.speak(f"You have {len(pending)} pending: {', '.join(items)}.")
+
+        elif intent == "cancel_alarm":
+            kind = next((kind for kind in ("alarm", "timer", "reminder") if kind in c_lower), None)
+            matches = self.timers.find(match.slots.get("name", ""), kind)
+            label = kind or "alarm"
+            if len(matches) > 1 and " all " not in f" {c_lower} ":
+                self.speak(f"Which one, Sir? You have {', '.join(timer['name'] for timer in matches[:5])}.")
+                self.wait_until_silent()
+                matches = self.timers.find(self.listen(), kind)[:1]
+            if not matches:
+                self.speak(f"There is no {label} like that to cancel, Sir." if match.slots.get("name") else f"You have no {label}s pending, Sir.")
+            for timer in matches:
+                self.timers.cancel(timer["id"])
+            if len(matches) == 1:
+                self.speak(f"The {matches[0]['name']} has been cancelled, Sir.")
+            elif matches:
+                self.speak(f"All {len(matches)} {label}s have been cancelled, Sir.")
+
+        # Time, date, and day commands
+        elif intent == "time":
             self.speak(f"The current time is {datetime.now().strftime('%H:%M')}")
             
-        elif "date" in c_lower:
+        elif intent == "date":
             self.speak(f"Today's date is {datetime.now().strftime('%B %d, %Y')}")
             
-        elif "day" in c_lower:
+        elif intent == "day":
             self.speak(f"Today is {datetime.now().strftime('%A')}")
 
-        # Check for presence confirmation
-        elif "are you there" in c_lower:
+        # Presence confirmation
+        elif intent == "presence":
             self.speak("Yes sir, I am here.")
             
-        # Check for stop commands
-        elif "turn off" in c_lower or "stop" in c_lower:
-            if "stop speaking" in c_lower or c_lower.strip() == "stop":
-                self.stop_speaking()
-            else:
-                self.shutdown_sequence()
+        # Stop commands
+        elif intent == "stop_speaking":
+            self.stop_speaking()
 
-        # Check for alarm commands
-        elif "set alarm" in c_lower:
-            self.speak("At what time should I set the alarm, Sir? Please say it in HH:MM format.")
-            self.wait_until_silent()
-            alarm_time = self.listen()
-            alarm_time = alarm_time.replace(" ", "").replace(".", ":")
-            try:
-                datetime.strptime(alarm_time, "%H:%M")
-                self.speak(f"Setting alarm for {alarm_time}, Sir.")
-                self.set_alarm(alarm_time)
-            except ValueError:
-                self.speak("I received an invalid time format. Cancelling alarm.")
-                
-        # Check for cancel/stop alarm commands
-        elif "cancel alarm" in c_lower or "stop alarm" in c_lower:
-            self.alarm_event.set()
-            self.speak("The active alarm has been cancelled, Sir.")
+        elif intent == "turn_off":
+            self.shutdown_sequence()
         
         # If no specific command is recognized, check if the input is conversational or if it should be processed as a general query to the AI
         else:
@@ -1024,37 +4355,71 @@ class CypherCore:
 
     def activate_assistant(self):
         self.is_running = True
+        self.prewarm_tts_cache()
         self.greet()
         self.ui_print("Sensors Online. Say 'Cypher' to activate.")
         
+        wake_source = None
         while self.is_running:
             self.set_ui_state("idle")
             try:
-                with sr.Microphone() as source:
-                    # Listen for short 3-second chunks for the wake word
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                if wake_source is None or not self.capture.running:
+                    if not self.capture.running:
+                        self.capture.start(self.recognizer)
+                    wake_source = self.capture.reader()
+
+                if self.wake_spotter.ready:
+                    # Spot the wake word on-device; cloud STT is only used for the command that follows
+                    if not self.wake_spotter.spot(wake_source, lambda: self.is_running, self.recognizer.energy_threshold):
+                        continue
+                    text = WAKE_WORDS[0]
+                    wake_ended = time.perf_counter()
+                    wake_started = wake_ended - self.wake_spotter.eval_latencies[-1] / 1000
+                else:
+                    # Listen for short 3-second chunks for the wake word. The reader carries on from where the last chunk ended, so nothing said in between is lost.
+                    source, stream = self.stt.stream(wake_source)
                     audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
+                    audio = self.vad.trim(audio, self.recognizer.energy_threshold)
+                    if audio is None:
+                        continue
+
+                    # Transcribe with the selected backend (the offline one already has the transcript from streaming)
+                    wake_started = time.perf_counter()
+                    text, wake_backend = self.stt.transcribe(audio, stream)
+                    text = text.lower()
+                    wake_ended = time.perf_counter()
                 
-                # Transcribe using lightweight API
-                text = self.recognizer.recognize_google(audio, language="en-IN").lower()
-                
-                if "cypher" in text or "cipher" in text or "saifer" in text:
+                if any(word in text for word in WAKE_WORDS):
                     self.set_ui_state("listening")
-                    
-                    activate_msg = ["Yes, Sir?", "At your service.", "I'm here, Sir.", "Ready, Sir."]
-                    self.speak(random.choice(activate_msg))
-                    self.wait_until_silent()
-                    
-                    command = self.listen()
+                    self.early.reset()
+                    self.tracer.begin_turn(wake_started)
+                    self.tracer.record("wake", wake_started, wake_ended, spotter="local" if self.wake_spotter.ready else wake_backend)
+
+                    # A command spoken in the same breath is either already in the transcript or waiting in the buffer right after the wake word
+                    command = self._command_after_wake_word(text)
+                    if not command:
+                        command = self.listen(position=wake_source.position, timeout=WAKE_FOLLOW_UP_TIMEOUT, early_dispatch=True)
+                    if not command:
+                        self.speak(random.choice(ACTIVATE_MESSAGES))
+                        self.wait_until_silent()
+                        command = self.listen(early_dispatch=True)
                     
                     if command:
-                        if "stop listening" in command.lower() or "go to sleep" in command.lower():
+                        if self.early.fired is not None:
+                            # Already executed while it was being spoken; only the acknowledgement is left
+                            self.speak("Right away, Sir." if self.early.fired.intent == "media" else f"Executing {self.early.fired.phrase}, Sir.")
+                            self.wait_until_silent()
+                        elif "stop listening" in command.lower() or "go to sleep" in command.lower():
                             self.speak("Entering standby mode.")
                         elif "turn off" in command.lower():
                             self.shutdown_sequence()
                             break
                         else:
                             self.process_command(command)
+
+                    # Skip the audio captured while the command was handled, including Cypher's own voice
+                    wake_source.seek(self.capture.head)
+                    self.tracer.end_turn()
                             
             except sr.WaitTimeoutError:
                 pass
@@ -1063,9 +4428,91 @@ class CypherCore:
             except Exception as e:
                 time.sleep(0.1)
 
+        self.capture.stop()
+
+    def _dispatch_early(self, match):
+        """Runs a media key or hotkey recognized from a partial transcript, before the phrase has ended."""
+        with self.tracer.span("route", intent=match.intent, early=True):
+            if match.intent == "hotkey":
+                pyautogui.hotkey(*HOTKEYS[match.phrase])
+            else:
+                pyautogui.press(MEDIA_KEYS[match.phrase])
+
+    def _command_after_wake_word(self, text):
+        """Returns whatever was said after the wake word in the same phrase, e.g. 'open youtube' from 'cypher open youtube'."""
+        for word in WAKE_WORDS:
+            if word in text:
+                return text.split(word, 1)[1].strip(" ,.!?")
+        return ""
+
 # Main execution
 if __name__ == "__main__":
-    core = CypherCore()
-    core.check_env_variable()
-    core.load_memory()
-    core.activate_assistant()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cypher voice assistant backend.")
+    parser.add_argument("--import-contacts", metavar="FILE", help="Bulk import contacts from a vCard (.vcf) or CSV file and exit.")
+    parser.add_argument("--export-contacts", metavar="FILE", help="Export all contacts to a vCard (.vcf) or CSV file and exit.")
+    parser.add_argument("--export-trace", metavar="FILE", help=f"Convert the latency trace log ({TRACE_FILE}) into a Chrome trace-event file and exit.")
+    parser.add_argument("--build-wiki-index", metavar="DUMP", help="Build the offline Wikipedia index from an abstracts dump (.xml, .xml.gz or .xml.bz2) and exit.")
+    parser.add_argument("--text", action="store_true", help="Headless mode: read commands from stdin instead of the microphone.")
+    parser.add_argument("--script", metavar="FILE", help="Headless mode: replay the commands in FILE (one per line) and report throughput and latency.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the script this many times.")
+    parser.add_argument("--serve", metavar="PORT", type=int, help=f"Headless mode: accept commands on a TCP port on {HEADLESS_HOST}, answering each with a JSON line.")
+    parser.add_argument("--speech-dir", metavar="DIR", help="Headless mode: write synthesized replies to DIR as MP3 files. Without it speech is switched off.")
+    parser.add_argument("--quiet", action="store_true", help="Headless mode: do not print what Cypher says.")
+    args = parser.parse_args()
+
+    if args.import_contacts or args.export_contacts:
+        contacts = ContactRepository()
+        if args.import_contacts:
+            report = contacts.import_contacts(read_contact_file(args.import_contacts))
+            rate = report["records"] / report["seconds"] if report["seconds"] else 0
+            print(f"Imported {report['whatsapp']} WhatsApp numbers and {report['email']} email addresses from {report['records']} records "
+                  f"in {report['seconds']:.2f} s ({rate:,.0f} records/s). {report['duplicates']} duplicates merged, {report['invalid']} skipped.")
+        if args.export_contacts:
+            started = time.perf_counter()
+            written = contacts.export_contacts(args.export_contacts)
+            print(f"Exported {written} contacts to {args.export_contacts} in {time.perf_counter() - started:.2f} s.")
+        contacts.close()
+    elif args.export_trace:
+        count = SpanTracer().export_chrome(args.export_trace)
+        print(f"Wrote {count} spans to {args.export_trace}. Open it in chrome://tracing or ui.perfetto.dev.")
+    elif args.build_wiki_index:
+        started = time.perf_counter()
+        count = WikiAbstractIndex.build(read_wiki_abstracts(args.build_wiki_index))
+        print(f"Indexed {count} abstracts into {WIKI_INDEX}.idx/.dat in {time.perf_counter() - started:.1f} s.")
+    elif args.text or args.script or args.serve:
+        core = CypherCore()
+        core.speech_enabled = bool(args.speech_dir)
+        if args.speech_dir:
+            os.makedirs(args.speech_dir, exist_ok=True)
+            core.speech_dir = args.speech_dir
+        core.check_env_variable()
+        core.load_memory()
+        session = HeadlessSession(core, echo=not args.quiet)
+        try:
+            if args.serve:
+                session.serve(args.serve)
+            elif args.script:
+                with open(args.script, "r", encoding="utf-8") as f:
+                    commands = f.readlines()
+                session.run(commands * args.repeat)
+            else:
+                session.run(sys.stdin, on_result=lambda command, latency, output: print(f"[{latency:.1f} ms]"))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            core.stop_execution()
+
+        report = session.report()
+        print(f"{report['commands']} commands in {report['seconds']:.2f} s ({report['per_second']:,.1f} commands/s). Latency p50 {report['p50_ms']:.1f} ms, "
+              f"p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms.")
+        if report["failed"]:
+            print(f"{report['failed']} commands failed, e.g. '{session.failures[0][0]}': {session.failures[0][1]}")
+        for command, count, p50, worst in report["slowest"]:
+            print(f"  {p50:9.1f} ms p50, {worst:9.1f} ms max, {count:6d}x  {command}")
+    else:
+        core = CypherCore()
+        core.check_env_variable()
+        core.load_memory()
+        core.activate_assistant()
\ No newline at end of file